@@ -26,13 +26,70 @@ from argparse import ArgumentParser
 from gnuradio.eng_arg import eng_float, intx
 from gnuradio import eng_notation
 from gnuradio import zeromq
+import pkt_perf
+import pkt_zmq
 
 
 
 class chan_loopback(gr.top_block, Qt.QWidget):
 
-    def __init__(self):
+    def __init__(self, headless=False, throttle=True, transport='pubsub'):
         gr.top_block.__init__(self, "chan_loopback", catch_exceptions=True)
+        self.display = False
+        # PUSH/PULL paces itself by backpressure (see pkt_zmq.py); a
+        # throttle there would only slow the link down
+        self.throttle = throttle = throttle and transport != 'pushpull'
+        self.transport = transport
+
+        ##################################################
+        # Variables
+        ##################################################
+        self.time_offset = time_offset = 1.000
+        self.taps = taps = [1.0 + 0.0j, ]
+        self.samp_rate = samp_rate = 768000
+        self.noise_volt = noise_volt = 0.0
+        self.freq_offset = freq_offset = 0
+
+        ##################################################
+        # Blocks
+        ##################################################
+
+        if transport == 'pushpull':
+            # lossless, with backpressure and drop / lag counters; the
+            # radios are push:tcp://... (see pkt_zmq.py)
+            self.zeromq_sub_source_0 = pkt_zmq.source('tcp://127.0.0.1:49203', gr.sizeof_gr_complex)
+            self.zeromq_pub_sink_0 = pkt_zmq.sink('tcp://127.0.0.1:49201', gr.sizeof_gr_complex)
+        else:
+            self.zeromq_sub_source_0 = zeromq.sub_source(gr.sizeof_gr_complex, 1, 'tcp://127.0.0.1:49203', 100, False, (-1), '', False)
+            self.zeromq_pub_sink_0 = zeromq.pub_sink(gr.sizeof_gr_complex, 1, 'tcp://127.0.0.1:49201', 100, False, (-1), '', throttle, True)
+        self.channels_channel_model_0 = channels.channel_model(
+            noise_voltage=noise_volt,
+            frequency_offset=freq_offset,
+            epsilon=time_offset,
+            taps=taps,
+            noise_seed=0,
+            block_tags=True)
+        self.blocks_throttle2_0 = blocks.throttle( gr.sizeof_gr_complex*1, samp_rate, True, 0 if "auto" == "auto" else max( int(float(0.1) * samp_rate) if "auto" == "time" else int(0.1), 1) )
+
+
+        ##################################################
+        # Connections
+        ##################################################
+        if throttle:
+            self.connect((self.blocks_throttle2_0, 0), (self.zeromq_pub_sink_0, 0))
+            self.connect((self.channels_channel_model_0, 0), (self.blocks_throttle2_0, 0))
+        else:
+            # as fast as the receiver takes it; the PUB sink waits for the
+            # subscriber instead of dropping (benchmarks, pkt_bench.py)
+            self.connect((self.channels_channel_model_0, 0), (self.zeromq_pub_sink_0, 0))
+        self.connect((self.zeromq_sub_source_0, 0), (self.channels_channel_model_0, 0))
+
+        if not headless:
+            self.attach_display()
+
+    def attach_display(self):
+        # Qt window and controls; needs a QApplication. Headless runs skip
+        # this and only build the channel chain above.
         Qt.QWidget.__init__(self)
         self.setWindowTitle("chan_loopback")
         qtgui.util.check_set_qss()
@@ -61,19 +118,6 @@ class chan_loopback(gr.top_block, Qt.QWidget):
         except BaseException as exc:
             print(f"Qt GUI: Could not restore geometry: {str(exc)}", file=sys.stderr)
 
-        ##################################################
-        # Variables
-        ##################################################
-        self.time_offset = time_offset = 1.000
-        self.taps = taps = [1.0 + 0.0j, ]
-        self.samp_rate = samp_rate = 768000
-        self.noise_volt = noise_volt = 0.0
-        self.freq_offset = freq_offset = 0
-
-        ##################################################
-        # Blocks
-        ##################################################
-
         self._time_offset_range = qtgui.Range(0.999, 1.001, 0.0001, 1.000, 200)
         self._time_offset_win = qtgui.RangeWidget(self._time_offset_range, self.set_time_offset, "Timing Offset", "counter_slider", float, QtCore.Qt.Horizontal)
         self.top_layout.addWidget(self._time_offset_win)
@@ -99,24 +143,7 @@ class chan_loopback(gr.top_block, Qt.QWidget):
         self._freq_offset_range = qtgui.Range(-0.1, 0.1, 0.001, 0, 200)
         self._freq_offset_win = qtgui.RangeWidget(self._freq_offset_range, self.set_freq_offset, "Frequency Offset", "counter_slider", float, QtCore.Qt.Horizontal)
         self.top_layout.addWidget(self._freq_offset_win)
-        self.zeromq_sub_source_0 = zeromq.sub_source(gr.sizeof_gr_complex, 1, 'tcp://127.0.0.1:49203', 100, False, (-1), '', False)
-        self.zeromq_pub_sink_0 = zeromq.pub_sink(gr.sizeof_gr_complex, 1, 'tcp://127.0.0.1:49201', 100, False, (-1), '', True, True)
-        self.channels_channel_model_0 = channels.channel_model(
-            noise_voltage=noise_volt,
-            frequency_offset=freq_offset,
-            epsilon=time_offset,
-            taps=taps,
-            noise_seed=0,
-            block_tags=True)
-        self.blocks_throttle2_0 = blocks.throttle( gr.sizeof_gr_complex*1, samp_rate, True, 0 if "auto" == "auto" else max( int(float(0.1) * samp_rate) if "auto" == "time" else int(0.1), 1) )
-
-
-        ##################################################
-        # Connections
-        ##################################################
-        self.connect((self.blocks_throttle2_0, 0), (self.zeromq_pub_sink_0, 0))
-        self.connect((self.channels_channel_model_0, 0), (self.blocks_throttle2_0, 0))
-        self.connect((self.zeromq_sub_source_0, 0), (self.channels_channel_model_0, 0))
+        self.display = True
 
 
     def closeEvent(self, event):
@@ -146,8 +173,10 @@ class chan_loopback(gr.top_block, Qt.QWidget):
 
     def set_samp_rate(self, samp_rate):
         self.samp_rate = samp_rate
-        self._samp_rate_callback(self.samp_rate)
-        self.blocks_throttle2_0.set_sample_rate(self.samp_rate)
+        if self.display:
+            self._samp_rate_callback(self.samp_rate)
+        if self.throttle:
+            self.blocks_throttle2_0.set_sample_rate(self.samp_rate)
 
     def get_noise_volt(self):
         return self.noise_volt
@@ -166,12 +195,64 @@ class chan_loopback(gr.top_block, Qt.QWidget):
 
 
 
+def argument_parser():
+    description = 'TX / RX loopback'
+    parser = ArgumentParser(description=description)
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="Run the channel without the Qt window")
+    parser.add_argument(
+        "--noise-volt", dest="noise_volt", type=eng_float, default=eng_notation.num_to_str(float(0.0)),
+        help="Set Noise Voltage, headless only [default=%(default)r]")
+    parser.add_argument(
+        "--freq-offset", dest="freq_offset", type=eng_float, default=eng_notation.num_to_str(float(0)),
+        help="Set Frequency Offset, headless only [default=%(default)r]")
+    parser.add_argument(
+        "--time-offset", dest="time_offset", type=eng_float, default=eng_notation.num_to_str(float(1.000)),
+        help="Set Timing Offset, headless only [default=%(default)r]")
+    parser.add_argument(
+        "--no-throttle", dest="throttle", action="store_false",
+        help="Run the channel as fast as the receiver takes the samples (always so with --transport pushpull)")
+    parser.add_argument(
+        "--transport", dest="transport", type=str, default='pubsub', choices=['pubsub', 'pushpull'],
+        help="ZMQ PUB/SUB, or lossless PUSH/PULL with backpressure (pkt_xmt / pkt_rcv --radio push:tcp://...) [default=%(default)r]")
+    return parser
+
+
+def main_headless(top_block_cls=chan_loopback, options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+
+    tb = top_block_cls(headless=True, throttle=options.throttle, transport=options.transport)
+    tb.set_noise_volt(options.noise_volt)
+    tb.set_freq_offset(options.freq_offset)
+    tb.set_time_offset(options.time_offset)
+
+    def sig_handler(sig=None, frame=None):
+        tb.stop()
+        tb.wait()
+
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, sig_handler)
+    signal.signal(signal.SIGTERM, sig_handler)
+
+    pkt_perf.attach(tb)
+    tb.start()
+    tb.wait()
+
+
 def main(top_block_cls=chan_loopback, options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    if options.headless:
+        return main_headless(top_block_cls, options)
 
     qapp = Qt.QApplication(sys.argv)
 
-    tb = top_block_cls()
+    tb = top_block_cls(throttle=options.throttle, transport=options.transport)
 
+    pkt_perf.attach(tb)
     tb.start()
 
     tb.show()
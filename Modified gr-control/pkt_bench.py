@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+End-to-end link benchmark without radios.
+
+Runs pkt_xmt -> chan_loopback -> pkt_rcv in one process, headless and
+unthrottled, with the USRP blocks replaced by the ZMQ stand-ins from
+pkt_radio.py, over lossless PUSH/PULL links (--transport pubsub for the
+PUB/SUB ones). Sends one file and reports, as one JSON object:
+    wall_s              start of transmission to the received file closed
+    file_bytes, intact  input size, and whether the received copy matches
+    throughput          file bytes/s, packets/s, MS/s through the channel
+    per                 packets that did not pass the CRC / packets sent
+    link                per PUSH/PULL link: items sent, received, dropped,
+                        sender waits and mean queueing lag
+    cpu                 process CPU seconds, and CPU seconds per MS/s
+    threads             CPU seconds per scheduler thread (one per block,
+                        named after it, truncated to 15 chars; Linux only)
+    work_s              time each block spent in work(), from the GNU Radio
+                        performance counters (switched on here)
+    shaper_s            work() time of pkt_xmt's pulse shaping blocks
+    metrics             the pkt_metrics counters at the end
+plus the git commit and the options, so runs can be compared across
+commits:
+    python3 pkt_bench.py --size 200000 --out bench.json
+    python3 pkt_bench.py --file some.jpg --noise-volt 0.3 --window 16
+--shaper all runs the link once with each pulse shaper of pkt_xmt (each
+in its own process) and adds what each saves against the legacy chain:
+    python3 pkt_bench.py --shaper all
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+from argparse import ArgumentParser
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import pkt_metrics
+import pkt_perf
+import pkt_radio
+import pkt_xmt
+import pkt_rcv
+import chan_loopback
+
+
+def argument_parser():
+    parser = ArgumentParser(description='hardware-free pkt_xmt -> chan_loopback -> pkt_rcv benchmark')
+    parser.add_argument("--file", dest="file", type=str, default='',
+        help="File to send [default: --size random bytes]")
+    parser.add_argument("--size", dest="size", type=int, default=100000,
+        help="Size of the random file [default=%(default)r]")
+    parser.add_argument("--noise-volt", dest="noise_volt", type=float, default=0.0,
+        help="Channel noise voltage [default=%(default)r]")
+    parser.add_argument("--freq-offset", dest="freq_offset", type=float, default=0.0,
+        help="Channel frequency offset [default=%(default)r]")
+    parser.add_argument("--time-offset", dest="time_offset", type=float, default=1.0,
+        help="Channel timing offset [default=%(default)r]")
+    parser.add_argument("--window", dest="window", type=int, default=None,
+        help="ARQ window, 0 = off [default: as in the flowgraphs]")
+    parser.add_argument("--fec", dest="fec", type=str, default=None,
+        help="FEC code none/hamming/conv [default: as in the flowgraphs]")
+    parser.add_argument("--timeout", dest="timeout", type=float, default=300.0,
+        help="Give up after this many seconds [default=%(default)r]")
+    parser.add_argument("--shaper", dest="shaper", type=str, default='polyphase',
+        choices=['polyphase', 'multistage', 'legacy', 'all'],
+        help="pkt_xmt pulse shaping, or all to compare them [default=%(default)r]")
+    parser.add_argument("--transport", dest="transport", type=str, default='pushpull',
+        choices=['pushpull', 'pubsub'],
+        help="ZMQ links: lossless PUSH/PULL, or PUB/SUB as before [default=%(default)r]")
+    parser.add_argument("--out", dest="out", type=str, default='',
+        help="Write the JSON here instead of stdout")
+    return parser
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+            capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def thread_cpu():
+    """CPU seconds per thread name of this process (Linux /proc)."""
+    cpu = {}
+    tick = os.sysconf('SC_CLK_TCK')
+    try:
+        tids = os.listdir('/proc/self/task')
+    except OSError:
+        return cpu
+    for tid in tids:
+        try:
+            with open('/proc/self/task/%s/stat' % tid) as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # pid (comm) state ... utime stime are fields 14 and 15
+        comm = stat[stat.index('(') + 1:stat.rindex(')')]
+        fields = stat[stat.rindex(')') + 2:].split()
+        cpu[comm] = cpu.get(comm, 0.0) + (int(fields[11]) + int(fields[12])) / tick
+    return cpu
+
+
+# pkt_xmt's pulse shaping blocks, per shaper
+SHAPER_BLOCKS = {
+    'legacy': ('digital_constellation_modulator_0', 'fft_filter_xxx_0_0_0', 'rational_resampler_xxx_0'),
+    'polyphase': ('blocks_packed_to_unpacked_xx_0', 'digital_diff_encoder_bb_0',
+                  'digital_chunks_to_symbols_xx_0', 'pfb_interpolator_ccf_0'),
+    'multistage': ('digital_constellation_modulator_0', 'resampler_0'),
+}
+
+
+def work_times(name, tb):
+    out = {}
+    for k, blk in pkt_perf.blocks_of(tb):
+        stats = pkt_perf.block_stats(blk)
+        if stats is not None:
+            out['%s.%s' % (name, k)] = round(stats['work_s'], 6)
+    return out
+
+
+def value(name):
+    return pkt_metrics.snapshot()['metrics'].get(name, 0)
+
+
+def link_stats():
+    """Items lost between the flowgraphs and how long they queued, per
+    PUSH/PULL link (pkt_zmq.py); empty with PUB/SUB, which cannot tell."""
+    metrics = pkt_metrics.snapshot()['metrics']
+    links = {}
+    for port in sorted({k.split('.')[1] for k in metrics if k.startswith('zmq.')}):
+        lag = metrics.get('zmq.%s.lag' % port, {})
+        links[port] = {'sent': metrics.get('zmq.%s.sent' % port, 0),
+                       'received': metrics.get('zmq.%s.received' % port, 0),
+                       'dropped': metrics.get('zmq.%s.dropped' % port, 0),
+                       'send_waits': metrics.get('zmq.%s.send_waits' % port, 0),
+                       'lag_mean_s': round(lag['sum'] / lag['count'], 6) if lag.get('count') else None}
+    return links
+
+
+def run(options):
+    work_dir = tempfile.mkdtemp(prefix='pkt_bench_')
+    try:
+        if options.file:
+            src = options.file
+        else:
+            src = os.path.join(work_dir, 'bench.bin')
+            with open(src, 'wb') as f:
+                f.write(os.urandom(options.size))
+        out_dir = os.path.join(work_dir, 'rx')
+        os.mkdir(out_dir)
+
+        prefix = 'push:' if options.transport == 'pushpull' else ''
+        tx = pkt_xmt.pkt_xmt(InFile=src, headless=True, radio=prefix + pkt_radio.TX_ADDRESS, shaper=options.shaper)
+        ch = chan_loopback.chan_loopback(headless=True, throttle=False, transport=options.transport)
+        rx = pkt_rcv.pkt_rcv(headless=True, radio=prefix + pkt_radio.RX_ADDRESS)
+        rx.epy_block_2.Directory = out_dir      # never next to the input
+        ch.set_noise_volt(options.noise_volt)
+        ch.set_freq_offset(options.freq_offset)
+        ch.set_time_offset(options.time_offset)
+        for tb in (tx, rx):
+            if options.window is not None:
+                tb.set_arq_window(options.window)
+            if options.fec is not None:
+                tb.set_fec_code(options.fec)
+
+        pkt_perf.enable()
+        rx.start()
+        ch.start()
+        time.sleep(0.5)                     # let the ZMQ subscribers connect
+        cpu0 = time.process_time()
+        threads0 = thread_cpu()
+        t0 = time.time()
+        tx.start()
+
+        done = False
+        while time.time() - t0 < options.timeout:
+            if value('reassembly.files') + value('reassembly.incomplete') >= 1:
+                # finished, or left as .part (lost packets)
+                done = value('reassembly.files') >= 1
+                break
+            time.sleep(0.05)
+        wall = time.time() - t0
+
+        # let the channel and receiver finish what is in flight
+        tx.stop()
+        tx.wait()
+        last = -1
+        while value('payload_decoder.packets') != last:
+            last = value('payload_decoder.packets')
+            time.sleep(0.5)
+        cpu = time.process_time() - cpu0
+        threads = thread_cpu()
+        ch.stop()
+        rx.stop()
+        ch.wait()
+        rx.wait()
+
+        rcvd = os.path.join(out_dir, os.path.basename(src))
+        intact = False
+        if os.path.exists(rcvd):
+            with open(src, 'rb') as a, open(rcvd, 'rb') as b:
+                intact = a.read() == b.read()
+        file_bytes = os.path.getsize(src)
+        sent = value('fec_encoder.packets')
+        passed = value('payload_decoder.packets')
+        samples = tx.uhd_usrp_sink_0.nitems_read(0)
+        msamples = samples / 1e6
+        tx_work = work_times('pkt_xmt', tx)
+        shaper_s = sum(v for k, v in tx_work.items()
+                       if k.split('.')[1] in SHAPER_BLOCKS[options.shaper])
+
+        return {
+            'commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'options': {'file': options.file, 'size': file_bytes,
+                        'noise_volt': options.noise_volt, 'freq_offset': options.freq_offset,
+                        'time_offset': options.time_offset, 'window': tx.get_arq_window(),
+                        'fec': tx.get_fec_code(), 'shaper': options.shaper,
+                        'radio': 'zmq', 'transport': options.transport, 'throttle': False},
+            'done': done,
+            'intact': intact,
+            'wall_s': round(wall, 3),
+            'file_bytes': file_bytes,
+            'throughput': {'bytes_per_s': round(file_bytes / wall, 1) if done else 0.0,
+                           'packets_per_s': round(passed / wall, 1),
+                           'msps': round(msamples / wall, 3)},
+            'packets': {'sent': sent, 'passed_crc': passed,
+                        'retransmits': value('arq.retransmits')},
+            'per': round(1.0 - passed / sent, 6) if sent else None,
+            'link': link_stats(),
+            'cpu': {'process_s': round(cpu, 3),
+                    's_per_msps': round(cpu / msamples, 3) if msamples else None},
+            'threads': {k: round(v - threads0.get(k, 0.0), 3)
+                        for k, v in sorted(threads.items()) if v - threads0.get(k, 0.0) > 0},
+            'shaper_s': round(shaper_s, 6),
+            'work_s': dict(list(tx_work.items()) +
+                           list(work_times('chan_loopback', ch).items()) +
+                           list(work_times('pkt_rcv', rx).items())),
+            'metrics': pkt_metrics.snapshot()['metrics'],
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare_shapers(options):
+    """Runs the benchmark once per shaper, each in a fresh process (the
+    ZMQ ports and the metrics counters are per process)."""
+    args = ['--size', str(options.size), '--noise-volt', str(options.noise_volt),
+            '--freq-offset', str(options.freq_offset), '--time-offset', str(options.time_offset),
+            '--timeout', str(options.timeout), '--transport', options.transport]
+    if options.file:
+        args += ['--file', options.file]
+    if options.window is not None:
+        args += ['--window', str(options.window)]
+    if options.fec is not None:
+        args += ['--fec', options.fec]
+    runs = {}
+    with tempfile.TemporaryDirectory(prefix='pkt_bench_') as work_dir:
+        for shaper in SHAPER_BLOCKS:
+            out = os.path.join(work_dir, shaper + '.json')
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--shaper', shaper,
+                '--out', out] + args, check=True)
+            with open(out) as f:
+                runs[shaper] = json.load(f)
+    old = runs['legacy']
+    runs['savings'] = {}
+    for shaper in SHAPER_BLOCKS:
+        if shaper == 'legacy':
+            continue
+        new = runs[shaper]
+        runs['savings'][shaper] = {
+            'shaper_s': round(old['shaper_s'] - new['shaper_s'], 6),
+            'shaper_ratio': round(old['shaper_s'] / new['shaper_s'], 2) if new['shaper_s'] else None,
+            'process_cpu_s': round(old['cpu']['process_s'] - new['cpu']['process_s'], 3),
+            's_per_msps': round(old['cpu']['s_per_msps'] - new['cpu']['s_per_msps'], 3)
+                if old['cpu']['s_per_msps'] and new['cpu']['s_per_msps'] else None,
+        }
+    return runs
+
+
+def main(options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    if options.shaper == 'all':
+        result = json.dumps(compare_shapers(options), indent=1)
+    else:
+        result = json.dumps(run(options), indent=1)
+    if options.out:
+        with open(options.out, 'w') as f:
+            f.write(result + '\n')
+    else:
+        print(result)
+
+
+if __name__ == '__main__':
+    main()
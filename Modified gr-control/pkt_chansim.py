@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Channel simulator for many links at once: chan_loopback's channel_model
+for any number of independent transmitter -> receiver links in one
+headless process (or a pool of them), for load tests with many pkt_xmt /
+pkt_rcv pairs.
+
+Link k takes its transmitter's samples on --tx-addr + 100 k and sends the
+receiver's on --rx-addr + 100 k, so link 0 sits where chan_loopback does:
+    python3 pkt_chansim.py --links 4 --noise-volt 0,0.1,0.2,0.3
+    python3 pkt_xmt.py --radio tcp://127.0.0.1:49303 ...     # link 1
+    python3 pkt_rcv.py --radio tcp://127.0.0.1:49301 ...
+Every link has its own noise, frequency and timing offset, taps and noise
+seed. With --sum K each receiver hears K transmitters (link k's j-th on
+--tx-addr + 100 k + j), each through its own channel (offsets, taps),
+added together with the receiver's noise on top. A transmitter that has
+sent nothing for --idle seconds counts as off the air, so one idle
+pkt_xmt does not hold up the others of its receiver.
+
+Lists (comma separated) are taken in turn: --noise-volt per link,
+--freq-offset / --time-offset per transmitter. --config links.json
+describes the links one by one instead:
+    [{"tx": ["tcp://127.0.0.1:49203", "tcp://127.0.0.1:49204"],
+      "rx": "tcp://127.0.0.1:49201",
+      "noise_volt": 0.1,
+      "freq_offset": [0.0, 0.02],
+      "time_offset": 1.0,
+      "taps": [[1.0], [0.8, "0.2+0.1j"]],
+      "seed": 0}]
+    tx          one address, or a list to add together
+    noise_volt  at the receiver (default 0)
+    freq_offset, time_offset
+                one per tx, or one for all (default 0, 1.0)
+    taps        one list per tx, or one list for all; complex taps as
+                strings (default [1.0])
+    seed        noise seed (default the link's index)
+--transport pushpull uses the lossless PUSH/PULL links of pkt_zmq.py
+(radios push:tcp://...). --workers spreads the links over that many
+processes (each block of a flowgraph already has its own thread);
+PKT_METRICS / PKT_PERF of worker w go to the address + 1 + w.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import multiprocessing
+from argparse import ArgumentParser
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from gnuradio import gr, blocks, channels, analog, zeromq
+import pkt_metrics
+import pkt_radio
+import pkt_perf
+import pkt_zmq
+
+POLL = 0.001            # s a mixer with nothing to add waits
+
+
+class mixer(gr.basic_block):
+    """Adds its inputs, the transmitters of one receiver. An input that
+    has had nothing for Idle seconds is off the air and left out (as
+    zeros); the others are added as far as all of them reach, so a live
+    stream never gets gaps."""
+    def __init__(self, ninputs, Idle=0.05, name='mixer'):
+        gr.basic_block.__init__(
+            self,
+            name='pkt_chansim.mixer',
+            in_sig=[np.complex64] * ninputs,
+            out_sig=[np.complex64])
+        self.Idle = Idle
+        self.last = [-np.inf] * ninputs     # time each input last had items
+        self.m_silent = pkt_metrics.counter("chansim.%s.silent_items" % name)
+
+    def forecast(self, noutput_items, ninputs):
+        # called with whatever is there, idle inputs included
+        return [0] * ninputs
+
+    def general_work(self, input_items, output_items):
+        now = time.time()
+        have = [len(x) for x in input_items]
+        for i, k in enumerate(have):
+            if k:
+                self.last[i] = now
+        live = [i for i, k in enumerate(have) if k or now - self.last[i] < self.Idle]
+        if not live:
+            # every transmitter is off the air
+            time.sleep(POLL)
+            return 0
+        n = min([len(output_items[0])] + [have[i] for i in live])
+        if n == 0:
+            # a live input is between chunks: wait for it
+            time.sleep(POLL)
+            return 0
+        out = output_items[0]
+        out[:n] = input_items[live[0]][:n]
+        for i in live[1:]:
+            out[:n] += input_items[i][:n]
+        for i in live:
+            self.consume(i, n)
+        self.m_silent.inc(n * (len(have) - len(live)))
+        return n
+
+
+def _source(transport, address):
+    if transport == 'pushpull':
+        return pkt_zmq.source(address, gr.sizeof_gr_complex)
+    return zeromq.sub_source(gr.sizeof_gr_complex, 1, address, 100, False, (-1), '', False)
+
+
+def _sink(transport, address, throttle):
+    if transport == 'pushpull':
+        return pkt_zmq.sink(address, gr.sizeof_gr_complex)
+    return zeromq.pub_sink(gr.sizeof_gr_complex, 1, address, 100, False, (-1), '', throttle, True)
+
+
+def _per_tx(value, ntx):
+    """One value per transmitter, from a scalar or a list."""
+    if isinstance(value, (list, tuple)):
+        return [value[j % len(value)] for j in range(ntx)]
+    return [value] * ntx
+
+
+def _taps(value, ntx):
+    """One tap list per transmitter: [1.0] for all, or [[...], [...]]."""
+    if value and all(isinstance(t, (list, tuple)) for t in value):
+        lists = [value[j % len(value)] for j in range(ntx)]
+    else:
+        lists = [value or [1.0]] * ntx
+    return [[complex(t) for t in taps] for taps in lists]
+
+
+class link(gr.hier_block2):
+    """One receiver's channel: its transmitters' sources, a channel_model
+    each, the mixer when there are several, the receiver's noise and the
+    sink."""
+    def __init__(self, cfg, index, transport='pubsub', throttle=False, samp_rate=768000, idle=0.05):
+        gr.hier_block2.__init__(self, "link%d" % index,
+            gr.io_signature(0, 0, 0), gr.io_signature(0, 0, 0))
+        tx = cfg['tx'] if isinstance(cfg['tx'], list) else [cfg['tx']]
+        ntx = len(tx)
+        self.cfg = cfg
+        self.noise_volt = noise_volt = float(cfg.get('noise_volt', 0.0))
+        seed = int(cfg.get('seed', index))
+        freq_offset = _per_tx(cfg.get('freq_offset', 0.0), ntx)
+        time_offset = _per_tx(cfg.get('time_offset', 1.0), ntx)
+        taps = _taps(cfg.get('taps', [1.0]), ntx)
+
+        self.sources = [_source(transport, a) for a in tx]
+        # a single transmitter takes the noise in its channel_model, as
+        # chan_loopback does; with several it is added after the mixer
+        self.paths = [channels.channel_model(
+            noise_voltage=noise_volt if ntx == 1 else 0.0,
+            frequency_offset=float(freq_offset[j]),
+            epsilon=float(time_offset[j]),
+            taps=taps[j],
+            noise_seed=seed,
+            block_tags=True) for j in range(ntx)]
+        self.sink = _sink(transport, cfg['rx'], throttle)
+        for src, path in zip(self.sources, self.paths):
+            self.connect(src, path)
+        if ntx == 1:
+            out = self.paths[0]
+        else:
+            self.mixer = mixer(ntx, idle, 'link%d' % index)
+            for j, path in enumerate(self.paths):
+                self.connect(path, (self.mixer, j))
+            out = self.mixer
+            if noise_volt > 0:
+                self.noise = analog.noise_source_c(analog.GR_GAUSSIAN, noise_volt, seed)
+                self.add = blocks.add_cc(1)
+                self.connect(self.mixer, (self.add, 0))
+                self.connect(self.noise, (self.add, 1))
+                out = self.add
+        if throttle:
+            self.throttle = blocks.throttle(gr.sizeof_gr_complex*1, samp_rate, True)
+            self.connect(out, self.throttle)
+            out = self.throttle
+        self.connect(out, self.sink)
+
+
+class pkt_chansim(gr.top_block):
+    """The links `configs` (dicts, see the module doc) in one flowgraph."""
+    def __init__(self, configs, transport='pubsub', throttle=False, samp_rate=768000, idle=0.05):
+        gr.top_block.__init__(self, "pkt_chansim", catch_exceptions=True)
+        self.links = []
+        for k, cfg in enumerate(configs):
+            index = cfg.get('index', k)
+            lnk = link(cfg, index, transport, throttle, samp_rate, idle)
+            setattr(self, 'link%d' % index, lnk)
+            self.connect(lnk)
+            self.links.append(lnk)
+
+
+def values(spec, cast=float):
+    """'0.1' or '0,0.1,0.2'."""
+    return [cast(x) for x in str(spec).split(',')]
+
+
+def link_configs(options):
+    """The links of --config, or --links x --sum from the other options."""
+    if options.config:
+        with open(options.config) as f:
+            configs = json.load(f)
+    else:
+        noise = values(options.noise_volt)
+        freq = values(options.freq_offset)
+        timing = values(options.time_offset)
+        configs = []
+        for k in range(options.links):
+            j0 = k * options.sum
+            configs.append({
+                'tx': [pkt_radio.offset_address(options.tx_addr, 100 * k + j) for j in range(options.sum)],
+                'rx': pkt_radio.offset_address(options.rx_addr, 100 * k),
+                'noise_volt': noise[k % len(noise)],
+                'freq_offset': [freq[(j0 + j) % len(freq)] for j in range(options.sum)],
+                'time_offset': [timing[(j0 + j) % len(timing)] for j in range(options.sum)],
+                'taps': [1.0],
+                'seed': k})
+    for k, cfg in enumerate(configs):
+        cfg.setdefault('index', k)
+    return configs
+
+
+def run_worker(w, configs, options):
+    # the worker's own metrics / perf endpoints, next to the parent's
+    if w is not None:
+        for var in ('PKT_METRICS', 'PKT_PERF'):
+            if os.environ.get(var):
+                os.environ[var] = pkt_radio.offset_address(os.environ[var], 1 + w)
+    tb = pkt_chansim(configs, options.transport, options.throttle, options.samp_rate, options.idle)
+
+    def sig_handler(sig=None, frame=None):
+        tb.stop()
+        tb.wait()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, sig_handler)
+    signal.signal(signal.SIGTERM, sig_handler)
+
+    pkt_perf.attach(tb)
+    tb.start()
+    tb.wait()
+
+
+def argument_parser():
+    parser = ArgumentParser(description='channel simulator for many transmitter -> receiver links')
+    parser.add_argument("--links", dest="links", type=int, default=1,
+        help="Number of receivers [default=%(default)r]")
+    parser.add_argument("--sum", dest="sum", type=int, default=1,
+        help="Transmitters added together into each receiver [default=%(default)r]")
+    parser.add_argument("--noise-volt", dest="noise_volt", type=str, default='0.0',
+        help="Noise voltage, a list is taken in turn per link [default=%(default)r]")
+    parser.add_argument("--freq-offset", dest="freq_offset", type=str, default='0',
+        help="Frequency offset, a list is taken in turn per transmitter [default=%(default)r]")
+    parser.add_argument("--time-offset", dest="time_offset", type=str, default='1.0',
+        help="Timing offset, a list is taken in turn per transmitter [default=%(default)r]")
+    parser.add_argument("--config", dest="config", type=str, default='',
+        help="JSON list of links (see the module doc) instead of the options above")
+    parser.add_argument("--tx-addr", dest="tx_addr", type=str, default=pkt_radio.TX_ADDRESS,
+        help="Link k's transmitter j connects to this address + 100 k + j [default=%(default)r]")
+    parser.add_argument("--rx-addr", dest="rx_addr", type=str, default=pkt_radio.RX_ADDRESS,
+        help="Link k's receiver connects to this address + 100 k [default=%(default)r]")
+    parser.add_argument("--transport", dest="transport", type=str, default='pubsub', choices=['pubsub', 'pushpull'],
+        help="ZMQ PUB/SUB as chan_loopback, or lossless PUSH/PULL (pkt_zmq.py) [default=%(default)r]")
+    parser.add_argument("--throttle", dest="throttle", action="store_true",
+        help="Pace every link at --samp-rate, as chan_loopback's GUI does")
+    parser.add_argument("--samp-rate", dest="samp_rate", type=float, default=768000,
+        help="Sample rate for --throttle [default=%(default)r]")
+    parser.add_argument("--idle", dest="idle", type=float, default=0.05,
+        help="Seconds without samples after which a summed transmitter is off the air [default=%(default)r]")
+    parser.add_argument("--workers", dest="workers", type=int, default=1,
+        help="Processes to spread the links over, 0 = one per CPU [default=%(default)r]")
+    return parser
+
+
+def main(options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    configs = link_configs(options)
+    for cfg in configs:
+        tx = cfg['tx'] if isinstance(cfg['tx'], list) else [cfg['tx']]
+        print("link %d: %s -> %s, noise %g" % (cfg['index'], ', '.join(tx), cfg['rx'], float(cfg.get('noise_volt', 0.0))))
+    workers = min(options.workers or os.cpu_count(), len(configs))
+    if workers <= 1:
+        return run_worker(None, configs, options)
+
+    ctx = multiprocessing.get_context('spawn')
+    procs = [ctx.Process(target=run_worker, args=(w, configs[w::workers], options), name='pkt_chansim_%d' % w)
+             for w in range(workers)]
+    for p in procs:
+        p.start()
+
+    def sig_handler(sig=None, frame=None):
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.join(5.0)
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, sig_handler)
+    signal.signal(signal.SIGTERM, sig_handler)
+
+    running = list(procs)
+    while running:
+        # a worker that died takes its links with it; say so
+        for p in [p for p in running if p.exitcode is not None]:
+            print("pkt_chansim: %s exited (%d)" % (p.name, p.exitcode), file=sys.stderr)
+            running.remove(p)
+        time.sleep(1.0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+pkt_rcv's receive chain as one hier block, for the scripts that build
+their own receivers (pkt_mrcv per channel, pkt_sweep's link):
+    coarse CFO correction -> channel filter -> Costas loop -> symbol sync
+    -> preamble correlator -> equalizer -> slicer, differential decoder
+    -> access code -> PDUs -> FEC decoder -> CRC -> Packet Payload Decoder
+The decoded PDUs come out on the 'pdus' message port. The variables and
+blocks are pkt_rcv's (pkt_rcv.grc); a change there belongs here too.
+"""
+
+import os
+
+from gnuradio import gr, blocks, digital, filter, pdu, zeromq
+from gnuradio.filter import firdes
+from gnuradio.fft import window
+import pkt_rcv_epy_block_0
+import pkt_rcv_epy_block_1
+import pkt_rcv_epy_block_2
+import pkt_rcv_epy_block_6
+import pkt_rcv_epy_block_7
+import pkt_preamble
+
+
+class demod(gr.hier_block2):
+    """Receiver for one stream at `rate` samples/s, a multiple of
+    sym_rate * sps. max_cfo is the coarse CFO correction's search range
+    (Hz), 0 leaves the block out; at rate = sym_rate * sps there is no
+    channel filter either. With window_size the ARQ acks go to ack_addr;
+    with directory the received files are written there."""
+
+    def __init__(self, rate=768000, max_cfo=100000, window_size=0, ack_addr='', directory='', fec_code='conv', fec_depth=16):
+        gr.hier_block2.__init__(self, "demod",
+            gr.io_signature(1, 1, gr.sizeof_gr_complex), gr.io_signature(0, 0, 0))
+        self.message_port_register_hier_out('pdus')
+
+        ##################################################
+        # Variables (as in pkt_rcv)
+        ##################################################
+        self.sym_rate = sym_rate = 12000
+        self.sps = sps = 4
+        self.rx_decim = rx_decim = int(rate/(sym_rate*sps))
+        self.samp_rate = samp_rate = rate/rx_decim
+        self.phase_bw = phase_bw = 0.0628
+        self.thresh = thresh = 18
+        self.excess_bw = excess_bw = 0.35
+        self.rx_passband = rx_passband = sym_rate*(1+excess_bw)/2 + 4000
+        self.bpsk = bpsk = digital.constellation_bpsk().base()
+        self.bpsk.set_npwr(1.0)
+        self.variable_adaptive_algorithm_0 = variable_adaptive_algorithm_0 = digital.adaptive_algorithm_nlms( bpsk, 0.3).base()
+        self.training = training = pkt_preamble.training_symbols('bpsk')
+        self.max_cfo = max_cfo
+
+        ##################################################
+        # Blocks
+        ##################################################
+        chain = []
+        if max_cfo:
+            self.cfo = pkt_rcv_epy_block_6.blk(Samp_rate=rate, Sym_rate=sym_rate, Max_offset=max_cfo, Threshold=8.0, Runs=3)
+            chain.append(self.cfo)
+        if rx_decim > 1:
+            self.rx_taps = rx_taps = firdes.low_pass(1.0, rate, samp_rate/2, samp_rate - 2*rx_passband, window.WIN_HAMMING, 6.76)
+            self.channel_filter = filter.fir_filter_ccf(rx_decim, rx_taps)
+            self.channel_filter.declare_sample_delay(0)
+            chain.append(self.channel_filter)
+        self.costas = digital.costas_loop_cc(phase_bw, 2, False)
+        self.symbol_sync = digital.symbol_sync_cc(
+            digital.TED_GARDNER,
+            sps,
+            phase_bw,
+            1.0,
+            1.0,
+            1.5,
+            2,
+            digital.constellation_bpsk().base(),
+            digital.IR_MMSE_8TAP,
+            128,
+            [])
+        self.preamble = pkt_rcv_epy_block_7.blk(Modulation='bpsk', Sps=2, Threshold=0.6, Mark_delay=0)
+        self.equalizer = digital.linear_equalizer(15, 2, variable_adaptive_algorithm_0, True, training, 'corr_est')
+        self.slicer = digital.constellation_decoder_cb(bpsk)
+        self.diff_decoder = digital.diff_decoder_bb(2, digital.DIFF_DIFFERENTIAL)
+        self.map = digital.map_bb([0,1])
+        self.correlator = digital.correlate_access_code_bb_ts(pkt_preamble.ACCESS_CODE,
+          thresh, 'packet_len')
+        self.repack = blocks.repack_bits_bb(1, 8, "packet_len", False, gr.GR_MSB_FIRST)
+        self.to_pdu = pdu.tagged_stream_to_pdu(gr.types.byte_t, 'packet_len')
+        self.fec_decoder = pkt_rcv_epy_block_1.blk(Code=fec_code, Depth=fec_depth)
+        self.crc_check = digital.crc_check(32, 0x4C11DB7, 0xFFFFFFFF, 0xFFFFFFFF, True, True, False, False, 0)
+        self.decoder = pkt_rcv_epy_block_0.blk(Payload='binary', Crc_len=4, Window=window_size)
+
+        ##################################################
+        # Connections
+        ##################################################
+        self.msg_connect((self.to_pdu, 'pdus'), (self.fec_decoder, 'in'))
+        self.msg_connect((self.fec_decoder, 'out'), (self.crc_check, 'in'))
+        self.msg_connect((self.crc_check, 'ok'), (self.decoder, 'in'))
+        self.msg_connect((self.decoder, 'out'), (self, 'pdus'))
+        if window_size:
+            self.ack_sink = zeromq.pub_msg_sink(ack_addr, 100, True)
+            self.msg_connect((self.decoder, 'ack'), (self.ack_sink, 'in'))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.reassembly = pkt_rcv_epy_block_2.blk(Directory=directory, Buf_size=65536)
+            self.msg_connect((self.decoder, 'out'), (self.reassembly, 'in'))
+        self.connect(self, *chain, self.costas, self.symbol_sync,
+            self.preamble, self.equalizer, self.slicer, self.diff_decoder, self.map,
+            self.correlator, self.repack, self.to_pdu)
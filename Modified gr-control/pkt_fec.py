@@ -0,0 +1,189 @@
+"""
+Forward error correction for the packet link, shared by the FEC encoder
+(pkt_xmt) and FEC decoder (pkt_rcv) blocks.
+
+Codes (the Code parameter of both blocks, which must match)
+    'none'      packet passed through unchanged
+    'hamming'   extended Hamming(8,4): every nibble becomes one byte,
+                corrects one bit error per byte, rate 1/2
+    'conv'      convolutional K=7 rate 1/2 (polynomials 171, 133 octal)
+                terminated with 6 zero bits, hard decision Viterbi decoding
+
+The coded bits are then spread over the packet by a block interleaver of
+`depth` rows, so the bit pairs that a differential BPSK symbol error
+produces land in different Hamming bytes / far apart in the trellis.
+
+The protocol header (access code and lengths) is not coded; it carries the
+coded length, and the decoder works the payload length back out of it.
+"""
+
+import numpy as np
+
+CODES = ('none', 'hamming', 'conv')
+
+K = 7                       # constraint length
+G = (0o171, 0o133)          # generator polynomials
+TAIL = K - 1
+
+
+def _parity(x):
+    return bin(x).count('1') & 1
+
+
+# --- extended Hamming(8,4) ---------------------------------------------
+
+def _hamming_codeword(d):
+    d1, d2, d3, d4 = (d >> 3) & 1, (d >> 2) & 1, (d >> 1) & 1, d & 1
+    p1 = d1 ^ d2 ^ d4
+    p2 = d1 ^ d3 ^ d4
+    p3 = d2 ^ d3 ^ d4
+    cw = (p1 << 7) | (p2 << 6) | (d1 << 5) | (p3 << 4) | (d2 << 3) | (d3 << 2) | (d4 << 1)
+    return cw | _parity(cw)
+
+HAMMING_ENC = np.array([_hamming_codeword(d) for d in range(16)], dtype=np.uint8)
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+# nearest codeword for every received byte (ties are double errors, the CRC catches them)
+HAMMING_DEC = np.array([np.argmin(_POPCOUNT[r ^ HAMMING_ENC]) for r in range(256)], dtype=np.uint8)
+HAMMING_ERR = _POPCOUNT[np.arange(256, dtype=np.uint8) ^ HAMMING_ENC[HAMMING_DEC]]
+
+
+def hamming_encode(data):
+    nib = np.empty(2 * len(data), dtype=np.uint8)
+    nib[0::2] = data >> 4
+    nib[1::2] = data & 0x0F
+    return HAMMING_ENC[nib]
+
+
+def hamming_decode(coded):
+    nib = HAMMING_DEC[coded]
+    data = (nib[0::2] << 4) | nib[1::2]
+    return data.astype(np.uint8), int(HAMMING_ERR[coded].sum())
+
+
+# --- convolutional K=7 r=1/2 -------------------------------------------
+
+# taps by delay: tap j multiplies the input bit j steps back
+_TAPS = [np.array([(g >> (K - 1 - j)) & 1 for j in range(K)], dtype=np.uint8) for g in G]
+
+# trellis, state = the last 6 input bits, newest in bit 5
+# next state n is reached from states (n & 31) << 1 | x, x = 0, 1, with input n >> 5
+_N_STATES = 1 << (K - 1)
+_NEXT = np.arange(_N_STATES)
+_PREV = [((_NEXT & 31) << 1) | x for x in (0, 1)]
+_OUT = [np.array([[_parity((((n >> 5) << 6) | p) & g) for g in G] for n, p in zip(_NEXT, prev)],
+                 dtype=np.uint8) for prev in _PREV]
+
+
+def conv_encode_bits(bits):
+    u = np.concatenate((bits, np.zeros(TAIL, dtype=np.uint8)))
+    out = np.empty(2 * len(u), dtype=np.uint8)
+    for i, taps in enumerate(_TAPS):
+        out[i::2] = np.convolve(u, taps)[:len(u)] & 1
+    return out
+
+
+def conv_decode_bits(coded, n_bits):
+    """Hard decision Viterbi; returns the n_bits data bits."""
+    steps = n_bits + TAIL
+    r = coded[:2 * steps].reshape(steps, 2)
+    # branch distances for all steps at once, per predecessor choice
+    dist = [(r[:, None, 0] != out[None, :, 0]).astype(np.int32) +
+            (r[:, None, 1] != out[None, :, 1]) for out in _OUT]
+    big = 1 << 20
+    pm = np.full(_N_STATES, big, dtype=np.int32)
+    pm[0] = 0
+    choice = np.empty((steps, _N_STATES), dtype=np.uint8)
+    p0, p1 = _PREV
+    for t in range(steps):
+        m0 = pm[p0] + dist[0][t]
+        m1 = pm[p1] + dist[1][t]
+        c = m1 < m0
+        choice[t] = c
+        pm = np.where(c, m1, m0)
+    # trace back from the all-zero state the tail leaves us in
+    bits = np.empty(steps, dtype=np.uint8)
+    s = 0
+    for t in range(steps - 1, -1, -1):
+        bits[t] = s >> 5
+        s = ((s & 31) << 1) | choice[t, s]
+    return bits[:n_bits]
+
+
+# --- interleaver ---------------------------------------------------------
+
+_perms = {}
+
+def _perm(n, depth):
+    # read every depth-th bit: row r holds bits r, r + depth, r + 2*depth ...
+    key = (n, depth)
+    p = _perms.get(key)
+    if p is None:
+        p = np.concatenate([np.arange(r, n, depth) for r in range(min(depth, n))])
+        _perms[key] = p
+    return p
+
+
+def interleave(bits, depth):
+    if depth <= 1:
+        return bits
+    return bits[_perm(len(bits), depth)]
+
+
+def deinterleave(bits, depth):
+    if depth <= 1:
+        return bits
+    out = np.empty_like(bits)
+    out[_perm(len(bits), depth)] = bits
+    return out
+
+
+# --- packets ---------------------------------------------------------------
+
+def encoded_len(code, n):
+    """Coded length in bytes of an n byte packet."""
+    if code == 'hamming':
+        return 2 * n
+    if code == 'conv':
+        return (2 * (8 * n + TAIL) + 7) // 8
+    return n
+
+
+def decoded_len(code, n):
+    """Packet length back from the coded length, None if n is impossible."""
+    if code == 'hamming':
+        return n // 2 if n % 2 == 0 else None
+    if code == 'conv':
+        m = (n - 2) // 2
+        return m if m >= 0 and encoded_len(code, m) == n else None
+    return n
+
+
+def encode(code, data, depth=16):
+    """Codes and interleaves one packet (uint8 array), returns uint8 array."""
+    data = np.asarray(data, dtype=np.uint8)
+    if code == 'hamming':
+        coded = np.unpackbits(hamming_encode(data))
+    elif code == 'conv':
+        coded = conv_encode_bits(np.unpackbits(data))
+    else:
+        return data
+    return np.packbits(interleave(coded, depth))
+
+
+def decode(code, data, depth=16):
+    """Inverse of encode(); returns (packet, corrected bit count) or
+    (None, 0) when the length does not fit the code."""
+    data = np.asarray(data, dtype=np.uint8)
+    n = decoded_len(code, len(data))
+    if n is None:
+        return None, 0
+    if code == 'hamming':
+        bits = deinterleave(np.unpackbits(data), depth)
+        return hamming_decode(np.packbits(bits))
+    if code == 'conv':
+        n_coded = 2 * (8 * n + TAIL)
+        bits = deinterleave(np.unpackbits(data)[:n_coded], depth)
+        out = conv_decode_bits(bits, 8 * n)
+        errors = int(np.count_nonzero(conv_encode_bits(out) != bits))
+        return np.packbits(out), errors
+    return data, 0
@@ -0,0 +1,89 @@
+"""
+Inserts a fixed prefix (the preamble) in a byte stream in front of every
+packet, for the transmit blocks that do that: add_preamble (on the
+'start_packet' tags of add_packet_start_tag) and frame_builder (on the
+'packet_len' tags themselves).
+    self.framer = pkt_frame.Framer(self, preamble, 'start_packet')
+    ...
+    def general_work(self, input_items, output_items):
+        packets, nbytes, tags = self.framer.work(input_items[0], output_items[0])
+        return gr.WORK_CALLED_PRODUCE
+Every start tag in the window gets its prefix, not just the first one.
+The output positions are shifted by the prefixes, so the block's tag
+propagation is turned off and the tags are moved here: tags on a packet
+start move to its prefix and the length tag grows to cover it.
+"""
+
+import numpy as np
+from gnuradio import gr
+import pmt
+
+
+class Framer:
+    def __init__(self, block, prefix, start_key, len_key='packet_len'):
+        self.block = block
+        self.prefix = np.array(prefix, dtype=np.uint8)
+        self.start_key = pmt.intern(start_key)
+        self.len_key = pmt.intern(len_key)
+        # Absolute input offset of the last packet start that got its prefix
+        self.framed = -1
+        block.set_tag_propagation_policy(gr.TPP_DONT)
+
+    def is_start(self, tag):
+        # a length tag only starts a packet when the packet is not empty
+        if not pmt.equal(tag.key, self.start_key):
+            return False
+        return not pmt.equal(tag.key, self.len_key) or pmt.to_long(tag.value) > 0
+
+    def work(self, in0, out):
+        """Copy in0 to out with the prefixes, consume and produce; returns
+        the number of prefixes written, of bytes produced and of tags seen."""
+        blk = self.block
+        ninput_items = len(in0)
+        noutput_items = len(out)
+        n_pre = len(self.prefix)
+        nread = blk.nitems_read(0)
+        nwritten = blk.nitems_written(0)
+
+        tags = blk.get_tags_in_window(0, 0, ninput_items)
+        starts = sorted(set(tag.offset - nread for tag in tags if self.is_start(tag)))
+
+        in_idx = 0   # Input buffer index
+        out_idx = 0  # Output buffer index
+        # input offset -> output offset of each prefix written this call
+        moved = {}
+        # its tags were already moved along with that prefix
+        prev_framed = self.framed
+        for boundary in starts + [ninput_items]:
+            # Copy payload up to the next packet start
+            n_to_copy = min(boundary - in_idx, noutput_items - out_idx)
+            out[out_idx:out_idx + n_to_copy] = in0[in_idx:in_idx + n_to_copy]
+            in_idx += n_to_copy
+            out_idx += n_to_copy
+            if in_idx < boundary or boundary == ninput_items:
+                break
+            # New packet: write the prefix, unless it went out last call
+            if nread + boundary != self.framed:
+                if out_idx + n_pre > noutput_items:
+                    break
+                out[out_idx:out_idx + n_pre] = self.prefix
+                moved[nread + boundary] = nwritten + out_idx
+                self.framed = nread + boundary
+                out_idx += n_pre
+
+        # Tags of the consumed input at their new positions
+        for tag in tags:
+            idx = tag.offset - nread
+            if tag.offset in moved:
+                value = tag.value
+                if pmt.equal(tag.key, self.len_key):
+                    value = pmt.from_long(pmt.to_long(tag.value) + n_pre)
+                blk.add_item_tag(0, moved[tag.offset], tag.key, value)
+            elif idx < in_idx and tag.offset != prev_framed:
+                # plain data tag: shift by the prefixes inserted before it
+                shift = sum(1 for o in moved if o < tag.offset) * n_pre
+                blk.add_item_tag(0, nwritten + idx + shift, tag.key, tag.value)
+
+        blk.consume(0, in_idx)
+        blk.produce(0, out_idx)
+        return len(moved), out_idx, len(tags)
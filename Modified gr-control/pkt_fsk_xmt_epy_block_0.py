@@ -0,0 +1,195 @@
+"""
+Embedded Python Block: File Source to Tagged Stream
+"""
+
+import numpy as np
+from gnuradio import gr
+import time
+import pmt
+import os.path
+import sys
+import base64
+from collections import deque
+import pkt_metrics
+import pkt_wake
+
+"""
+State definitions
+    0   send phasing filler
+    1   send file data
+    2   send file name
+    3   send post filler
+    4   wait for the queued packets to go out
+    5   done
+
+Pacing
+    Packets are released by a token bucket that fills at one second of
+    airtime per second. A packet costs its airtime on the line (header,
+    payload and CRC bits, repeated samp_rate/baud times) plus Gap seconds,
+    and up to Burst packets worth of airtime can be queued ahead so the
+    modulator always has the next packet ready. When the bucket is empty
+    work() returns 0 at once and has itself woken (pkt_wake.py, 'wake'
+    message port) when about one packet of credit is back.
+"""
+
+class blk(gr.sync_block):
+    def __init__(self, FileName='None', Pkt_len=52, Payload='base64', Baud=1200, Samp_rate=48000, Gap=0.0, Burst=4):
+        gr.sync_block.__init__(
+            self,
+            name='EPB: File Source to Tagged Stream',
+            in_sig=None,
+            out_sig=[np.uint8])
+        self.FileName = FileName
+        self.Pkt_len = Pkt_len
+        self.Payload = Payload      # 'base64' or 'binary'
+        self.Baud = Baud
+        self.Samp_rate = Samp_rate
+        self.Gap = Gap              # extra idle time between packets (s)
+        self.Burst = Burst          # packets of airtime allowed ahead of the line
+        self.state = 0
+        self.pre_count = 0
+        self.indx = 0
+        self._debug = 0
+        self.pkt_key = pmt.intern("packet_len")
+        self.pending = deque()
+        # header (access code + 2 x length) and CRC32 added downstream, in bytes
+        self.overhead = 8 + 4
+        self.tokens = 0.0
+        self.t_last = None
+        self.t_drain = 0.0          # time when everything released so far is on air
+        # Counters instead of per-file prints (see pkt_metrics.py)
+        self.m_packets = pkt_metrics.counter("fsk_source.packets")
+        self.m_bytes = pkt_metrics.counter("fsk_source.bytes")
+        self.m_files = pkt_metrics.counter("fsk_source.files")
+        self.m_done = pkt_metrics.gauge("fsk_source.done")
+        self.t_work = pkt_metrics.work_timer("fsk_source.work")
+        self.waker = pkt_wake.Waker(self)
+        if (os.path.exists(self.FileName)):
+            # open input file
+            self.f_in = open (self.FileName, 'rb')
+            self._eof = False
+            if (self._debug):
+                print ("File name:", self.FileName)
+        else:
+            print(self.FileName, 'does not exist')
+            self._eof = True
+            self.state = 3
+
+        self.char_list = np.array([37,85,85,85,85,85,85,85,85,85,85,85,85,85,85,85, 85,85,85,85,85,85,85,85,85,85,85,85,85,85,85,85, 85,85,85,85,85,85,85,85,85,85,85,85,85,85,85,85, 85,85,85,93], dtype=np.uint8)
+        self.c_len = len (self.char_list)
+        # print (self.c_len)
+        # bucket depth: Burst of the longest packet this source can send
+        max_len = max(self.c_len, 4 * ((self.Pkt_len + 2) // 3), self.Pkt_len + 1, len(self.FileName) + 8)
+        self.depth = self.Burst * self.airtime(max_len)
+
+    def airtime(self, p_len):
+        # seconds the packet occupies the line, plus the inter-packet gap
+        repeat = max(int(self.Samp_rate / self.Baud), 1)
+        return ((p_len + self.overhead) * 8 * repeat) / float(self.Samp_rate) + self.Gap
+
+    def refill(self):
+        # queue the next packet(s) for the current state
+        if (self.state == 0):
+            # send phasing filler (4 packets)
+            self.pending.extend([self.char_list] * (4 - self.pre_count))
+            self.pre_count = 0
+            self.state = 1
+        elif (self.state == 1):
+            buff = self.f_in.read (self.Pkt_len)
+            b_len = len(buff)
+            if b_len == 0:
+                # end of file
+                self.m_files.inc()
+                self._eof = True
+                self.f_in.close()
+                self.state = 2
+                self.pre_count = 0
+                return
+            if (self.Payload == 'binary'):
+                # raw bytes behind a 'D' marker
+                encoded = b'D' + buff
+            else:
+                # convert to Base64
+                encoded = base64.b64encode (buff)
+            if (self._debug):
+                print ('b64 length =', len(encoded))
+            self.pending.append(np.frombuffer(encoded, dtype=np.uint8))
+        elif (self.state == 2):
+            # send file name
+            fn = np.frombuffer(self.FileName.encode(), dtype=np.uint8)
+            self.pending.append(np.concatenate((self.char_list[:8], fn)))
+            self.state = 3
+        elif (self.state == 3):
+            # send post filler (10 packets)
+            self.pending.extend([self.char_list] * (10 - self.pre_count))
+            self.pre_count = 0
+            self.state = 4
+
+    def start(self):
+        self.waker.start()
+        return True
+
+    def stop(self):
+        self.waker.stop()
+        return True
+
+    def work(self, input_items, output_items):
+        now = time.time()
+        if (self.t_last is None):
+            # start with a full bucket so the first burst goes out at once
+            self.t_last = now
+            self.tokens = self.depth
+        self.tokens = min(self.tokens + (now - self.t_last), self.depth)
+        self.t_last = now
+
+        if (self.state == 4 and not self.pending):
+            if (now >= self.t_drain):
+                # end of transmission
+                self.m_done.set(1)
+                self.state = 5
+            else:
+                self.waker.after(self.t_drain - now)
+            return (0)
+        if (self.state == 5):
+            return (0)
+
+        with self.t_work:
+            n = self.fill(output_items[0], now)
+        if (n == 0):
+            # bucket empty: come back when about one packet of credit is back
+            self.waker.after(max(self.airtime(self.c_len) - self.tokens, 0.001))
+        return (n)
+
+    def fill(self, out, now):
+        noutput_items = len(out)
+        n = 0
+        tags = []
+        while True:
+            if (not self.pending):
+                if (self.state >= 4):
+                    break
+                self.refill()
+                continue
+            pkt = self.pending[0]
+            p_len = len(pkt)
+            cost = self.airtime(p_len)
+            if (n + p_len > noutput_items or self.tokens < cost):
+                break
+            out[n:n+p_len] = pkt
+            tags.append((n, p_len))
+            n += p_len
+            self.tokens -= cost
+            self.t_drain = max(self.t_drain, now) + cost
+            self.pending.popleft()
+
+        for (offset, p_len) in tags:
+            self.add_item_tag(0, # Write to output port 0
+                self.indx + offset,   # Index of the tag
+                self.pkt_key,   # Key of the tag
+                pmt.from_long(p_len)    # Value of the tag
+                )
+        self.indx += n
+        self.m_packets.inc(len(tags))
+        self.m_bytes.inc(n)
+        return (n)
+
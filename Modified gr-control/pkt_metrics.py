@@ -0,0 +1,210 @@
+"""
+Lightweight counters, gauges and histograms shared by the Python blocks.
+
+Blocks only bump numbers in memory; nothing is printed or written from
+work(). A background thread snapshots everything every `period` seconds
+and exports it as one JSON object, either published on a ZMQ PUB socket
+or appended as a line to a file.
+
+The exporter starts by itself the first time a metric is created when the
+PKT_METRICS environment variable is set, e.g.
+    PKT_METRICS=tcp://127.0.0.1:5560 python3 pkt_xmt.py --InFile=...
+    PKT_METRICS=file:/tmp/pkt_xmt.jsonl python3 pkt_xmt.py --InFile=...
+PKT_METRICS_PERIOD sets the export period in seconds (default 1.0).
+
+Watch a published stream with:
+    python3 pkt_metrics.py tcp://127.0.0.1:5560
+"""
+
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+
+# histogram bucket upper bounds for work() durations, in seconds
+DURATION_BOUNDS = [1e-6, 2e-6, 5e-6, 1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4,
+                   1e-3, 2e-3, 5e-3, 1e-2, 2e-2, 5e-2, 0.1, 0.2, 0.5, 1.0]
+
+
+class Counter:
+    """Monotonic count, e.g. packets or bytes."""
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    """Last value of something that goes up and down, e.g. bytes/s."""
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    """Bucketed distribution with count and sum, e.g. work() durations."""
+    def __init__(self, bounds=DURATION_BOUNDS):
+        self.bounds = list(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        return {'count': self.count,
+                'sum': self.sum,
+                'bounds': self.bounds,
+                'buckets': list(self.buckets)}
+
+
+class WorkTimer:
+    """Times a block's work() call into a histogram:
+        with self.t_work:
+            ...
+    """
+    def __init__(self, hist):
+        self.hist = hist
+        self.t0 = 0.0
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t0)
+        return False
+
+
+_lock = threading.Lock()
+_metrics = {}
+_exporter = None
+
+
+def _get(name, cls, *args):
+    m = _metrics.get(name)
+    if m is None:
+        with _lock:
+            m = _metrics.get(name)
+            if m is None:
+                m = _metrics[name] = cls(*args)
+        if os.environ.get('PKT_METRICS'):
+            start_exporter(os.environ['PKT_METRICS'],
+                float(os.environ.get('PKT_METRICS_PERIOD', '1.0')))
+    return m
+
+
+def counter(name):
+    return _get(name, Counter)
+
+
+def gauge(name):
+    return _get(name, Gauge)
+
+
+def histogram(name, bounds=DURATION_BOUNDS):
+    return _get(name, Histogram, bounds)
+
+
+def work_timer(name):
+    return WorkTimer(histogram(name))
+
+
+def snapshot():
+    """All metrics as a plain dict, plus a timestamp and the process id."""
+    with _lock:
+        items = list(_metrics.items())
+    return {'time': time.time(),
+            'pid': os.getpid(),
+            'metrics': {name: m.snapshot() for name, m in sorted(items)}}
+
+
+class Exporter(threading.Thread):
+    """Publishes a snapshot every `period` seconds to `target`:
+    a ZMQ endpoint (bound PUB socket) or 'file:<path>' (JSON lines)."""
+    def __init__(self, target, period=1.0):
+        threading.Thread.__init__(self, name='pkt_metrics', daemon=True)
+        self.target = target
+        self.period = period
+        self.running = threading.Event()
+        self.running.set()
+
+    def run(self):
+        socket_zmq = None
+        f_out = None
+        if self.target.startswith('file:'):
+            f_out = open(self.target[len('file:'):], 'a')
+        else:
+            import zmq
+            socket_zmq = zmq.Context.instance().socket(zmq.PUB)
+            socket_zmq.setsockopt(zmq.LINGER, 0)
+            socket_zmq.bind(self.target)
+        try:
+            while self.running.is_set():
+                time.sleep(self.period)
+                line = json.dumps(snapshot())
+                if socket_zmq is not None:
+                    socket_zmq.send_string(line)
+                else:
+                    f_out.write(line + '\n')
+                    f_out.flush()
+        finally:
+            if socket_zmq is not None:
+                socket_zmq.close()
+            if f_out is not None:
+                f_out.close()
+
+    def stop(self):
+        self.running.clear()
+
+
+def start_exporter(target, period=1.0):
+    """Starts the (single, per process) exporter thread."""
+    global _exporter
+    with _lock:
+        if _exporter is None:
+            _exporter = Exporter(target, period)
+            _exporter.start()
+    return _exporter
+
+
+def watch(address):
+    """Prints the counters and gauges published on `address`."""
+    import zmq
+    context = zmq.Context()
+    socket_zmq = context.socket(zmq.SUB)
+    socket_zmq.connect(address)
+    socket_zmq.setsockopt_string(zmq.SUBSCRIBE, "")
+    try:
+        while True:
+            snap = json.loads(socket_zmq.recv_string())
+            print(time.strftime('%H:%M:%S', time.localtime(snap['time'])), 'pid', snap['pid'])
+            for name, value in snap['metrics'].items():
+                if isinstance(value, dict):
+                    mean = (value['sum'] / value['count']) if value['count'] else 0.0
+                    print(f"  {name:40s} n={value['count']} mean={mean * 1e6:.1f} us")
+                else:
+                    print(f"  {name:40s} {value}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        socket_zmq.close()
+        context.term()
+
+
+if __name__ == '__main__':
+    watch(sys.argv[1] if len(sys.argv) > 1 else 'tcp://127.0.0.1:5560')
@@ -0,0 +1,193 @@
+"""
+Monitoring taps: small snapshots of a stream published over ZMQ, so the
+constellations and spectra can be drawn by a separate viewer process
+instead of qtgui sinks inside the flowgraph.
+
+A tap block calls Tap.feed() from work(). Between frames that is only a
+clock check; when a frame is due it copies every `decim`-th sample until
+it has `length` of them and hands the frame to the publisher thread. The
+publisher keeps only the newest frame per tap and sends it on a bound PUB
+socket, so a slow network or any number of viewers never backs up into
+the DSP threads. At most `rate` frames/s leave each tap.
+
+Each message has three parts:
+    tap name
+    JSON header {'tap', 'seq', 'time', 'dtype', 'decim', 'samp_rate'}
+    raw samples (numpy dtype from the header)
+
+View them with:
+    python3 pkt_monitor.py [tcp://127.0.0.1:5561] [tap ...]
+"""
+
+import sys
+import json
+import time
+import threading
+import numpy as np
+import pkt_metrics
+
+ADDRESS = 'tcp://127.0.0.1:5561'
+
+
+class Publisher(threading.Thread):
+    """Sends the newest frame of every tap on one PUB socket."""
+    def __init__(self, address):
+        threading.Thread.__init__(self, name='pkt_monitor', daemon=True)
+        self.address = address
+        self.frames = {}        # tap name -> (header, samples), newest only
+        self.cond = threading.Condition()
+        self.m_dropped = pkt_metrics.counter("monitor.dropped")
+
+    def post(self, name, header, samples):
+        with self.cond:
+            if name in self.frames:
+                # the last one was never sent: replace it
+                self.m_dropped.inc()
+            self.frames[name] = (header, samples)
+            self.cond.notify()
+
+    def run(self):
+        import zmq
+        socket_zmq = zmq.Context.instance().socket(zmq.PUB)
+        socket_zmq.setsockopt(zmq.LINGER, 0)
+        socket_zmq.setsockopt(zmq.SNDHWM, 4)
+        socket_zmq.bind(self.address)
+        try:
+            while True:
+                with self.cond:
+                    while not self.frames:
+                        self.cond.wait()
+                    frames = self.frames
+                    self.frames = {}
+                for name, (header, samples) in frames.items():
+                    socket_zmq.send_multipart([name.encode(),
+                        json.dumps(header).encode(), samples.tobytes()])
+        finally:
+            socket_zmq.close()
+
+
+_lock = threading.Lock()
+_publishers = {}
+
+
+def publisher(address=ADDRESS):
+    """The (single, per process and address) publisher thread."""
+    with _lock:
+        p = _publishers.get(address)
+        if p is None:
+            p = _publishers[address] = Publisher(address)
+            p.start()
+    return p
+
+
+class Tap:
+    """Collects rate-limited, decimated snapshots of a stream:
+        self.tap = pkt_monitor.Tap('equalizer', np.complex64)
+        ...
+        self.tap.feed(input_items[0])
+    """
+    def __init__(self, name, dtype, address=ADDRESS, rate=10.0, length=1024, decim=1, samp_rate=0):
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.address = address
+        self.period = 1.0 / rate if rate > 0 else 0.0
+        self.length = length
+        self.decim = max(int(decim), 1)
+        self.samp_rate = samp_rate
+        self.buf = np.empty(length, dtype=self.dtype)
+        self.fill = 0
+        self.skip = 0           # samples to skip to stay on the decim grid
+        self.t_next = 0.0
+        self.seq = 0
+        self.pub = None
+        self.m_frames = pkt_metrics.counter("monitor.%s.frames" % name)
+
+    def feed(self, samples):
+        if self.fill == 0:
+            now = time.time()
+            if now < self.t_next:
+                return
+            self.t_next = now + self.period
+        part = samples[self.skip::self.decim][:self.length - self.fill]
+        self.buf[self.fill:self.fill + len(part)] = part
+        self.fill += len(part)
+        self.skip = (self.skip - len(samples)) % self.decim
+        if self.fill < self.length:
+            return
+        if self.pub is None:
+            self.pub = publisher(self.address)
+        header = {'tap': self.name, 'seq': self.seq, 'time': time.time(),
+                  'dtype': self.dtype.str, 'decim': self.decim, 'samp_rate': self.samp_rate}
+        self.pub.post(self.name, header, self.buf)
+        self.buf = np.empty(self.length, dtype=self.dtype)
+        self.fill = 0
+        self.skip = 0
+        self.seq += 1
+        self.m_frames.inc()
+
+
+def frames(address=ADDRESS, taps=()):
+    """Yields (header, samples) for the taps published on `address`."""
+    import zmq
+    context = zmq.Context()
+    socket_zmq = context.socket(zmq.SUB)
+    socket_zmq.setsockopt(zmq.RCVHWM, 4)
+    socket_zmq.connect(address)
+    for t in (taps or ('',)):
+        socket_zmq.setsockopt_string(zmq.SUBSCRIBE, t)
+    try:
+        while True:
+            name, header, data = socket_zmq.recv_multipart()
+            header = json.loads(header)
+            if taps and header['tap'] not in taps:
+                continue        # subscriptions match by prefix
+            yield header, np.frombuffer(data, dtype=header['dtype'])
+    finally:
+        socket_zmq.close()
+        context.term()
+
+
+def view(address=ADDRESS, taps=()):
+    """Draws every tap: constellation and spectrum for complex streams,
+    samples against time for real ones. Without matplotlib it prints
+    the mean power of each frame instead."""
+    try:
+        import matplotlib.pyplot as plt
+    except ImportError:
+        plt = None
+    if plt is None:
+        for header, x in frames(address, taps):
+            power = np.mean(np.abs(x.astype(np.complex64)) ** 2)
+            print(f"{header['tap']:12s} seq {header['seq']:6d}  power {10 * np.log10(power + 1e-20):7.1f} dB")
+        return
+
+    plt.ion()
+    axes = {}
+    for header, x in frames(address, taps):
+        name = header['tap']
+        if name not in axes:
+            fig = plt.figure(name)
+            if np.iscomplexobj(x):
+                axes[name] = (fig.add_subplot(1, 2, 1), fig.add_subplot(1, 2, 2))
+            else:
+                axes[name] = (fig.add_subplot(1, 1, 1),)
+        ax = axes[name]
+        for a in ax:
+            a.cla()
+        if np.iscomplexobj(x):
+            ax[0].plot(x.real, x.imag, '.', markersize=2)
+            ax[0].set_aspect('equal')
+            ax[0].set_title('%s  #%d' % (name, header['seq']))
+            spec = np.fft.fftshift(np.abs(np.fft.fft(x * np.hanning(len(x)))) ** 2)
+            rate = header['samp_rate'] / header['decim'] if header['samp_rate'] else 1.0
+            f = np.fft.fftshift(np.fft.fftfreq(len(x), 1.0 / rate))
+            ax[1].plot(f, 10 * np.log10(spec + 1e-20))
+            ax[1].set_xlabel('Hz' if header['samp_rate'] else 'cycles/sample')
+        else:
+            ax[0].plot(x, '.-', markersize=2)
+            ax[0].set_title('%s  #%d' % (name, header['seq']))
+        plt.pause(0.001)
+
+
+if __name__ == '__main__':
+    view(sys.argv[1] if len(sys.argv) > 1 else ADDRESS, tuple(sys.argv[2:]))
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Multi-channel packet receiver: one wideband capture split into --channels
+channels by a polyphase channelizer, with pkt_rcv's demodulator, decoder
+chain and CRC running independently on every channel, so one radio
+receives as many pkt_xmt transmitters as there are channels.
+
+Channel k is centred at --freq + k * spacing, spacing = --samp-rate /
+--channels; channels from --channels/2 on are the negative frequencies
+(k - channels). Each channel comes out of the channelizer at
+--oversample times the spacing, so a transmitter may be off its channel
+centre by up to half the spacing (the coarse CFO correction searches
+that far); one sitting right on a channel edge may be received on both
+channels.
+
+Every decoded PDU (pkt_demod's Packet Payload Decoder output) is published
+on one ZMQ PUB socket, --pdu-addr, with the channel index added to its
+metadata ('channel'). By default every channel runs in its own process
+(spawned); the channelizer process publishes the channel samples on
+--chan-addr + k (pkt_radio's lossless PUB sink) and collects the
+workers' PDUs, which they publish on --pdu-addr + 1 + k. --one-process
+runs everything in one flowgraph.
+
+    python3 pkt_mrcv.py --channels 8
+    python3 pkt_mrcv.py --radio tcp://127.0.0.1:49201 --samp-rate 768000 --channels 4
+ARQ (--window, as pkt_xmt's) acks channel k on --ack-addr + k, so the
+transmitter on channel 0 gets its acks where pkt_xmt listens by default.
+--directory puts each channel's received files in <directory>/ch<k>; a
+file that lost packets stays <name>.part (--window retransmits them).
+PKT_METRICS / PKT_PERF of the workers go to the same address + 1 + k
+(tcp) or <path>.<1 + k> (file:).
+"""
+
+import os
+import sys
+import time
+import signal
+import multiprocessing
+from argparse import ArgumentParser
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from gnuradio import gr, blocks, filter, uhd, zeromq
+from gnuradio.filter import firdes
+from gnuradio.fft import window
+import pmt
+import pkt_demod
+import pkt_metrics
+import pkt_radio
+import pkt_perf
+
+
+def channel_freq(k, samp_rate, channels):
+    """Offset of channel k from the centre frequency, Hz."""
+    return (k if k < channels // 2 else k - channels) * samp_rate / channels
+
+
+def channel_rate(samp_rate, channels, oversample):
+    """Sample rate of each channel, checked against the demodulator's
+    sym_rate * sps (rx_decim must come out whole)."""
+    if oversample < 2:
+        raise ValueError("--oversample must be at least 2, got %d" % oversample)
+    if channels % oversample:
+        raise ValueError("--channels must be a multiple of --oversample, got %d / %d" % (channels, oversample))
+    rate = samp_rate * oversample / channels
+    if rate % 48000:
+        raise ValueError("channel rate %g is not a multiple of 48000 (12000 sym/s x 4 sps)" % rate)
+    return rate
+
+
+def channelizer_taps(samp_rate, channels):
+    """Prototype low-pass of the channelizer, at the wideband rate: flat to
+    0.6 spacing (a transmitter half a spacing off, and its bandwidth), down
+    by the next channel centre. With oversample 2 or more, nothing folds
+    back into the flat part."""
+    spacing = samp_rate / channels
+    return firdes.low_pass(1.0, samp_rate, 0.8 * spacing, 0.4 * spacing, window.WIN_BLACKMAN_hARRIS, 6.76)
+
+
+class channel_tag(gr.basic_block):
+    """Adds 'channel' to the metadata of every PDU passing through."""
+    def __init__(self, channel):
+        gr.basic_block.__init__(self, name='channel_tag', in_sig=None, out_sig=None)
+        self.channel = channel
+        self.key = pmt.intern('channel')
+        self.value = pmt.from_long(channel)
+        self.m_pdus = pkt_metrics.counter("mrcv.ch%d.pdus" % channel)
+        self.message_port_register_in(pmt.intern('in'))
+        self.message_port_register_out(pmt.intern('out'))
+        self.set_msg_handler(pmt.intern('in'), self.handle_msg)
+
+    def handle_msg(self, msg):
+        meta = pmt.car(msg)
+        if not pmt.is_dict(meta):
+            meta = pmt.make_dict()
+        self.m_pdus.inc()
+        self.message_port_pub(pmt.intern('out'), pmt.cons(pmt.dict_add(meta, self.key, self.value), pmt.cdr(msg)))
+
+
+class channel_demod(gr.hier_block2):
+    """pkt_demod's receive chain for channel k at `chan_rate`, its PDUs
+    tagged with the channel on the 'pdus' message port."""
+
+    def __init__(self, channel, chan_rate, max_cfo, window_size=0, ack_addr='', directory='', fec_code='conv', fec_depth=16):
+        gr.hier_block2.__init__(self, "channel_demod",
+            gr.io_signature(1, 1, gr.sizeof_gr_complex), gr.io_signature(0, 0, 0))
+        self.message_port_register_hier_out('pdus')
+        self.demod = pkt_demod.demod(chan_rate, max_cfo, window_size, ack_addr, directory, fec_code, fec_depth)
+        self.tag = channel_tag(channel)
+        self.msg_connect((self.demod, 'pdus'), (self.tag, 'in'))
+        self.msg_connect((self.tag, 'out'), (self, 'pdus'))
+        self.connect(self, self.demod)
+
+
+def _demod(k, options, rate):
+    # the CFO search reaches the channel edges
+    return channel_demod(k, rate, options.samp_rate / options.channels / 2,
+        window_size=options.window,
+        ack_addr=pkt_radio.offset_address(options.ack_addr, k),
+        directory=os.path.join(options.directory, 'ch%d' % k) if options.directory else '',
+        fec_code=options.fec)
+
+
+class pkt_mrcv(gr.top_block):
+    """The wideband source and the channelizer; with split=True the channel
+    samples go out to the worker processes and their PDUs come back,
+    otherwise every channel's demod runs here."""
+
+    def __init__(self, options, split=True):
+        gr.top_block.__init__(self, "pkt_mrcv", catch_exceptions=True)
+        self.samp_rate = samp_rate = options.samp_rate
+        self.channels = channels = options.channels
+        self.chan_rate = chan_rate = channel_rate(samp_rate, channels, options.oversample)
+
+        if options.radio == 'uhd':
+            self.source = uhd.usrp_source(
+                ",".join(("", '')),
+                uhd.stream_args(
+                    cpu_format="fc32",
+                    args='',
+                    channels=list(range(0,1)),
+                ),
+            )
+            self.source.set_samp_rate(samp_rate)
+            self.source.set_center_freq(options.freq, 0)
+            self.source.set_antenna("TX/RX", 0)
+            self.source.set_bandwidth(samp_rate, 0)
+            self.source.set_gain(options.gain, 0)
+        else:
+            self.source = pkt_radio.source(options.radio)
+        self.channelizer = filter.pfb.channelizer_ccf(
+            channels, channelizer_taps(samp_rate, channels), options.oversample, 100)
+        self.pdu_sink = zeromq.pub_msg_sink(options.pdu_addr, 100, True)
+        self.connect(self.source, self.channelizer)
+
+        self.chan_sinks = []
+        self.pdu_sources = []
+        self.demods = []
+        for k in range(channels):
+            if split:
+                sink = zeromq.pub_sink(gr.sizeof_gr_complex, 1, pkt_radio.offset_address(options.chan_addr, k), 100, False, (-1), '', False, True)
+                source = zeromq.sub_msg_source(pkt_radio.offset_address(options.pdu_addr, 1 + k), 100, False)
+                self.connect((self.channelizer, k), sink)
+                self.msg_connect((source, 'out'), (self.pdu_sink, 'in'))
+                self.chan_sinks.append(sink)
+                self.pdu_sources.append(source)
+            else:
+                d = _demod(k, options, chan_rate)
+                self.connect((self.channelizer, k), d)
+                self.msg_connect((d, 'pdus'), (self.pdu_sink, 'in'))
+                self.demods.append(d)
+        if options.print_pdus:
+            self.message_debug = blocks.message_debug(True, gr.log_levels.info)
+            for s in self.pdu_sources or self.demods:
+                self.msg_connect((s, 'out' if split else 'pdus'), (self.message_debug, 'print'))
+
+
+class channel_rcv(gr.top_block):
+    """One worker: channel k's samples from the channelizer process into
+    demod, PDUs back on --pdu-addr + 1 + k."""
+
+    def __init__(self, k, options):
+        gr.top_block.__init__(self, "pkt_mrcv_ch%d" % k, catch_exceptions=True)
+        rate = channel_rate(options.samp_rate, options.channels, options.oversample)
+        self.source = zeromq.sub_source(gr.sizeof_gr_complex, 1, pkt_radio.offset_address(options.chan_addr, k), 100, False, (-1), '', False)
+        self.demod = _demod(k, options, rate)
+        self.pdu_sink = zeromq.pub_msg_sink(pkt_radio.offset_address(options.pdu_addr, 1 + k), 100, True)
+        self.connect(self.source, self.demod)
+        self.msg_connect((self.demod, 'pdus'), (self.pdu_sink, 'in'))
+
+
+def run_channel(k, options):
+    # the worker's own metrics / perf endpoints, next to the parent's
+    for var in ('PKT_METRICS', 'PKT_PERF'):
+        if os.environ.get(var):
+            os.environ[var] = pkt_radio.offset_address(os.environ[var], 1 + k)
+    tb = channel_rcv(k, options)
+
+    def sig_handler(sig=None, frame=None):
+        tb.stop()
+        tb.wait()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, sig_handler)
+    signal.signal(signal.SIGTERM, sig_handler)
+
+    pkt_perf.attach(tb)
+    tb.start()
+    tb.wait()
+
+
+def argument_parser():
+    parser = ArgumentParser(description='multi-channel packet receiver (polyphase channelizer + one pkt_rcv chain per channel)')
+    parser.add_argument("--radio", dest="radio", type=str, default='uhd',
+        help="uhd, or a ZMQ address / file:<path> standing in for the USRP (see pkt_radio.py) [default=%(default)r]")
+    parser.add_argument("--freq", dest="freq", type=float, default=2.45e9,
+        help="Centre frequency (uhd) [default=%(default)r]")
+    parser.add_argument("--gain", dest="gain", type=float, default=20,
+        help="RX gain (uhd) [default=%(default)r]")
+    parser.add_argument("--samp-rate", dest="samp_rate", type=float, default=768000,
+        help="Wideband sample rate [default=%(default)r]")
+    parser.add_argument("--channels", dest="channels", type=int, default=8,
+        help="Number of channels [default=%(default)r]")
+    parser.add_argument("--oversample", dest="oversample", type=int, default=2,
+        help="Channel rate / channel spacing, 2 or more [default=%(default)r]")
+    parser.add_argument("--one-process", dest="one_process", action="store_true",
+        help="Run all channels in this process instead of one worker each")
+    parser.add_argument("--chan-addr", dest="chan_addr", type=str, default='tcp://127.0.0.1:49210',
+        help="Channel k's samples go to this address + k (workers) [default=%(default)r]")
+    parser.add_argument("--pdu-addr", dest="pdu_addr", type=str, default='tcp://127.0.0.1:5570',
+        help="PUB socket for the PDUs of all channels [default=%(default)r]")
+    parser.add_argument("--ack-addr", dest="ack_addr", type=str, default='tcp://127.0.0.1:5557',
+        help="ARQ acks of channel k go to this address + k [default=%(default)r]")
+    parser.add_argument("--window", dest="window", type=int, default=0,
+        help="ARQ window, 0 = off [default=%(default)r]")
+    parser.add_argument("--fec", dest="fec", type=str, default='conv',
+        help="FEC code none/hamming/conv, as pkt_xmt's [default=%(default)r]")
+    parser.add_argument("--directory", dest="directory", type=str, default='',
+        help="Write the received files to <directory>/ch<k>, incomplete ones as <name>.part [default: don't]")
+    parser.add_argument("--print", dest="print_pdus", action="store_true",
+        help="Print the PDUs, as pkt_rcv does")
+    return parser
+
+
+def main(options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    rate = channel_rate(options.samp_rate, options.channels, options.oversample)
+    for k in range(options.channels):
+        print("channel %d: %+.0f Hz, %g S/s" % (k, channel_freq(k, options.samp_rate, options.channels), rate))
+    split = not options.one_process
+
+    procs = []
+    if split:
+        ctx = multiprocessing.get_context('spawn')
+        procs = [ctx.Process(target=run_channel, args=(k, options), name='pkt_mrcv_ch%d' % k)
+                 for k in range(options.channels)]
+        for p in procs:
+            p.start()
+    tb = pkt_mrcv(options, split)
+
+    def sig_handler(sig=None, frame=None):
+        tb.stop()
+        tb.wait()
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.join(5.0)
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, sig_handler)
+    signal.signal(signal.SIGTERM, sig_handler)
+
+    pkt_perf.attach(tb)
+    tb.start()
+    running = list(procs)
+    while True:
+        # a worker that died takes its channel with it; say so
+        for p in [p for p in running if p.exitcode is not None]:
+            print("pkt_mrcv: %s exited (%d)" % (p.name, p.exitcode), file=sys.stderr)
+            running.remove(p)
+        time.sleep(1.0)
+
+
+if __name__ == '__main__':
+    main()
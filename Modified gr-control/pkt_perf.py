@@ -0,0 +1,191 @@
+"""
+Per-block performance counters of a running flowgraph, exported every
+`period` seconds so we can see which block saturates first.
+
+For every block of the flowgraph (and the blocks inside hier blocks such
+as the modulator) one snapshot holds
+    work_s          time spent in work() since start
+    busy            share of the last period spent in work() (0..1)
+    noutput         average noutput_items per work() call
+    nproduced       average items produced per call
+    in_full         average fullness of each input buffer (0..1)
+    out_full        average fullness of each output buffer (0..1)
+    throughput      average output items/s
+plus 'bottleneck': the busiest block. A block that is busy most of the
+time while its input buffers fill up is the one holding the rest back.
+
+Like pkt_metrics, nothing happens unless the PKT_PERF environment
+variable is set, to a ZMQ endpoint (bound PUB socket, topic
+'perf.<flowgraph>') or 'file:<path>' (JSON lines):
+    PKT_PERF=tcp://127.0.0.1:5562 python3 pkt_rcv.py --headless ...
+    PKT_PERF=file:/tmp/pkt_rcv_perf.jsonl python3 pkt_rcv.py ...
+PKT_PERF_PERIOD sets the period in seconds (default 1.0). The flowgraphs
+call attach(tb) before tb.start(), which switches the GNU Radio
+performance counters on.
+
+Watch the busiest blocks live with:
+    python3 pkt_perf.py tcp://127.0.0.1:5562
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+
+from gnuradio import gr
+
+
+def enable():
+    """Switches the GNU Radio performance counters on; they are read when
+    the flowgraph starts, so call this before tb.start()."""
+    os.environ['GR_CONF_PERFCOUNTERS_ON'] = 'True'
+    prefs = gr.prefs.singleton() if hasattr(gr.prefs, 'singleton') else gr.prefs()
+    prefs.set_bool('PerfCounters', 'on', True)
+
+
+def _tps():
+    return gr.high_res_timer_tps() if hasattr(gr, 'high_res_timer_tps') else 1e9
+
+
+def blocks_of(tb, prefix=''):
+    """(name, block) for the blocks a flowgraph holds as attributes,
+    including the ones inside its hier blocks."""
+    found = []
+    for k, v in sorted(vars(tb).items()):
+        if k.startswith('_'):
+            continue
+        if hasattr(v, 'pc_work_time_total'):
+            found.append((prefix + k, v))
+        elif isinstance(v, gr.hier_block2) and not prefix:
+            found.extend(blocks_of(v, k + '.'))
+    return found
+
+
+def _call(blk, method, default=None):
+    try:
+        return getattr(blk, method)()
+    except (RuntimeError, AttributeError, TypeError):
+        return default
+
+
+def block_stats(blk):
+    """Counters of one block, None when it has none (not running, or the
+    counters are off)."""
+    total = _call(blk, 'pc_work_time_total')
+    if total is None:
+        return None
+    return {'work_s': total / _tps(),
+            'noutput': _call(blk, 'pc_noutput_items_avg', 0.0),
+            'nproduced': _call(blk, 'pc_nproduced_avg', 0.0),
+            'in_full': [round(x, 3) for x in _call(blk, 'pc_input_buffers_full_avg', [])],
+            'out_full': [round(x, 3) for x in _call(blk, 'pc_output_buffers_full_avg', [])],
+            'throughput': _call(blk, 'pc_throughput_avg', 0.0)}
+
+
+class Exporter(threading.Thread):
+    """Publishes the block counters of `tb` every `period` seconds to
+    `target`: a ZMQ endpoint (bound PUB socket) or 'file:<path>'."""
+    def __init__(self, tb, target, period=1.0):
+        threading.Thread.__init__(self, name='pkt_perf', daemon=True)
+        self.tb = tb
+        self.target = target
+        self.period = period
+        self.topic = 'perf.' + tb.name()
+        self.blocks = blocks_of(tb)
+        self.last = {}          # block name -> work_s at the last snapshot
+        self.t_last = None
+        self.running = threading.Event()
+        self.running.set()
+
+    def snapshot(self):
+        now = time.time()
+        dt = (now - self.t_last) if self.t_last else None
+        self.t_last = now
+        stats = {}
+        for name, blk in self.blocks:
+            s = block_stats(blk)
+            if s is None:
+                continue
+            s['busy'] = round(min((s['work_s'] - self.last.get(name, 0.0)) / dt, 1.0), 3) if dt else 0.0
+            self.last[name] = s['work_s']
+            s['work_s'] = round(s['work_s'], 6)
+            stats[name] = s
+        busiest = max(stats, key=lambda n: (stats[n]['busy'], sum(stats[n]['in_full'])), default=None)
+        return {'time': now, 'pid': os.getpid(), 'flowgraph': self.tb.name(),
+                'period': self.period, 'bottleneck': busiest, 'blocks': stats}
+
+    def run(self):
+        socket_zmq = None
+        f_out = None
+        if self.target.startswith('file:'):
+            f_out = open(self.target[len('file:'):], 'a')
+        else:
+            import zmq
+            socket_zmq = zmq.Context.instance().socket(zmq.PUB)
+            socket_zmq.setsockopt(zmq.LINGER, 0)
+            socket_zmq.bind(self.target)
+        try:
+            self.snapshot()     # baseline for the first busy figures
+            while self.running.is_set():
+                time.sleep(self.period)
+                line = json.dumps(self.snapshot())
+                if socket_zmq is not None:
+                    socket_zmq.send_multipart([self.topic.encode(), line.encode()])
+                else:
+                    f_out.write(line + '\n')
+                    f_out.flush()
+        finally:
+            if socket_zmq is not None:
+                socket_zmq.close()
+            if f_out is not None:
+                f_out.close()
+
+    def stop(self):
+        self.running.clear()
+
+
+def attach(tb, target=None, period=None):
+    """Starts exporting the counters of `tb` when PKT_PERF (or `target`)
+    is set; returns the exporter or None. Call before tb.start()."""
+    target = target or os.environ.get('PKT_PERF')
+    if not target:
+        return None
+    if period is None:
+        period = float(os.environ.get('PKT_PERF_PERIOD', '1.0'))
+    enable()
+    exporter = Exporter(tb, target, period)
+    exporter.start()
+    return exporter
+
+
+def watch(address, top=8):
+    """Shows the busiest blocks published on `address`, refreshed live."""
+    import zmq
+    context = zmq.Context()
+    socket_zmq = context.socket(zmq.SUB)
+    socket_zmq.connect(address)
+    socket_zmq.setsockopt_string(zmq.SUBSCRIBE, 'perf.')
+    try:
+        while True:
+            topic, line = socket_zmq.recv_multipart()
+            snap = json.loads(line)
+            rows = sorted(snap['blocks'].items(), key=lambda kv: -kv[1]['busy'])
+            print('\033[2J\033[H', end='')
+            print(time.strftime('%H:%M:%S', time.localtime(snap['time'])), snap['flowgraph'],
+                  'pid', snap['pid'], '  bottleneck:', snap['bottleneck'])
+            print(f"  {'block':40s} {'busy':>6s} {'in full':>8s} {'out full':>8s} {'items/call':>10s} {'items/s':>12s}")
+            for name, s in rows[:top]:
+                in_full = max(s['in_full'], default=0.0)
+                out_full = max(s['out_full'], default=0.0)
+                print(f"  {name:40s} {100 * s['busy']:5.1f}% {in_full:8.2f} {out_full:8.2f} "
+                      f"{s['noutput']:10.1f} {s['throughput']:12.0f}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        socket_zmq.close()
+        context.term()
+
+
+if __name__ == '__main__':
+    watch(sys.argv[1] if len(sys.argv) > 1 else 'tcp://127.0.0.1:5562')
@@ -0,0 +1,101 @@
+"""
+The known start of every burst -- the frame builder's preamble
+(0xAA 0x55 x4) followed by the access code -- as the channel symbols the
+transmitter sends, and a correlator that finds it in the symbol-synced
+stream, so the linear equalizer can train on it:
+    training = pkt_preamble.training_symbols('bpsk')
+    digital.linear_equalizer(15, 2, alg, True, training, 'corr_est')
+The Preamble Correlator EPBs put the 'corr_est' tag on the first symbol
+of each burst; the equalizer then adapts on the known symbols and goes
+on decision-directed (adapt_after_training) until the next burst.
+
+The modulators are differential, so the symbols are only known up to a
+rotation (the encoder state before the burst, and the
+Costas loop's phase ambiguity). The correlator measures that rotation,
+and the amplitude, and takes them out of the samples that follow.
+"""
+
+import numpy as np
+
+PREAMBLE = [0xAA, 0x55, 0xAA, 0x55, 0xAA, 0x55, 0xAA, 0x55]
+ACCESS_CODE = '11100001010110101110100010010011'
+
+# bits per symbol, constellation points as the transmitters map them
+CONSTELLATIONS = {
+    'bpsk': (1, [-1, 1]),
+    'qpsk': (2, [0.707+0.707j, -0.707+0.707j, -0.707-0.707j, 0.707-0.707j]),
+}
+
+
+def start_bytes(preamble=PREAMBLE, access_code=ACCESS_CODE):
+    """Preamble and access code as bytes, for sources without a frame
+    builder that still want to be trained on."""
+    code = np.packbits(np.array([int(b) for b in access_code], dtype=np.uint8))
+    return list(preamble) + [int(b) for b in code]
+
+
+def training_symbols(modulation='bpsk', preamble=PREAMBLE, access_code=ACCESS_CODE):
+    """Channel symbols of preamble + access code: MSB first, differential
+    encoder (from state 0), constellation points."""
+    k, points = CONSTELLATIONS[modulation]
+    bits = np.concatenate((np.unpackbits(np.array(preamble, dtype=np.uint8)),
+                           np.array([int(b) for b in access_code], dtype=np.uint8)))
+    chunks = bits[:len(bits) // k * k].reshape(-1, k)
+    values = chunks.astype(int) @ (1 << np.arange(k - 1, -1, -1))
+    state = np.cumsum(values) % len(points)
+    return [complex(points[s]) for s in state]
+
+
+class Correlator:
+    """Finds `symbols` in a stream of `sps` samples per symbol. feed()
+    returns the input delayed by 2 template lengths (time to be sure a
+    peak is the highest around), divided by the complex gain measured on
+    the last burst, and the output indexes of the burst starts with their
+    normalized correlation (0..1). A burst start is marked mark_delay
+    samples after its first symbol."""
+    def __init__(self, symbols, sps=2, threshold=0.6, mark_delay=0):
+        self.symbols = np.asarray(symbols, dtype=np.complex64)
+        self.sps = sps
+        self.threshold = threshold
+        self.mark_delay = mark_delay    # -span .. 2 * span
+        self.span = sps * (len(self.symbols) - 1) + 1
+        self.template = np.zeros(self.span, dtype=np.complex64)
+        self.template[::sps] = self.symbols
+        self.mask = (self.template != 0).astype(np.float32)
+        self.energy = float(np.sum(np.abs(self.symbols) ** 2))
+        self.delay = 2 * self.span - mark_delay
+        self.hist = np.zeros(3 * self.span, dtype=np.complex64)
+        self.gain = 1.0         # received / sent, for the current burst
+        self.last = -self.span  # hist index of the last burst start
+
+    def feed(self, x):
+        buf = np.concatenate((self.hist, x))
+        n = len(x)
+        S = self.span
+        # metric[j] for a burst starting at buf[j]
+        corr = np.correlate(buf, self.template, 'valid')
+        power = np.convolve(np.abs(buf) ** 2, self.mask[::-1], 'valid')
+        metric = np.abs(corr) ** 2 / (self.energy * power + 1e-20)
+        # starts that have S samples of metric on both sides are decided
+        # now; their marks come out at j - S, inside this call's output
+        marks = []
+        for j in np.nonzero(metric[S:S + n] >= self.threshold)[0] + S:
+            if j - self.last <= S:
+                continue
+            around = metric[j - S:j + S + 1]
+            if metric[j] < around.max() or np.argmax(around) < S:
+                continue
+            self.last = j
+            marks.append((j, float(metric[j]), corr[j] / self.energy))
+        # output: the input `delay` samples back, so that buf[j + mark_delay]
+        # comes out at j - S
+        y = buf[S + self.mark_delay:S + self.mark_delay + n].copy()
+        at = 0
+        for j, metric_j, gain in marks:
+            y[at:j - S] /= self.gain
+            self.gain = gain
+            at = j - S
+        y[at:] /= self.gain
+        self.hist = buf[n:]
+        self.last -= n
+        return y, [(int(j - S), m) for j, m, g in marks]
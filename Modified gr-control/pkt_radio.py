@@ -0,0 +1,52 @@
+"""
+Stand-ins for the USRP blocks, so pkt_xmt and pkt_rcv run without radios.
+
+The `radio` argument of both flowgraphs (--radio on the command line) is
+    uhd                 the USRP, as before
+    tcp://host:port     ZMQ: pkt_xmt binds a PUB socket there, pkt_rcv
+                        connects a SUB socket, matching chan_loopback
+                        (which subscribes to :49203 and publishes on :49201)
+    push:tcp://host:port
+                        the same over PUSH/PULL (pkt_zmq.py), lossless and
+                        with drop / lag counters; chan_loopback needs
+                        --transport pushpull
+    file:<path>         complex samples to / from a raw file
+
+The ZMQ sink does not drop at the high-water mark; it waits for the
+subscriber instead, so an unthrottled run loses no samples in transport.
+"""
+
+from gnuradio import gr, blocks, zeromq
+import pkt_zmq
+
+TX_ADDRESS = 'tcp://127.0.0.1:49203'   # chan_loopback input
+RX_ADDRESS = 'tcp://127.0.0.1:49201'   # chan_loopback output
+
+
+def sink(radio):
+    """Block taking pkt_xmt's complex samples in place of the USRP sink."""
+    if radio.startswith('file:'):
+        blk = blocks.file_sink(gr.sizeof_gr_complex*1, radio[len('file:'):], False)
+        blk.set_unbuffered(False)
+        return blk
+    if radio.startswith('push:'):
+        return pkt_zmq.sink(radio[len('push:'):], gr.sizeof_gr_complex)
+    return zeromq.pub_sink(gr.sizeof_gr_complex, 1, radio, 100, False, (-1), '', False, True)
+
+
+def source(radio):
+    """Block feeding pkt_rcv with complex samples in place of the USRP source."""
+    if radio.startswith('file:'):
+        return blocks.file_source(gr.sizeof_gr_complex*1, radio[len('file:'):], False, 0, 0)
+    if radio.startswith('push:'):
+        return pkt_zmq.source(radio[len('push:'):], gr.sizeof_gr_complex)
+    return zeromq.sub_source(gr.sizeof_gr_complex, 1, radio, 100, False, (-1), '', False)
+
+
+def offset_address(address, k):
+    """The k-th of a series of addresses, for processes that each need
+    their own: tcp://host:port + k, or <path>.<k> for ipc:// and file:."""
+    if address.startswith('tcp://'):
+        host, port = address.rsplit(':', 1)
+        return '%s:%d' % (host, int(port) + k)
+    return '%s.%d' % (address, k)
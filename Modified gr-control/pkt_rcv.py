@@ -28,14 +28,174 @@ from gnuradio import eng_notation
 from gnuradio import gr, pdu
 from gnuradio import uhd
 import time
+from gnuradio import zeromq
+import pkt_rcv_epy_block_0 as epy_block_0  # embedded python block
+import pkt_rcv_epy_block_1 as epy_block_1  # embedded python block
+import pkt_rcv_epy_block_2 as epy_block_2  # embedded python block
+import pkt_rcv_epy_block_3 as epy_block_3  # embedded python block
+import pkt_rcv_epy_block_4 as epy_block_4  # embedded python block
+import pkt_rcv_epy_block_5 as epy_block_5  # embedded python block
+import pkt_rcv_epy_block_6 as epy_block_6  # embedded python block
+import pkt_rcv_epy_block_7 as epy_block_7  # embedded python block
+import pkt_preamble
+import pkt_radio
+import pkt_perf
+import pkt_shm
+import os
 import sip
 
+# --cut: where --part front / back split the receiver (see pkt_shm.py),
+# the stream connection that goes through shared memory
+CUTS = {
+    'channel': ('fir_filter_xxx_0', 'digital_costas_loop_cc_0', gr.sizeof_gr_complex),
+    'sync': ('digital_symbol_sync_xx_0', 'epy_block_7', gr.sizeof_gr_complex),
+    'equalizer': ('digital_linear_equalizer_0', 'digital_constellation_decoder_cb_0', gr.sizeof_gr_complex),
+    'bits': ('digital_correlate_access_code_xx_ts_0', 'blocks_repack_bits_bb_1_0', gr.sizeof_char),
+}
 
 
 class pkt_rcv(gr.top_block, Qt.QWidget):
 
-    def __init__(self):
+    def __init__(self, headless=False, radio='uhd', part='all', cut='sync', shm='pkt_rcv'):
         gr.top_block.__init__(self, "pkt_rcv", catch_exceptions=True)
+        self.display = False
+        self.radio = radio
+        self.part = part
+
+        ##################################################
+        # Variables
+        ##################################################
+        self.usrp_rate = usrp_rate = 768000
+        self.bpsk = bpsk = digital.constellation_bpsk().base()
+        self.bpsk.set_npwr(1.0)
+        self.variable_adaptive_algorithm_0 = variable_adaptive_algorithm_0 = digital.adaptive_algorithm_nlms( bpsk, 0.3).base()
+        self.training = training = pkt_preamble.training_symbols('bpsk')
+        self.thresh = thresh = 18
+        self.sym_rate = sym_rate = 12000
+        self.sps = sps = 4
+        self.rx_decim = rx_decim = int(usrp_rate/(sym_rate*sps))
+        self.samp_rate = samp_rate = usrp_rate/rx_decim
+        self.phase_bw = phase_bw = 0.0628
+        self.monitor_addr = monitor_addr = 'tcp://127.0.0.1:5561'
+        self.max_cfo = max_cfo = 100000
+        self.fec_depth = fec_depth = 16
+        self.fec_code = fec_code = 'conv'
+        self.excess_bw = excess_bw = 0.35
+        self.rx_passband = rx_passband = sym_rate*(1+excess_bw)/2 + 4000
+        self.rx_taps = rx_taps = firdes.low_pass(1.0, usrp_rate, samp_rate/2, samp_rate - 2*rx_passband, window.WIN_HAMMING, 6.76)
+        self.arq_window = arq_window = 16
+        self.MTU = MTU = 1500
+        if part == 'back':
+            # the front process publishes its taps on monitor_addr
+            self.monitor_addr = monitor_addr = pkt_radio.offset_address(monitor_addr, 1)
+
+        ##################################################
+        # Blocks
+        ##################################################
+
+        if part != 'front':
+            self.zeromq_pub_msg_sink_1 = zeromq.pub_msg_sink("tcp://127.0.0.1:5557", 100, True)
+        else:
+            # binds the ack address: only where the decoder runs
+            self.zeromq_pub_msg_sink_1 = None
+        if part == 'back':
+            # the radio is the front process's
+            self.uhd_usrp_source_0 = None
+        elif radio == 'uhd':
+            self.uhd_usrp_source_0 = uhd.usrp_source(
+                ",".join(("", '')),
+                uhd.stream_args(
+                    cpu_format="fc32",
+                    args='',
+                    channels=list(range(0,1)),
+                ),
+            )
+            self.uhd_usrp_source_0.set_samp_rate(usrp_rate)
+            # No synchronization enforced.
+
+            self.uhd_usrp_source_0.set_center_freq(2.45*10**9, 0)
+            self.uhd_usrp_source_0.set_antenna("TX/RX", 0)
+            self.uhd_usrp_source_0.set_bandwidth((usrp_rate/sps), 0)
+            self.uhd_usrp_source_0.set_gain(20, 0)
+        else:
+            # no radio: take the samples from chan_loopback (see pkt_radio.py)
+            self.uhd_usrp_source_0 = pkt_radio.source(radio)
+        # channel select: down to sps samples per symbol before the sync loops
+        self.fir_filter_xxx_0 = filter.fir_filter_ccf(rx_decim, rx_taps)
+        self.fir_filter_xxx_0.declare_sample_delay(0)
+        self.pdu_tagged_stream_to_pdu_0 = pdu.tagged_stream_to_pdu(gr.types.byte_t, 'packet_len')
+        # burst starts for the equalizer's training
+        self.epy_block_7 = epy_block_7.blk(Modulation='bpsk', Sps=2, Threshold=0.6, Mark_delay=0)
+        # coarse carrier offset from the frame preamble, ahead of the channel filter
+        self.epy_block_6 = epy_block_6.blk(Samp_rate=usrp_rate, Sym_rate=sym_rate, Max_offset=max_cfo, Threshold=8.0, Runs=3)
+        self.epy_block_5 = epy_block_5.blk(Tap='correlator', Address=monitor_addr, Rate=10, Length=1024, Decim=1, Samp_rate=samp_rate/sps)
+        self.epy_block_4 = epy_block_4.blk(Tap='equalizer', Address=monitor_addr, Rate=10, Length=1024, Decim=1, Samp_rate=samp_rate/sps)
+        self.epy_block_3 = epy_block_3.blk(Tap='costas', Address=monitor_addr, Rate=10, Length=1024, Decim=1, Samp_rate=samp_rate)
+        self.epy_block_2 = epy_block_2.blk(Directory='.', Buf_size=65536)
+        self.epy_block_1 = epy_block_1.blk(Code=fec_code, Depth=fec_depth)
+        self.epy_block_0 = epy_block_0.blk(Payload='binary', Crc_len=4, Window=arq_window)
+        self.digital_symbol_sync_xx_0 = digital.symbol_sync_cc(
+            digital.TED_GARDNER,
+            sps,
+            phase_bw,
+            1.0,
+            1.0,
+            1.5,
+            2,
+            digital.constellation_bpsk().base(),
+            digital.IR_MMSE_8TAP,
+            128,
+            [])
+        self.digital_map_bb_0 = digital.map_bb([0,1])
+        self.digital_linear_equalizer_0 = digital.linear_equalizer(15, 2, variable_adaptive_algorithm_0, True, training, 'corr_est')
+        self.digital_diff_decoder_bb_0 = digital.diff_decoder_bb(2, digital.DIFF_DIFFERENTIAL)
+        self.digital_crc_check_0 = digital.crc_check(32, 0x4C11DB7, 0xFFFFFFFF, 0xFFFFFFFF, True, True, False, False, 0)
+        self.digital_costas_loop_cc_0 = digital.costas_loop_cc(phase_bw, 2, False)
+        self.digital_correlate_access_code_xx_ts_0 = digital.correlate_access_code_bb_ts("11100001010110101110100010010011",
+          thresh, 'packet_len')
+        self.digital_constellation_decoder_cb_0 = digital.constellation_decoder_cb(bpsk)
+        self.blocks_repack_bits_bb_1_0 = blocks.repack_bits_bb(1, 8, "packet_len", False, gr.GR_MSB_FIRST)
+        self.blocks_message_debug_0 = blocks.message_debug(True, gr.log_levels.info)
+
+
+        ##################################################
+        # Connections
+        ##################################################
+        if part != 'all':
+            # only this part's connections, and the cut through shared memory
+            cut_src, cut_dst, cut_size = CUTS[cut]
+            split = pkt_shm.Split(self, part, ((getattr(self, cut_src), 0), (getattr(self, cut_dst), 0)), shm, cut_size)
+        self.msg_connect((self.digital_crc_check_0, 'ok'), (self.epy_block_0, 'in'))
+        self.msg_connect((self.epy_block_0, 'ack'), (self.zeromq_pub_msg_sink_1, 'in'))
+        self.msg_connect((self.epy_block_0, 'out'), (self.blocks_message_debug_0, 'print'))
+        self.msg_connect((self.epy_block_0, 'out'), (self.epy_block_2, 'in'))
+        self.msg_connect((self.epy_block_1, 'out'), (self.digital_crc_check_0, 'in'))
+        self.msg_connect((self.pdu_tagged_stream_to_pdu_0, 'pdus'), (self.epy_block_1, 'in'))
+        self.connect((self.blocks_repack_bits_bb_1_0, 0), (self.pdu_tagged_stream_to_pdu_0, 0))
+        self.connect((self.digital_constellation_decoder_cb_0, 0), (self.digital_diff_decoder_bb_0, 0))
+        self.connect((self.digital_correlate_access_code_xx_ts_0, 0), (self.blocks_repack_bits_bb_1_0, 0))
+        self.connect((self.digital_correlate_access_code_xx_ts_0, 0), (self.epy_block_5, 0))
+        self.connect((self.digital_costas_loop_cc_0, 0), (self.digital_symbol_sync_xx_0, 0))
+        self.connect((self.digital_costas_loop_cc_0, 0), (self.epy_block_3, 0))
+        self.connect((self.digital_diff_decoder_bb_0, 0), (self.digital_map_bb_0, 0))
+        self.connect((self.digital_linear_equalizer_0, 0), (self.digital_constellation_decoder_cb_0, 0))
+        self.connect((self.digital_linear_equalizer_0, 0), (self.epy_block_4, 0))
+        self.connect((self.digital_map_bb_0, 0), (self.digital_correlate_access_code_xx_ts_0, 0))
+        self.connect((self.digital_symbol_sync_xx_0, 0), (self.epy_block_7, 0))
+        self.connect((self.epy_block_6, 0), (self.fir_filter_xxx_0, 0))
+        self.connect((self.epy_block_7, 0), (self.digital_linear_equalizer_0, 0))
+        self.connect((self.fir_filter_xxx_0, 0), (self.digital_costas_loop_cc_0, 0))
+        self.connect((self.uhd_usrp_source_0, 0), (self.epy_block_6, 0))
+        if part != 'all':
+            split.apply()
+
+        if not headless and part == 'all':
+            self.attach_display()
+
+    def attach_display(self):
+        # Qt window and display sinks; needs a QApplication. Headless runs
+        # skip this and only build the DSP chain above.
+        samp_rate = self.samp_rate
         Qt.QWidget.__init__(self)
         self.setWindowTitle("pkt_rcv")
         qtgui.util.check_set_qss()
@@ -64,39 +224,6 @@ class pkt_rcv(gr.top_block, Qt.QWidget):
         except BaseException as exc:
             print(f"Qt GUI: Could not restore geometry: {str(exc)}", file=sys.stderr)
 
-        ##################################################
-        # Variables
-        ##################################################
-        self.usrp_rate = usrp_rate = 768000
-        self.bpsk = bpsk = digital.constellation_bpsk().base()
-        self.bpsk.set_npwr(1.0)
-        self.variable_adaptive_algorithm_0 = variable_adaptive_algorithm_0 = digital.adaptive_algorithm_cma( bpsk, .0001, 2).base()
-        self.thresh = thresh = 18
-        self.sps = sps = 4
-        self.samp_rate = samp_rate = usrp_rate
-        self.phase_bw = phase_bw = 0.0628
-        self.excess_bw = excess_bw = 0.35
-        self.MTU = MTU = 1500
-
-        ##################################################
-        # Blocks
-        ##################################################
-
-        self.uhd_usrp_source_0 = uhd.usrp_source(
-            ",".join(("", '')),
-            uhd.stream_args(
-                cpu_format="fc32",
-                args='',
-                channels=list(range(0,1)),
-            ),
-        )
-        self.uhd_usrp_source_0.set_samp_rate(usrp_rate)
-        # No synchronization enforced.
-
-        self.uhd_usrp_source_0.set_center_freq(2.45*10**9, 0)
-        self.uhd_usrp_source_0.set_antenna("TX/RX", 0)
-        self.uhd_usrp_source_0.set_bandwidth((usrp_rate/sps), 0)
-        self.uhd_usrp_source_0.set_gain(20, 0)
         self.qtgui_time_sink_x_0_2 = qtgui.time_sink_f(
             256, #size
             samp_rate, #samp_rate
@@ -333,54 +460,16 @@ class pkt_rcv(gr.top_block, Qt.QWidget):
             self.top_grid_layout.setRowStretch(r, 1)
         for c in range(2, 4):
             self.top_grid_layout.setColumnStretch(c, 1)
-        self.pdu_tagged_stream_to_pdu_0 = pdu.tagged_stream_to_pdu(gr.types.byte_t, 'packet_len')
-        self.digital_symbol_sync_xx_0 = digital.symbol_sync_cc(
-            digital.TED_GARDNER,
-            sps,
-            phase_bw,
-            1.0,
-            1.0,
-            1.5,
-            1,
-            digital.constellation_bpsk().base(),
-            digital.IR_MMSE_8TAP,
-            128,
-            [])
-        self.digital_map_bb_0 = digital.map_bb([0,1])
-        self.digital_linear_equalizer_0 = digital.linear_equalizer(15, sps, variable_adaptive_algorithm_0, True, [ ], 'corr_est')
-        self.digital_diff_decoder_bb_0 = digital.diff_decoder_bb(2, digital.DIFF_DIFFERENTIAL)
-        self.digital_crc_check_0 = digital.crc_check(32, 0x4C11DB7, 0xFFFFFFFF, 0xFFFFFFFF, True, True, False, False, 0)
-        self.digital_costas_loop_cc_0 = digital.costas_loop_cc(phase_bw, 2, False)
-        self.digital_correlate_access_code_xx_ts_0 = digital.correlate_access_code_bb_ts("11100001010110101110100010010011",
-          thresh, 'packet_len')
-        self.digital_constellation_decoder_cb_0 = digital.constellation_decoder_cb(bpsk)
         self.blocks_uchar_to_float_0_0_0 = blocks.uchar_to_float()
         self.blocks_uchar_to_float_0_0 = blocks.uchar_to_float()
-        self.blocks_repack_bits_bb_1_0 = blocks.repack_bits_bb(1, 8, "packet_len", False, gr.GR_MSB_FIRST)
-        self.blocks_message_debug_0 = blocks.message_debug(True, gr.log_levels.info)
-
-
-        ##################################################
-        # Connections
-        ##################################################
-        self.msg_connect((self.digital_crc_check_0, 'ok'), (self.blocks_message_debug_0, 'print'))
-        self.msg_connect((self.pdu_tagged_stream_to_pdu_0, 'pdus'), (self.digital_crc_check_0, 'in'))
-        self.connect((self.blocks_repack_bits_bb_1_0, 0), (self.pdu_tagged_stream_to_pdu_0, 0))
         self.connect((self.blocks_uchar_to_float_0_0, 0), (self.qtgui_time_sink_x_0_2, 0))
         self.connect((self.blocks_uchar_to_float_0_0_0, 0), (self.qtgui_time_sink_x_0_0, 0))
-        self.connect((self.digital_constellation_decoder_cb_0, 0), (self.digital_diff_decoder_bb_0, 0))
-        self.connect((self.digital_correlate_access_code_xx_ts_0, 0), (self.blocks_repack_bits_bb_1_0, 0))
         self.connect((self.digital_correlate_access_code_xx_ts_0, 0), (self.blocks_uchar_to_float_0_0_0, 0))
-        self.connect((self.digital_costas_loop_cc_0, 0), (self.digital_symbol_sync_xx_0, 0))
         self.connect((self.digital_costas_loop_cc_0, 0), (self.qtgui_const_sink_x_2, 0))
-        self.connect((self.digital_diff_decoder_bb_0, 0), (self.digital_map_bb_0, 0))
-        self.connect((self.digital_linear_equalizer_0, 0), (self.digital_constellation_decoder_cb_0, 0))
         self.connect((self.digital_linear_equalizer_0, 0), (self.qtgui_const_sink_x_0, 0))
         self.connect((self.digital_linear_equalizer_0, 0), (self.qtgui_freq_sink_x_0, 0))
         self.connect((self.digital_map_bb_0, 0), (self.blocks_uchar_to_float_0_0, 0))
-        self.connect((self.digital_map_bb_0, 0), (self.digital_correlate_access_code_xx_ts_0, 0))
-        self.connect((self.digital_symbol_sync_xx_0, 0), (self.digital_linear_equalizer_0, 0))
-        self.connect((self.uhd_usrp_source_0, 0), (self.digital_costas_loop_cc_0, 0))
+        self.display = True
 
 
     def closeEvent(self, event):
@@ -396,9 +485,13 @@ class pkt_rcv(gr.top_block, Qt.QWidget):
 
     def set_usrp_rate(self, usrp_rate):
         self.usrp_rate = usrp_rate
-        self.set_samp_rate(self.usrp_rate)
-        self.uhd_usrp_source_0.set_samp_rate(self.usrp_rate)
-        self.uhd_usrp_source_0.set_bandwidth((self.usrp_rate/self.sps), 0)
+        self.set_rx_decim(int(self.usrp_rate/(self.sym_rate*self.sps)))
+        self.set_rx_taps(firdes.low_pass(1.0, self.usrp_rate, self.samp_rate/2, self.samp_rate - 2*self.rx_passband, window.WIN_HAMMING, 6.76))
+        self.set_samp_rate(self.usrp_rate/self.rx_decim)
+        self.epy_block_6.Samp_rate = self.usrp_rate
+        if self.radio == 'uhd' and self.part != 'back':
+            self.uhd_usrp_source_0.set_samp_rate(self.usrp_rate)
+            self.uhd_usrp_source_0.set_bandwidth((self.usrp_rate/self.sps), 0)
 
     def get_bpsk(self):
         return self.bpsk
@@ -413,28 +506,59 @@ class pkt_rcv(gr.top_block, Qt.QWidget):
     def set_variable_adaptive_algorithm_0(self, variable_adaptive_algorithm_0):
         self.variable_adaptive_algorithm_0 = variable_adaptive_algorithm_0
 
+    def get_training(self):
+        return self.training
+
+    def set_training(self, training):
+        self.training = training
+
     def get_thresh(self):
         return self.thresh
 
     def set_thresh(self, thresh):
         self.thresh = thresh
 
+    def get_sym_rate(self):
+        return self.sym_rate
+
+    def set_sym_rate(self, sym_rate):
+        self.sym_rate = sym_rate
+        self.set_rx_decim(int(self.usrp_rate/(self.sym_rate*self.sps)))
+        self.set_rx_passband(self.sym_rate*(1+self.excess_bw)/2 + 4000)
+        self.epy_block_6.Sym_rate = self.sym_rate
+
     def get_sps(self):
         return self.sps
 
     def set_sps(self, sps):
         self.sps = sps
+        self.set_rx_decim(int(self.usrp_rate/(self.sym_rate*self.sps)))
         self.digital_symbol_sync_xx_0.set_sps(self.sps)
-        self.uhd_usrp_source_0.set_bandwidth((self.usrp_rate/self.sps), 0)
+        self.epy_block_4.Samp_rate = self.samp_rate/self.sps
+        self.epy_block_5.Samp_rate = self.samp_rate/self.sps
+        if self.radio == 'uhd' and self.part != 'back':
+            self.uhd_usrp_source_0.set_bandwidth((self.usrp_rate/self.sps), 0)
+
+    def get_rx_decim(self):
+        return self.rx_decim
+
+    def set_rx_decim(self, rx_decim):
+        self.rx_decim = rx_decim
+        self.set_samp_rate(self.usrp_rate/self.rx_decim)
 
     def get_samp_rate(self):
         return self.samp_rate
 
     def set_samp_rate(self, samp_rate):
         self.samp_rate = samp_rate
-        self.qtgui_freq_sink_x_0.set_frequency_range(0, self.samp_rate)
-        self.qtgui_time_sink_x_0_0.set_samp_rate(self.samp_rate)
-        self.qtgui_time_sink_x_0_2.set_samp_rate(self.samp_rate)
+        self.set_rx_taps(firdes.low_pass(1.0, self.usrp_rate, self.samp_rate/2, self.samp_rate - 2*self.rx_passband, window.WIN_HAMMING, 6.76))
+        self.epy_block_3.Samp_rate = self.samp_rate
+        self.epy_block_4.Samp_rate = self.samp_rate/self.sps
+        self.epy_block_5.Samp_rate = self.samp_rate/self.sps
+        if self.display:
+            self.qtgui_freq_sink_x_0.set_frequency_range(0, self.samp_rate)
+            self.qtgui_time_sink_x_0_0.set_samp_rate(self.samp_rate)
+            self.qtgui_time_sink_x_0_2.set_samp_rate(self.samp_rate)
 
     def get_phase_bw(self):
         return self.phase_bw
@@ -444,11 +568,63 @@ class pkt_rcv(gr.top_block, Qt.QWidget):
         self.digital_costas_loop_cc_0.set_loop_bandwidth(self.phase_bw)
         self.digital_symbol_sync_xx_0.set_loop_bandwidth(self.phase_bw)
 
+    def get_monitor_addr(self):
+        return self.monitor_addr
+
+    def set_monitor_addr(self, monitor_addr):
+        self.monitor_addr = monitor_addr
+        self.epy_block_3.Address = self.monitor_addr
+        self.epy_block_4.Address = self.monitor_addr
+        self.epy_block_5.Address = self.monitor_addr
+
+    def get_max_cfo(self):
+        return self.max_cfo
+
+    def set_max_cfo(self, max_cfo):
+        self.max_cfo = max_cfo
+        self.epy_block_6.Max_offset = self.max_cfo
+
+    def get_fec_depth(self):
+        return self.fec_depth
+
+    def set_fec_depth(self, fec_depth):
+        self.fec_depth = fec_depth
+        self.epy_block_1.Depth = self.fec_depth
+
+    def get_fec_code(self):
+        return self.fec_code
+
+    def set_fec_code(self, fec_code):
+        self.fec_code = fec_code
+        self.epy_block_1.Code = self.fec_code
+
     def get_excess_bw(self):
         return self.excess_bw
 
     def set_excess_bw(self, excess_bw):
         self.excess_bw = excess_bw
+        self.set_rx_passband(self.sym_rate*(1+self.excess_bw)/2 + 4000)
+
+    def get_rx_passband(self):
+        return self.rx_passband
+
+    def set_rx_passband(self, rx_passband):
+        self.rx_passband = rx_passband
+        self.set_rx_taps(firdes.low_pass(1.0, self.usrp_rate, self.samp_rate/2, self.samp_rate - 2*self.rx_passband, window.WIN_HAMMING, 6.76))
+
+    def get_rx_taps(self):
+        return self.rx_taps
+
+    def set_rx_taps(self, rx_taps):
+        self.rx_taps = rx_taps
+        self.fir_filter_xxx_0.set_taps(self.rx_taps)
+
+    def get_arq_window(self):
+        return self.arq_window
+
+    def set_arq_window(self, arq_window):
+        self.arq_window = arq_window
+        self.epy_block_0.Window = self.arq_window
 
     def get_MTU(self):
         return self.MTU
@@ -459,12 +635,62 @@ class pkt_rcv(gr.top_block, Qt.QWidget):
 
 
 
+def argument_parser():
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="Run without the Qt window and display sinks")
+    parser.add_argument(
+        "--radio", dest="radio", type=str, default='uhd',
+        help="uhd, or a ZMQ address / file:<path> standing in for the USRP (see pkt_radio.py) [default=%(default)r]")
+    parser.add_argument(
+        "--part", dest="part", type=str, default='all', choices=['all', 'front', 'back'],
+        help="Run the whole receiver, or the part before / after --cut, headless (see pkt_shm.py) [default=%(default)r]")
+    parser.add_argument(
+        "--cut", dest="cut", type=str, default='sync', choices=sorted(CUTS),
+        help="Where --part splits the receiver: after the channel filter, symbol sync, equalizer or access code correlator [default=%(default)r]")
+    parser.add_argument(
+        "--shm", dest="shm", type=str, default='pkt_rcv',
+        help="Shared memory name of the cut [default=%(default)r]")
+    return parser
+
+
+def main_headless(top_block_cls=pkt_rcv, options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+
+    if options.part == 'back':
+        # the front process has the metrics / perf addresses
+        for var in ('PKT_METRICS', 'PKT_PERF'):
+            if os.environ.get(var):
+                os.environ[var] = pkt_radio.offset_address(os.environ[var], 1)
+    tb = top_block_cls(headless=True, radio=options.radio, part=options.part, cut=options.cut, shm=options.shm)
+
+    def sig_handler(sig=None, frame=None):
+        tb.stop()
+        tb.wait()
+
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, sig_handler)
+    signal.signal(signal.SIGTERM, sig_handler)
+
+    pkt_perf.attach(tb)
+    tb.start()
+    tb.wait()
+
+
 def main(top_block_cls=pkt_rcv, options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    if options.headless or options.part != 'all':
+        return main_headless(top_block_cls, options)
 
     qapp = Qt.QApplication(sys.argv)
 
-    tb = top_block_cls()
+    tb = top_block_cls(radio=options.radio)
 
+    pkt_perf.attach(tb)
     tb.start()
 
     tb.show()
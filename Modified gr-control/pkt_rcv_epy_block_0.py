@@ -0,0 +1,175 @@
+"""
+Embedded Python Block: Packet Payload Decoder
+"""
+
+import numpy as np
+from gnuradio import gr
+import pmt
+import base64
+import json
+import pkt_metrics
+
+"""
+Packet types (first bytes of the payload, after the CRC check)
+    %UUU#JOB    job manifest, followed by JSON (job, name, size, payload)
+    %UUU#EOF    file name trailer, followed by the name (the post filler
+                starts the same way but is sent whole, and is dropped)
+    %UUU        preamble / post filler, dropped
+    O           binary data packet, followed by its file offset (8 bytes,
+                big endian) and the raw file bytes
+    D           binary data packet without offset (older transmitters),
+                followed by the raw file bytes
+    other       Base64 data packet
+Data PDUs carry 'offset' in their metadata: the byte position in the file
+of the current job. 'O' packets bring their own; for the others it is
+counted from the manifest, so after a lost packet it is wrong (the File
+Reassembly Sink then finds the file short and does not finish it).
+
+ARQ (Window > 0, same Window as the File Source in pkt_xmt)
+    Sequenced packets 'S', session, seq (2 bytes) are put back in order
+    before they are decoded; duplicates are dropped. Every sequenced packet
+    is answered on the 'ack' port with
+        meta {'session': s, 'ack': next expected seq}, data = bitmap of the
+        Window seqs from 'ack' on that are held (bit 7 of byte 0 first)
+    for the transmitter's retransmit buffer.
+"""
+
+class blk(gr.basic_block):
+    def __init__(self, Payload='base64', Crc_len=4, Window=0):
+        gr.basic_block.__init__(
+            self,
+            name='EPB: Packet Payload Decoder',
+            in_sig=None,
+            out_sig=None)
+        self.Payload = Payload
+        self.Crc_len = Crc_len
+        self.Window = Window
+        self._debug = 0     # debug
+        self.filler = bytes([37,85,85,85])
+        self.trailer = bytes([37,85,85,85, 35,69,79,70])
+        self.post_filler = self.trailer + bytes([85]*43 + [93])
+        self.manifest = bytes([37,85,85,85, 35,74,79,66])
+        self.data_marker = 0x44     # 'D'
+        self.offset_marker = 0x4F   # 'O'
+        self.seq_marker = 0x53     # 'S'
+        self.session = None
+        self.expected = 0          # next seq to hand on
+        self.held = {}             # seq -> packet received ahead of expected
+        self.offset = 0            # file position of the next data packet
+        # Counters per packet type (see pkt_metrics.py)
+        self.m_packets = pkt_metrics.counter("payload_decoder.packets")
+        self.m_data = pkt_metrics.counter("payload_decoder.data_packets")
+        self.m_bytes = pkt_metrics.counter("payload_decoder.data_bytes")
+        self.m_filler = pkt_metrics.counter("payload_decoder.fillers")
+        self.m_ctrl = pkt_metrics.counter("payload_decoder.manifests_trailers")
+        self.m_bad = pkt_metrics.counter("payload_decoder.dropped")
+        self.m_dup = pkt_metrics.counter("arq.duplicates")
+        self.m_ooo = pkt_metrics.counter("arq.out_of_order")
+        self.message_port_register_in(pmt.intern('in'))
+        self.set_msg_handler(pmt.intern('in'), self.handle_msg)
+        self.message_port_register_out(pmt.intern('out'))
+        self.message_port_register_out(pmt.intern('ack'))
+
+    def handle_msg(self, msg):
+        meta = pmt.car(msg)
+        buff = bytes(pmt.u8vector_elements(pmt.cdr(msg)))
+        self.m_packets.inc()
+        if (self.Crc_len > 0):
+            # crc_check passes the CRC on when discard_crc is False
+            buff = buff[:-self.Crc_len]
+
+        if (self.Window > 0 and len(buff) >= 4 and buff[0] == self.seq_marker):
+            self.handle_seq(meta, buff)
+            return
+        self.handle_payload(meta, buff)
+
+    def handle_seq(self, meta, buff):
+        # selective repeat: reorder, drop duplicates, acknowledge
+        session = buff[1]
+        seq = (buff[2] << 8) | buff[3]
+        if (session != self.session):
+            # new transmitter run; it starts at 0 unless we joined late
+            self.session = session
+            self.expected = 0 if seq < self.Window else seq
+            self.held = {}
+        diff = (seq - self.expected) & 0xFFFF
+        if (diff >= 0x8000 or seq in self.held):
+            self.m_dup.inc()
+        elif (diff < self.Window):
+            if (diff > 0):
+                self.m_ooo.inc()
+            self.held[seq] = (meta, buff[4:])
+        while (self.expected in self.held):
+            self.handle_payload(*self.held.pop(self.expected))
+            self.expected = (self.expected + 1) & 0xFFFF
+        bits = np.zeros(self.Window, dtype=np.uint8)
+        for s in self.held:
+            bits[(s - self.expected) & 0xFFFF] = 1
+        bitmap = np.packbits(bits)
+        ack = pmt.make_dict()
+        ack = pmt.dict_add(ack, pmt.intern('session'), pmt.from_long(self.session))
+        ack = pmt.dict_add(ack, pmt.intern('ack'), pmt.from_long(self.expected))
+        self.message_port_pub(pmt.intern('ack'), pmt.cons(ack, pmt.init_u8vector(len(bitmap), bitmap)))
+
+    def handle_payload(self, meta, buff):
+        if (buff.startswith(self.trailer) and buff != self.post_filler):
+            # file name: publish it as metadata on an empty PDU
+            fn = buff[len(self.trailer):].decode('utf-8', 'replace')
+            if (self._debug):
+                print ("File name:", fn)
+            if not (pmt.is_dict(meta)):
+                meta = pmt.make_dict()
+            meta = pmt.dict_add(meta, pmt.intern('filename'), pmt.intern(fn))
+            self.m_ctrl.inc()
+            self.offset = 0
+            self.message_port_pub(pmt.intern('out'), pmt.cons(meta, pmt.init_u8vector(0, [])))
+            return
+        if (buff.startswith(self.manifest)):
+            # job manifest: publish its fields as metadata on an empty PDU
+            try:
+                info = json.loads(buff[len(self.manifest):].decode('utf-8'))
+            except ValueError:
+                self.m_bad.inc()
+                return
+            self.m_ctrl.inc()
+            if not (pmt.is_dict(meta)):
+                meta = pmt.make_dict()
+            for k in ('job', 'name', 'size', 'payload'):
+                if (k in info):
+                    meta = pmt.dict_add(meta, pmt.intern(k), pmt.to_pmt(info[k]))
+            self.offset = 0
+            self.message_port_pub(pmt.intern('out'), pmt.cons(meta, pmt.init_u8vector(0, [])))
+            return
+        if (buff.startswith(self.filler)):
+            self.m_filler.inc()
+            return
+
+        offset = self.offset
+        if (self.Payload == 'binary'):
+            if (len(buff) >= 9 and buff[0] == self.offset_marker):
+                offset = int.from_bytes(buff[1:9], 'big')
+                data = buff[9:]
+            elif (len(buff) > 0 and buff[0] == self.data_marker):
+                data = buff[1:]
+            else:
+                if (self._debug):
+                    print ("not a data packet, dropped")
+                self.m_bad.inc()
+                return
+        else:
+            try:
+                data = base64.b64decode (buff)
+            except ValueError:
+                if (self._debug):
+                    print ("bad Base64 packet, dropped")
+                self.m_bad.inc()
+                return
+        data = np.frombuffer(data, dtype=np.uint8)
+        self.m_data.inc()
+        self.m_bytes.inc(len(data))
+        if not (pmt.is_dict(meta)):
+            meta = pmt.make_dict()
+        meta = pmt.dict_add(meta, pmt.intern('offset'), pmt.from_long(offset))
+        self.offset = offset + len(data)
+        self.message_port_pub(pmt.intern('out'), pmt.cons(meta, pmt.init_u8vector(len(data), data)))
+
@@ -0,0 +1,49 @@
+"""
+Embedded Python Block: FEC Decoder
+"""
+
+import numpy as np
+from gnuradio import gr
+import pmt
+import pkt_fec
+import pkt_metrics
+
+"""
+Decodes the PDUs from the access code correlator (coded payload + CRC)
+with pkt_fec before the CRC check. Code and Depth must match the FEC
+Encoder in pkt_xmt; Code 'none' passes PDUs through unchanged.
+"""
+
+class blk(gr.basic_block):
+    def __init__(self, Code='conv', Depth=16):
+        gr.basic_block.__init__(
+            self,
+            name='EPB: FEC Decoder',
+            in_sig=None,
+            out_sig=None)
+        self.Code = Code
+        self.Depth = Depth
+        self._debug = 0     # debug
+        self.m_packets = pkt_metrics.counter("fec_decoder.packets")
+        self.m_corrected = pkt_metrics.counter("fec_decoder.corrected_bits")
+        self.m_coded = pkt_metrics.counter("fec_decoder.coded_bytes")
+        self.m_bad = pkt_metrics.counter("fec_decoder.dropped")
+        self.t_work = pkt_metrics.work_timer("fec_decoder.work")
+        self.message_port_register_in(pmt.intern('in'))
+        self.set_msg_handler(pmt.intern('in'), self.handle_msg)
+        self.message_port_register_out(pmt.intern('out'))
+
+    def handle_msg(self, msg):
+        with self.t_work:
+            meta = pmt.car(msg)
+            coded = np.array(pmt.u8vector_elements(pmt.cdr(msg)), dtype=np.uint8)
+            data, corrected = pkt_fec.decode(self.Code, coded, self.Depth)
+            if data is None:
+                if (self._debug):
+                    print ("coded length", len(coded), "does not fit", self.Code)
+                self.m_bad.inc()
+                return
+            self.m_packets.inc()
+            self.m_corrected.inc(corrected)
+            self.m_coded.inc(len(coded))
+        self.message_port_pub(pmt.intern('out'), pmt.cons(meta, pmt.init_u8vector(len(data), data)))
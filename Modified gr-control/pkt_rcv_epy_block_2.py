@@ -0,0 +1,178 @@
+"""
+Embedded Python Block: File Reassembly Sink
+"""
+
+import numpy as np
+from gnuradio import gr
+import pmt
+import os
+import bisect
+import threading
+import queue
+import pkt_metrics
+
+"""
+Rebuilds the transmitted files from the Packet Payload Decoder output
+while they are received:
+    manifest PDU (meta 'job', 'name',   open <Directory>/<name>.part
+                  'size')
+    data PDU (meta 'offset')            write the bytes at that offset
+    trailer PDU (meta 'filename')       close the file and rename it to
+                                        <Directory>/<name>, ready to use
+The file is only renamed when the byte ranges written cover the
+manifest's size exactly, without gaps. A file that is short (lost
+packets), that ends without its trailer (next manifest, or the flowgraph
+stops) or that had no manifest (data goes to received_<n>.part) stays
+<name>.part and is counted in reassembly.incomplete. Writes are collected
+into Buf_size blocks and done by a writer thread (os.pwrite), so the
+message handler never waits on the disk.
+"""
+
+class blk(gr.basic_block):
+    def __init__(self, Directory='.', Buf_size=65536):
+        gr.basic_block.__init__(
+            self,
+            name='EPB: File Reassembly Sink',
+            in_sig=None,
+            out_sig=None)
+        self.Directory = Directory
+        self.Buf_size = Buf_size
+        self._debug = 0     # debug
+        self.f_name = None  # final name of the file being received
+        self.part = None    # name it is written under until complete
+        self.size = None    # from the manifest
+        self.ranges = []    # [start, end) byte ranges received, sorted, apart
+        self.count = 0
+        self.buf = bytearray()
+        self.buf_off = 0    # file offset of buf[0]
+        self.writes = queue.Queue()
+        self.writer = None
+        self.m_files = pkt_metrics.counter("reassembly.files")
+        self.m_incomplete = pkt_metrics.counter("reassembly.incomplete")
+        self.m_bytes = pkt_metrics.counter("reassembly.bytes")
+        self.m_queued = pkt_metrics.gauge("reassembly.queued_writes")
+        self.message_port_register_in(pmt.intern('in'))
+        self.set_msg_handler(pmt.intern('in'), self.handle_msg)
+
+    def start(self):
+        self.writer = threading.Thread(target=self.write_files, name='reassembly', daemon=True)
+        self.writer.start()
+        return True
+
+    def stop(self):
+        self.close_file()
+        if (self.writer is not None):
+            self.writes.put(None)
+            self.writer.join()
+            self.writer = None
+        return True
+
+    def write_files(self):
+        # writer thread: ('open', path), ('write', offset, data),
+        # ('close', path, final name or None to leave it)
+        fd = None
+        while True:
+            job = self.writes.get()
+            if (job is None):
+                break
+            if (job[0] == 'open'):
+                fd = os.open(job[1], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            elif (job[0] == 'write'):
+                os.pwrite(fd, job[2], job[1])
+            elif (job[0] == 'close'):
+                os.close(fd)
+                fd = None
+                if (job[2] is not None):
+                    os.replace(job[1], job[2])
+        if (fd is not None):
+            os.close(fd)
+
+    def open_file(self, name, size=None):
+        self.close_file()
+        if (self.writer is None):
+            self.start()
+        self.count += 1
+        self.f_name = os.path.join(self.Directory, os.path.basename(name) or 'received_%d' % self.count)
+        self.part = self.f_name + '.part'
+        self.size = size
+        self.ranges = []
+        self.buf = bytearray()
+        self.buf_off = 0
+        self.writes.put(('open', self.part))
+        if (self._debug):
+            print ("receiving", self.f_name)
+
+    def flush(self):
+        if (self.buf):
+            self.writes.put(('write', self.buf_off, bytes(self.buf)))
+            self.buf_off += len(self.buf)
+            self.buf = bytearray()
+        self.m_queued.set(self.writes.qsize())
+
+    def received(self, start, end):
+        # add [start, end) to the ranges, merging neighbours
+        r = self.ranges
+        if (r and r[-1][0] <= start <= r[-1][1]):
+            # in order, the usual case
+            r[-1][1] = max(r[-1][1], end)
+            return
+        i = bisect.bisect_left(r, [start, end])
+        r.insert(i, [start, end])
+        if (i > 0 and r[i-1][1] >= start):
+            i -= 1
+            r[i][1] = max(r[i][1], end)
+            del r[i+1]
+        while (i + 1 < len(r) and r[i+1][0] <= r[i][1]):
+            r[i][1] = max(r[i][1], r[i+1][1])
+            del r[i+1]
+
+    def complete(self):
+        # all of the manifest's size and nothing beyond it
+        if (self.size is None):
+            return False
+        return self.ranges == ([[0, self.size]] if self.size > 0 else [])
+
+    def close_file(self, trailer=False):
+        # renamed only with its trailer and all its bytes, else left as .part
+        if (self.f_name is None):
+            return
+        self.flush()
+        if (trailer and self.complete()):
+            self.writes.put(('close', self.part, self.f_name))
+            self.m_files.inc()
+        else:
+            self.writes.put(('close', self.part, None))
+            self.m_incomplete.inc()
+            if (self._debug):
+                print ("incomplete:", self.part, self.ranges, "of", self.size)
+        self.f_name = None
+
+    def handle_msg(self, msg):
+        meta = pmt.car(msg)
+        data = pmt.u8vector_elements(pmt.cdr(msg))
+        if not (pmt.is_dict(meta)):
+            meta = pmt.make_dict()
+        if (pmt.dict_has_key(meta, pmt.intern('name'))):
+            # job manifest
+            size = pmt.dict_ref(meta, pmt.intern('size'), pmt.PMT_NIL)
+            self.open_file(pmt.symbol_to_string(pmt.dict_ref(meta, pmt.intern('name'), pmt.PMT_NIL)),
+                pmt.to_long(size) if pmt.is_integer(size) else None)
+            return
+        if (pmt.dict_has_key(meta, pmt.intern('filename'))):
+            # file name trailer: the file is complete, if nothing is missing
+            self.close_file(trailer=True)
+            return
+        if (len(data) == 0):
+            return
+        if (self.f_name is None):
+            self.open_file('received_%d' % (self.count + 1))
+        offset = pmt.to_long(pmt.dict_ref(meta, pmt.intern('offset'), pmt.from_long(self.buf_off + len(self.buf))))
+        if (offset != self.buf_off + len(self.buf)):
+            # not contiguous with what is buffered: write that out first
+            self.flush()
+            self.buf_off = offset
+        self.buf += bytes(data)
+        self.received(offset, offset + len(data))
+        self.m_bytes.inc(len(data))
+        if (len(self.buf) >= self.Buf_size):
+            self.flush()
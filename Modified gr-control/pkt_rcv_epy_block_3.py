@@ -0,0 +1,34 @@
+"""
+Embedded Python Block: Monitor Tap
+"""
+
+import numpy as np
+from gnuradio import gr
+import pkt_monitor
+
+"""
+Publishes up to Rate frames/s of Length samples (every Decim-th one)
+on Address, for a viewer process (python3 pkt_monitor.py) to draw as
+constellation and spectrum. Samp_rate only labels the spectrum axis.
+Stands in for the in-graph const/freq sinks when running headless.
+"""
+
+class blk(gr.sync_block):
+    def __init__(self, Tap='costas', Address='tcp://127.0.0.1:5561', Rate=10.0, Length=1024, Decim=1, Samp_rate=0):
+        gr.sync_block.__init__(
+            self,
+            name='EPB: Monitor Tap',
+            in_sig=[np.complex64],
+            out_sig=None)
+        self.Tap = Tap
+        self.Address = Address
+        self.Rate = Rate
+        self.Length = Length
+        self.Decim = Decim
+        self.Samp_rate = Samp_rate
+        self.tap = pkt_monitor.Tap(Tap, np.complex64, Address, Rate, Length, Decim, Samp_rate)
+
+    def work(self, input_items, output_items):
+        self.tap.samp_rate = self.Samp_rate    # may be changed by a callback
+        self.tap.feed(input_items[0])
+        return len(input_items[0])
@@ -0,0 +1,162 @@
+"""
+Embedded Python Block: Coarse CFO Correction
+"""
+
+import numpy as np
+from gnuradio import gr
+import pmt
+import pkt_metrics
+
+"""
+Finds the carrier offset on the frame preamble (0xAA 0x55 x4, 64 bits
+ahead of every packet, the 0x55 preamble packets included) and removes
+it before the Costas loop, which then only has to track what is left.
+
+After the differential encoder the alternating preamble bits are sent as
+++--++--, whose spectrum is two lines at carrier +-Sym_rate/4. Windows of
+half a preamble (hop a quarter window) are searched up to +-Max_offset
+for a pair of lines that stand Threshold times above their neighbouring
+bins, with no line at the carrier between them (random data has its peak
+there). Runs windows in a row on the same bin make a detection; the
+offset is the centre of the pair in the best of them and holds until
+the next preamble. One 'cfo' tag (Hz) per preamble marks where the new
+correction starts.
+
+Runs at the USRP rate, ahead of the channel-select filter, so offsets
+wider than the filter are caught too.
+"""
+
+class blk(gr.sync_block):
+    def __init__(self, Samp_rate=768000, Sym_rate=12000, Max_offset=100000, Threshold=8.0, Runs=3):
+        gr.sync_block.__init__(
+            self,
+            name='EPB: Coarse CFO Correction',
+            in_sig=[np.complex64],
+            out_sig=[np.complex64])
+        self.Samp_rate = Samp_rate
+        self.Sym_rate = Sym_rate
+        self.Max_offset = Max_offset
+        self.Threshold = Threshold
+        self.Runs = Runs
+        self._debug = 0     # debug
+        self.freq = 0.0     # offset being removed, Hz
+        self.phase = 0.0    # of the correction at the next output sample
+        self.run = 0        # windows in a row with the line pair
+        self.run_bin = None
+        self.run_best = 0.0 # best score so far in this run
+        self.run_offset = 0.0   # and its offset
+        self.cfg = None
+        self.m_estimates = pkt_metrics.counter("cfo.estimates")
+        self.m_offset = pkt_metrics.gauge("cfo.offset_hz")
+        self.t_work = pkt_metrics.work_timer("cfo.work")
+
+    def setup(self):
+        # called again when a callback changes the parameters
+        self.cfg = (self.Samp_rate, self.Sym_rate, self.Max_offset)
+        preamble = 64 * self.Samp_rate / self.Sym_rate
+        self.n_fft = 1 << max(int(np.log2(preamble / 2)), 6)
+        self.hop = self.n_fft // 4
+        self.win = np.hanning(self.n_fft).astype(np.float32)
+        self.bin_hz = self.Samp_rate / self.n_fft
+        self.shift = max(int(round(self.Sym_rate / 4 / self.bin_hz)), 2)
+        # neighbours of a line: clear of its main lobe and of the side
+        # lines the byte boundaries add at +-Sym_rate/16
+        self.near = max(self.shift // 4, 1) + 2
+        # only the bins the line pairs of the search range can fall in
+        freqs = np.fft.fftshift(np.fft.fftfreq(self.n_fft)) * self.Samp_rate
+        inside = np.nonzero(np.abs(freqs) <= self.Max_offset)[0]
+        self.pad = self.shift + self.near + 8
+        self.band = slice(max(inside[0] - self.pad, 0), min(inside[-1] + self.pad + 1, self.n_fft))
+        self.freqs = freqs[self.band]
+        self.search = np.abs(self.freqs) <= self.Max_offset
+        self.hist = np.zeros(0, dtype=np.complex64)  # output already, kept for the overlap
+
+    def box(self, C, a, b):
+        # sum of P[k+a .. k+b] for every bin k, from the running sum C of P
+        # with pad zeros on both sides
+        m = len(self.freqs)
+        return C[:, self.pad + b + 1:self.pad + b + 1 + m] - C[:, self.pad + a:self.pad + a + m]
+
+    def estimate(self, frames):
+        """Score, bin and offset in Hz of the best line pair in each window."""
+        P = np.fft.fftshift(np.abs(np.fft.fft(frames * self.win, axis=1)) ** 2, axes=1)[:, self.band]
+        C = np.zeros((len(P), P.shape[1] + 2 * self.pad + 1))
+        np.cumsum(np.pad(P, ((0, 0), (self.pad, self.pad))), axis=1, out=C[:, 1:])
+        E = self.box(C, -1, 1)              # main lobe
+        L = (self.box(C, -self.near - 6, -self.near) + self.box(C, self.near, self.near + 6)) * (3.0 / 14) + 1e-30
+        lo = np.roll(E, self.shift, 1)      # line at bin - shift
+        hi = np.roll(E, -self.shift, 1)     # line at bin + shift
+        score = np.minimum(lo / np.roll(L, self.shift, 1), hi / np.roll(L, -self.shift, 1))
+        score[E > 0.25 * np.minimum(lo, hi)] = 0.0
+        score[:, ~self.search] = 0.0
+        k = np.argmax(score, axis=1)
+        rows = np.arange(len(k))
+        # parabola through the pair's strength around the peak
+        pair = lo + hi
+        m = pair.shape[1]
+        a, b, c = pair[rows, np.maximum(k - 1, 0)], pair[rows, k], pair[rows, np.minimum(k + 1, m - 1)]
+        den = a - 2 * b + c
+        frac = np.where(den < 0, 0.5 * (a - c) / np.where(den < 0, den, -1.0), 0.0)
+        offset = self.freqs[k] + np.clip(frac, -0.5, 0.5) * self.bin_hz
+        return score[rows, k], k, offset
+
+    def rotate(self, x, out, start, stop):
+        n = stop - start
+        if n <= 0:
+            return
+        step = -2 * np.pi * self.freq / self.Samp_rate
+        if self.freq == 0.0:
+            out[start:stop] = x[start:stop]
+        else:
+            out[start:stop] = x[start:stop] * np.exp(1j * (self.phase + step * np.arange(n))).astype(np.complex64)
+        self.phase = (self.phase + step * n) % (2 * np.pi)
+
+    def work(self, input_items, output_items):
+        with self.t_work:
+            if self.cfg != (self.Samp_rate, self.Sym_rate, self.Max_offset):
+                self.setup()
+            x = input_items[0]
+            out = output_items[0]
+            n = len(x)
+            n_old = len(self.hist)
+            buf = np.concatenate((self.hist, x))
+            n_win = (len(buf) - self.n_fft) // self.hop + 1 if len(buf) >= self.n_fft else 0
+            changes = []    # (index in x, new offset)
+            if n_win > 0:
+                frames = np.lib.stride_tricks.sliding_window_view(buf, self.n_fft)[::self.hop][:n_win]
+                score, k, offset = self.estimate(frames)
+                for i in range(n_win):
+                    if score[i] < self.Threshold:
+                        self.run = 0
+                        self.run_bin = None
+                        continue
+                    if self.run_bin is not None and abs(k[i] - self.run_bin) <= 1:
+                        self.run += 1
+                    else:
+                        self.run = 1
+                        self.run_best = 0.0
+                    self.run_bin = k[i]
+                    if score[i] > self.run_best:
+                        self.run_best = score[i]
+                        self.run_offset = float(offset[i])
+                    if self.run == self.Runs:
+                        # a detection: one correction per run
+                        at = max(i * self.hop - n_old, 0)
+                        if changes and changes[-1][0] == at:
+                            changes.pop()
+                        changes.append((at, self.run_offset))
+                self.hist = buf[n_win * self.hop:]
+            else:
+                self.hist = buf
+            start = 0
+            for at, freq in changes:
+                self.rotate(x, out, start, at)
+                start = at
+                if self._debug:
+                    print("cfo:", round(freq), "Hz at", self.nitems_written(0) + at)
+                self.freq = freq
+                self.m_estimates.inc()
+                self.m_offset.set(freq)
+                self.add_item_tag(0, self.nitems_written(0) + at, pmt.intern('cfo'), pmt.from_double(freq))
+            self.rotate(x, out, start, n)
+        return n
@@ -0,0 +1,50 @@
+"""
+Embedded Python Block: Preamble Correlator
+"""
+
+import numpy as np
+from gnuradio import gr
+import pmt
+import pkt_preamble
+import pkt_metrics
+
+"""
+Looks for the burst start (frame preamble + access code, see
+pkt_preamble.py) in the symbol-synced stream, Sps samples per symbol with
+the on-time sample first, and tags it 'corr_est' (value: normalized
+correlation, 0..1) for the linear equalizer's training. The samples after
+a burst start are rotated and scaled to the known symbols, so training
+always sees them the same way round whatever the differential encoder
+and the Costas loop started from. Delays the stream by about two
+preamble lengths; Mark_delay moves the tag later by that many samples.
+"""
+
+class blk(gr.sync_block):
+    def __init__(self, Modulation='bpsk', Sps=2, Threshold=0.6, Mark_delay=0):
+        gr.sync_block.__init__(
+            self,
+            name='EPB: Preamble Correlator',
+            in_sig=[np.complex64],
+            out_sig=[np.complex64])
+        self.Modulation = Modulation
+        self.Sps = Sps
+        self.Threshold = Threshold
+        self.Mark_delay = Mark_delay
+        self._debug = 0     # debug
+        self.corr = pkt_preamble.Correlator(pkt_preamble.training_symbols(Modulation), Sps, Threshold, Mark_delay)
+        self.m_bursts = pkt_metrics.counter("preamble.bursts")
+        self.m_metric = pkt_metrics.gauge("preamble.correlation")
+        self.t_work = pkt_metrics.work_timer("preamble.work")
+
+    def work(self, input_items, output_items):
+        with self.t_work:
+            self.corr.threshold = self.Threshold    # may be changed by a callback
+            y, marks = self.corr.feed(input_items[0])
+            output_items[0][:] = y
+            for at, metric in marks:
+                if self._debug:
+                    print("burst at", self.nitems_written(0) + at, "corr", round(metric, 2))
+                self.m_bursts.inc()
+                self.m_metric.set(metric)
+                self.add_item_tag(0, self.nitems_written(0) + at, pmt.intern('corr_est'), pmt.from_double(metric))
+        return len(output_items[0])
@@ -0,0 +1,188 @@
+"""
+Multistage integer resamplers: a large rate change split into halfband
+stages (every factor of 2) and one polyphase stage for what is left,
+each designed from the passband and the stopband attenuation, so the
+filtering is done where the rate is low and the transitions are wide:
+    self.resampler_0 = pkt_resample.interpolator(16, 0.17, 70)
+    self.resampler_0 = pkt_resample.decimator(8, 0.17, 70)
+`passband` is the edge of the wanted band as a fraction of the low
+rate (0.17 = +-0.17 fs), `atten` the stopband attenuation in dB that
+keeps images (interpolation) or aliases (decimation) out of it.
+
+A halfband stage is built from its two polyphase arms: the even taps as
+a FIR filter at the low rate, the centre tap as a plain delay, since all
+other odd taps of a halfband filter are zero. It costs about a quarter
+of the MACs of the same filter in a rational_resampler.
+
+Print a plan, with the MACs per high-rate sample next to a single
+rational_resampler with its default taps:
+    python3 pkt_resample.py 16 [passband] [atten]
+"""
+
+import sys
+import math
+import numpy as np
+
+from gnuradio import gr, blocks, filter
+
+
+def _kaiser(atten, tw):
+    """Kaiser window (length, beta) for `atten` dB and a transition of
+    `tw` as a fraction of the sample rate."""
+    if atten > 50:
+        beta = 0.1102 * (atten - 8.7)
+    elif atten > 21:
+        beta = 0.5842 * (atten - 21) ** 0.4 + 0.07886 * (atten - 21)
+    else:
+        beta = 0.0
+    ntaps = int(math.ceil((atten - 8) / (2.285 * 2 * math.pi * tw))) + 1
+    return ntaps, beta
+
+
+def halfband_taps(passband, atten):
+    """Halfband low-pass for a 2x rate change, passband as a fraction of
+    the high rate (< 0.25). 4K+3 taps, unity DC gain; the odd taps but
+    the centre one are exactly zero."""
+    ntaps, beta = _kaiser(atten, 0.5 - 2 * passband)
+    ntaps = 4 * max(-(-(ntaps - 3) // 4), 0) + 3
+    n = np.arange(ntaps) - (ntaps - 1) // 2
+    return 0.5 * np.sinc(n / 2.0) * np.kaiser(ntaps, beta)
+
+
+def lowpass_taps(passband, stopband, atten):
+    """Windowed-sinc low-pass, band edges as fractions of its sample rate,
+    unity DC gain."""
+    ntaps, beta = _kaiser(atten, stopband - passband)
+    ntaps |= 1
+    fc = (passband + stopband) / 2
+    n = np.arange(ntaps) - (ntaps - 1) // 2
+    h = 2 * fc * np.sinc(2 * fc * n) * np.kaiser(ntaps, beta)
+    return h / h.sum()
+
+
+def plan(factor, passband, atten=70.0):
+    """The stages of a `factor` interpolation, from the low rate up
+    (a decimation runs them in reverse): [(kind, factor, taps)], where
+    kind is 'halfband' or 'polyphase'."""
+    if factor < 1 or int(factor) != factor:
+        raise ValueError("factor must be a positive integer, got %r" % factor)
+    if not 0 < passband < 0.5:
+        raise ValueError("passband must be between 0 and 0.5 of the low rate, got %r" % passband)
+    factor = int(factor)
+    halfbands = 0
+    while factor % 2 == 0:
+        factor //= 2
+        halfbands += 1
+    stages = []
+    rate = 1.0          # of the low rate
+    for i in range(halfbands):
+        stages.append(('halfband', 2, halfband_taps(passband / (2 * rate), atten)))
+        rate *= 2
+    if factor > 1:
+        # first image (or alias) starts at the stage's low rate - passband
+        stages.append(('polyphase', factor,
+            lowpass_taps(passband / (factor * rate), (rate - passband) / (factor * rate), atten)))
+    return stages
+
+
+def macs(stages):
+    """Real MACs per high-rate sample of a resampler with this plan."""
+    high = np.prod([f for kind, f, taps in stages])
+    total = 0.0
+    rate = 1
+    for kind, f, taps in stages:
+        rate *= f       # high rate of this stage
+        if kind == 'halfband':
+            # even arm (and the centre tap) once per low-rate sample
+            total += (len(taps[0::2]) + 1) / 2 * rate / high
+        else:
+            total += len(taps) / f * rate / high
+    return total
+
+
+def rational_resampler_macs(factor):
+    """MACs per high-rate sample of a rational_resampler with default
+    taps (Kaiser, beta 7, fractional_bw 0.4)."""
+    atten = 7.0 / 0.1102 + 8.7
+    ntaps = int(atten * factor / (22.0 * 0.1)) | 1
+    return ntaps / factor
+
+
+def _blocks(dtype):
+    if dtype == 'complex':
+        return (gr.sizeof_gr_complex, filter.fir_filter_ccf, filter.interp_fir_filter_ccf,
+                blocks.multiply_const_cc, blocks.add_cc)
+    return (gr.sizeof_float, filter.fir_filter_fff, filter.interp_fir_filter_fff,
+            blocks.multiply_const_ff, blocks.add_ff)
+
+
+class interpolator(gr.hier_block2):
+    """Interpolates by `factor` in halfband/polyphase stages (see plan())."""
+    def __init__(self, factor, passband, atten=70.0, dtype='complex'):
+        size, fir, interp_fir, multiply_const, add = _blocks(dtype)
+        gr.hier_block2.__init__(self, "pkt_resample.interpolator",
+            gr.io_signature(1, 1, size), gr.io_signature(1, 1, size))
+        self.stages = plan(factor, passband, atten)
+        prev = self
+        for i, (kind, f, taps) in enumerate(self.stages):
+            if kind == 'halfband':
+                # even outputs: even taps at the low rate; odd outputs: the
+                # centre tap (1 after the gain of 2) is a plain delay
+                k = (len(taps) - 3) // 4
+                arm = fir(1, list(2 * taps[0::2]))
+                delay = blocks.delay(size, k)
+                out = blocks.interleave(size, 1)
+                self.connect(prev, arm, (out, 0))
+                self.connect(prev, delay, (out, 1))
+                setattr(self, 'stage%d_arm' % i, arm)
+                setattr(self, 'stage%d_delay' % i, delay)
+            else:
+                out = interp_fir(f, list(f * taps))
+                self.connect(prev, out)
+            setattr(self, 'stage%d' % i, out)
+            prev = out
+        self.connect(prev, self)
+
+
+class decimator(gr.hier_block2):
+    """Decimates by `factor` in polyphase/halfband stages (see plan())."""
+    def __init__(self, factor, passband, atten=70.0, dtype='complex'):
+        size, fir, interp_fir, multiply_const, add = _blocks(dtype)
+        gr.hier_block2.__init__(self, "pkt_resample.decimator",
+            gr.io_signature(1, 1, size), gr.io_signature(1, 1, size))
+        self.stages = list(reversed(plan(factor, passband, atten)))
+        prev = self
+        for i, (kind, f, taps) in enumerate(self.stages):
+            if kind == 'halfband':
+                # y[m] = even taps * x[2m-2j] + centre tap * x[2m-2k-1]
+                k = (len(taps) - 3) // 4
+                split = blocks.stream_to_streams(size, 2)
+                arm = fir(1, list(taps[0::2]))
+                delay = blocks.delay(size, k + 1)
+                centre = multiply_const(taps[2 * k + 1])
+                out = add(1)
+                self.connect(prev, split)
+                self.connect((split, 0), arm, (out, 0))
+                self.connect((split, 1), delay, centre, (out, 1))
+                setattr(self, 'stage%d_split' % i, split)
+                setattr(self, 'stage%d_arm' % i, arm)
+                setattr(self, 'stage%d_delay' % i, delay)
+                setattr(self, 'stage%d_centre' % i, centre)
+            else:
+                out = fir(f, list(taps))
+                self.connect(prev, out)
+            setattr(self, 'stage%d' % i, out)
+            prev = out
+        self.connect(prev, self)
+
+
+if __name__ == '__main__':
+    factor = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    passband = float(sys.argv[2]) if len(sys.argv) > 2 else 0.4
+    atten = float(sys.argv[3]) if len(sys.argv) > 3 else 70.0
+    stages = plan(factor, passband, atten)
+    print(f"x{factor}, passband {passband} of the low rate, {atten:.0f} dB")
+    for kind, f, taps in stages:
+        print(f"  {kind:10s} x{f:<3d} {len(taps):4d} taps")
+    print(f"  {macs(stages):.2f} MACs per high-rate sample "
+          f"(rational_resampler, default taps: {rational_resampler_macs(factor):.2f})")
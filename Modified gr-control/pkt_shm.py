@@ -0,0 +1,365 @@
+"""
+Shared-memory stream transport between flowgraphs on the same host, for
+running one flowgraph in several processes (each with its own GIL for
+the Python blocks):
+    pkt_rcv.py --headless --part front --cut sync
+    pkt_rcv.py --headless --part back --cut sync
+The front process builds the blocks up to the cut and writes the stream
+crossing it into a ring buffer in shared memory (/dev/shm/<name>); the
+back process builds the rest and reads it from there. Samples are copied
+once into the ring and once out of it; nothing goes through the kernel.
+pkt_rcv's cuts (--cut) are after the channel filter, the symbol sync, the
+equalizer or the access code correlator; its back part publishes the
+monitor taps, PKT_METRICS and PKT_PERF one port up from the front's.
+
+The ring has one writer and one reader. The writer waits when it is full
+and the reader when it is empty (polling, 0.5 ms), so nothing is lost and
+a slow back part holds the front part back like any GNU Radio block.
+Stream tags go along in a second ring of fixed-size slots (serialized
+PMTs), at their item's position in the ring; the reader puts them on its
+own output at the same item. When the front process stops, the back
+one drains the ring and finishes.
+
+The writer creates the ring (replacing a stale one of the same name) and
+removes the name when it stops; the reader attaches when the ring shows
+up, so the two can be started in either order. A restarted back part
+goes on where the last reader stopped (tags of items it had read are
+dropped). Restart the back part when the front part is restarted.
+"""
+
+import time
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+from gnuradio import gr
+import pmt
+import pkt_metrics
+
+HEADER = 512            # bytes before the data
+# header words (uint64): layout, then the counters on their own cache lines
+ITEMSIZE, SIZE, TAG_SLOTS, TAG_SIZE, READY = 0, 1, 2, 3, 4
+MAGIC = 0x706b745f73686d31  # in READY once the layout is written
+WRITTEN, READ, TAGS_WRITTEN, TAGS_READ, EOF = 8, 16, 24, 32, 40
+
+POLL = 0.0005           # s between looks at the other side's counter
+WAIT = 0.1              # s a work() call waits before returning empty
+
+
+class Ring:
+    """Single-writer single-reader ring of `size` items of `itemsize`
+    bytes, plus `tag_slots` tag slots of `tag_size` bytes."""
+    def __init__(self, name, itemsize=None, size=1 << 22, tag_slots=4096, tag_size=256, create=False):
+        self.name = name
+        if create:
+            items = max(size // itemsize, 1)
+            total = HEADER + items * itemsize + tag_slots * tag_size
+            try:
+                self.shm = shared_memory.SharedMemory(name, create=True, size=total)
+            except FileExistsError:
+                # left over from a run that did not stop cleanly
+                stale = shared_memory.SharedMemory(name)
+                stale.close()
+                stale.unlink()
+                self.shm = shared_memory.SharedMemory(name, create=True, size=total)
+            self.ctl = np.ndarray(HEADER // 8, dtype=np.uint64, buffer=self.shm.buf)
+            self.ctl[:] = 0
+            self.ctl[[ITEMSIZE, SIZE, TAG_SLOTS, TAG_SIZE]] = [itemsize, items, tag_slots, tag_size]
+            self.ctl[READY] = MAGIC
+        else:
+            self.shm = shared_memory.SharedMemory(name)
+            # the writer owns the name; don't let this process's resource
+            # tracker remove it on exit
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+            self.ctl = np.ndarray(HEADER // 8, dtype=np.uint64, buffer=self.shm.buf)
+            if self.ctl[READY] != MAGIC:
+                # caught between the writer's create and its layout
+                self.close()
+                raise FileNotFoundError(name)
+        self.itemsize, self.size, self.tag_slots, self.tag_size = (int(v) for v in self.ctl[[ITEMSIZE, SIZE, TAG_SLOTS, TAG_SIZE]])
+        self.data = np.ndarray(self.size * self.itemsize, dtype=np.uint8, buffer=self.shm.buf, offset=HEADER)
+        self.tags = np.ndarray((self.tag_slots, self.tag_size), dtype=np.uint8, buffer=self.shm.buf,
+            offset=HEADER + self.size * self.itemsize)
+
+    def free(self):
+        return self.size - int(self.ctl[WRITTEN] - self.ctl[READ])
+
+    def available(self):
+        return int(self.ctl[WRITTEN] - self.ctl[READ])
+
+    def write(self, raw):
+        """Copies whole items of `raw` (uint8) in, as many as fit; returns
+        the number of items written."""
+        n = min(len(raw) // self.itemsize, self.free())
+        if n <= 0:
+            return 0
+        w = int(self.ctl[WRITTEN]) % self.size
+        first = min(n, self.size - w)
+        b = self.itemsize
+        self.data[w * b:(w + first) * b] = raw[:first * b]
+        self.data[:(n - first) * b] = raw[first * b:n * b]
+        self.ctl[WRITTEN] += n
+        return n
+
+    def read(self, raw):
+        """Copies up to len(raw) // itemsize items out into `raw` (uint8);
+        returns the number of items read."""
+        n = min(len(raw) // self.itemsize, self.available())
+        if n <= 0:
+            return 0
+        r = int(self.ctl[READ]) % self.size
+        first = min(n, self.size - r)
+        b = self.itemsize
+        raw[:first * b] = self.data[r * b:(r + first) * b]
+        raw[first * b:n * b] = self.data[:(n - first) * b]
+        self.ctl[READ] += n
+        return n
+
+    def tags_free(self):
+        return self.tag_slots - int(self.ctl[TAGS_WRITTEN] - self.ctl[TAGS_READ])
+
+    def put_tag(self, blob):
+        """Stores one serialized tag; False if it does not fit a slot."""
+        if len(blob) > self.tag_size - 4:
+            return False
+        slot = self.tags[int(self.ctl[TAGS_WRITTEN]) % self.tag_slots]
+        slot[:4] = np.frombuffer(len(blob).to_bytes(4, 'little'), dtype=np.uint8)
+        slot[4:4 + len(blob)] = np.frombuffer(blob, dtype=np.uint8)
+        self.ctl[TAGS_WRITTEN] += 1
+        return True
+
+    def peek_tag(self):
+        """The oldest unread serialized tag, or None."""
+        if self.ctl[TAGS_READ] == self.ctl[TAGS_WRITTEN]:
+            return None
+        slot = self.tags[int(self.ctl[TAGS_READ]) % self.tag_slots]
+        n = int.from_bytes(slot[:4].tobytes(), 'little')
+        return slot[4:4 + n].tobytes()
+
+    def pop_tag(self):
+        self.ctl[TAGS_READ] += 1
+
+    def set_eof(self):
+        self.ctl[EOF] = 1
+
+    def eof(self):
+        return bool(self.ctl[EOF])
+
+    def close(self, unlink=False):
+        # the numpy views hold the buffer; drop them first
+        self.ctl = self.data = self.tags = None
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _tag_blob(pos, tag):
+    return pmt.serialize_str(pmt.make_tuple(pmt.from_uint64(pos), tag.key, tag.value))
+
+
+def _tag_pos(blob):
+    return pmt.to_uint64(pmt.tuple_ref(pmt.deserialize_str(blob), 0))
+
+
+class sink(gr.sync_block):
+    """Writes its input stream, with its tags, into the ring `name`."""
+    def __init__(self, name, itemsize=gr.sizeof_gr_complex, size=1 << 22):
+        gr.sync_block.__init__(
+            self,
+            name='pkt_shm.sink',
+            in_sig=[(np.uint8, itemsize)],
+            out_sig=None)
+        self.ring_name = name
+        self.itemsize = itemsize
+        self.size = size
+        self.ring = None
+        self.m_items = pkt_metrics.counter("shm.%s.items" % name)
+        self.m_waits = pkt_metrics.counter("shm.%s.full_waits" % name)
+        self.m_dropped = pkt_metrics.counter("shm.%s.tags_dropped" % name)
+
+    def start(self):
+        self.ring = Ring(self.ring_name, self.itemsize, self.size, create=True)
+        return True
+
+    def stop(self):
+        if self.ring is not None:
+            self.ring.set_eof()
+            self.ring.close(unlink=True)
+            self.ring = None
+        return True
+
+    def work(self, input_items, output_items):
+        ring = self.ring
+        raw = input_items[0].reshape(-1)
+        t_end = None
+        while ring.free() == 0 or ring.tags_free() == 0:
+            # the reader is behind: hold the flowgraph back
+            if t_end is None:
+                t_end = time.time() + WAIT
+                self.m_waits.inc()
+            elif time.time() > t_end:
+                return 0
+            time.sleep(POLL)
+        n = min(len(input_items[0]), ring.free())
+        # tags first, so the reader has them when it gets their items;
+        # kept at their item's position in the ring (WRITTEN counts items)
+        start = self.nitems_read(0)
+        base = int(ring.ctl[WRITTEN]) - start
+        for tag in self.get_tags_in_window(0, 0, n):
+            if ring.tags_free() == 0:
+                n = tag.offset - start
+                break
+            if not ring.put_tag(_tag_blob(base + tag.offset, tag)):
+                self.m_dropped.inc()
+        n = ring.write(raw[:n * self.itemsize])
+        self.m_items.inc(n)
+        return n
+
+
+class source(gr.sync_block):
+    """Reads the stream, with its tags, from the ring `name`."""
+    def __init__(self, name, itemsize=gr.sizeof_gr_complex):
+        gr.sync_block.__init__(
+            self,
+            name='pkt_shm.source',
+            in_sig=None,
+            out_sig=[(np.uint8, itemsize)])
+        self.ring_name = name
+        self.itemsize = itemsize
+        self.ring = None
+        self.m_items = pkt_metrics.counter("shm.%s.items_read" % name)
+        self.m_fill = pkt_metrics.gauge("shm.%s.fill" % name)
+        self.m_stale = pkt_metrics.counter("shm.%s.tags_stale" % name)
+
+    def attach(self):
+        try:
+            ring = Ring(self.ring_name)
+        except FileNotFoundError:
+            return None
+        if ring.itemsize != self.itemsize:
+            ring.close()
+            raise ValueError("ring %s carries %d-byte items, expected %d" % (self.ring_name, ring.itemsize, self.itemsize))
+        # a reader before this one read up to READ: its tags are stale
+        read = int(ring.ctl[READ])
+        while True:
+            blob = ring.peek_tag()
+            if blob is None or _tag_pos(blob) >= read:
+                break
+            ring.pop_tag()
+            self.m_stale.inc()
+        return ring
+
+    def stop(self):
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        return True
+
+    def work(self, input_items, output_items):
+        t_end = time.time() + WAIT
+        while self.ring is None:
+            self.ring = self.attach()
+            if self.ring is None:
+                if time.time() > t_end:
+                    return 0
+                time.sleep(POLL)
+        ring = self.ring
+        while ring.available() == 0:
+            if ring.eof():
+                return -1   # WORK_DONE: the writer has stopped
+            if time.time() > t_end:
+                return 0
+            time.sleep(POLL)
+        self.m_fill.set(ring.available() / ring.size)
+        start = int(ring.ctl[READ])     # ring position of output item 0
+        n = ring.read(output_items[0].reshape(-1))
+        while True:
+            blob = ring.peek_tag()
+            if blob is None:
+                break
+            tag = pmt.deserialize_str(blob)
+            pos = pmt.to_uint64(pmt.tuple_ref(tag, 0))
+            if pos >= start + n:
+                break
+            if pos >= start:
+                self.add_item_tag(0, self.nitems_written(0) + pos - start, pmt.tuple_ref(tag, 1), pmt.tuple_ref(tag, 2))
+            else:
+                self.m_stale.inc()
+            ring.pop_tag()
+        self.m_items.inc(n)
+        return n
+
+
+class Split:
+    """Builds one part of a flowgraph cut in two at a stream connection.
+    Created before the flowgraph's connections are made, it collects them
+    instead; apply() then makes only those of `part` ('front': the side
+    the cut comes from, 'back': the side it goes to) and puts a shared
+    memory sink / source on the cut:
+        split = pkt_shm.Split(self, 'front', ((self.a, 0), (self.b, 0)), 'pkt_rcv')
+        self.connect(...)
+        split.apply()
+    A part is everything connected (stream or message) to its end of the
+    cut without going through the cut. Blocks given as None exist only in
+    the other process and are skipped."""
+    def __init__(self, tb, part, cut, name, itemsize=gr.sizeof_gr_complex, size=1 << 22):
+        if part not in ('front', 'back'):
+            raise ValueError("part must be 'front' or 'back', got %r" % part)
+        self.tb = tb
+        self.part = part
+        self.cut = cut
+        self.name = name
+        self.itemsize = itemsize
+        self.size = size
+        self.edges = []
+        self.msg_edges = []
+        tb.connect = lambda *args: self.edges.append(args)
+        tb.msg_connect = lambda *args: self.msg_edges.append(args)
+
+    @staticmethod
+    def _ends(args):
+        # (a, port), (b, port) from connect((a, port), (b, port)),
+        # connect(a, b) or msg_connect(a, port, b, port)
+        if len(args) == 4:
+            return (args[0], args[1]), (args[2], args[3])
+        return tuple(x if isinstance(x, tuple) else (x, 0) for x in args)
+
+    def apply(self):
+        tb = self.tb
+        del tb.connect, tb.msg_connect
+        (src, src_port), (dst, dst_port) = self.cut
+        links = {}
+        for args in self.edges + self.msg_edges:
+            (a, pa), (b, pb) = self._ends(args)
+            if (a, pa, b, pb) == (src, src_port, dst, dst_port) or a is None or b is None:
+                continue
+            links.setdefault(id(a), set()).add(id(b))
+            links.setdefault(id(b), set()).add(id(a))
+        side = {}
+        for start, label in ((src, 'front'), (dst, 'back')):
+            todo = [id(start)]
+            while todo:
+                k = todo.pop()
+                if side.get(k, label) != label:
+                    raise ValueError("the cut does not split the flowgraph in two")
+                if k in side:
+                    continue
+                side[k] = label
+                todo.extend(links.get(k, ()))
+        mine = lambda blk: blk is not None and side.get(id(blk)) == self.part
+        for args in self.edges:
+            (a, pa), (b, pb) = self._ends(args)
+            if mine(a) and mine(b):
+                tb.connect(*args)
+        for args in self.msg_edges:
+            (a, pa), (b, pb) = self._ends(args)
+            if mine(a) and mine(b):
+                tb.msg_connect(*args)
+        if self.part == 'front':
+            self.shm_sink = sink(self.name, self.itemsize, self.size)
+            tb.connect((src, src_port), (self.shm_sink, 0))
+        else:
+            self.shm_source = source(self.name, self.itemsize)
+            tb.connect((self.shm_source, 0), (dst, dst_port))
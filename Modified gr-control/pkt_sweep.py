@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+BER/PER sweep of the packet and QPSK modems over channels.channel_model.
+
+Every point of the grid noise voltage x frequency offset x timing offset
+runs in its own worker process (all cores by default), unthrottled:
+    pkt     pkt_xmt's modulator and polyphase RRC shaper -> channel ->
+            pkt_rcv's demodulator, decoder chain and CRC (pkt_demod.py),
+            ARQ off. Sends --size random bytes.
+            per     data packets lost (failed CRC or never found)
+            fec_ber channel bit errors corrected by the FEC decoder per
+                    coded bit: an estimate of the BER, not a count
+                    against the payload (none without FEC)
+    qpsk    qpsk_stage6_ss's modulator -> channel -> qpsk_stage6_ss_rcv's
+            demodulator, --bits random bits.
+            ber     bit errors against the transmitted bits, after the
+                    first --settle bits (loops locking)
+snr_db is the measured signal power over noise_volt**2.
+
+Both links run at the modem rate (4 samples/symbol), without the
+interpolation / decimation to the radio rate. The symbol sync runs at
+2 samples/symbol into the preamble correlator and the equalizer, which
+trains on the known preamble + access code, as in the receivers.
+
+Values are a single number, a list 0,0.1,0.2 or a range start:stop:step
+(stop included):
+    python3 pkt_sweep.py --modem pkt,qpsk --noise-volt 0:0.6:0.05 \\
+        --freq-offset 0,0.001 --out sweep.jsonl --plot sweep.png
+Prints one JSON line per point (as they finish) and a summary line.
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from argparse import ArgumentParser
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from gnuradio import gr, blocks, channels, digital, pfb
+from gnuradio.filter import firdes
+import pkt_xmt_epy_block_0
+import pkt_xmt_epy_block_3
+import pkt_xmt_epy_block_4
+import pkt_rcv_epy_block_7
+import pkt_demod
+import pkt_preamble
+
+
+class power_probe(gr.hier_block2):
+    """Mean power of a complex stream, read with level()."""
+    def __init__(self, length=10000):
+        gr.hier_block2.__init__(self, "power_probe",
+            gr.io_signature(1, 1, gr.sizeof_gr_complex), gr.io_signature(0, 0, 0))
+        self.mag_squared = blocks.complex_to_mag_squared(1)
+        self.average = blocks.moving_average_ff(length, 1.0/length, 4000, 1)
+        self.probe = blocks.probe_signal_f()
+        self.connect(self, self.mag_squared, self.average, self.probe)
+
+    def level(self):
+        return self.probe.level()
+
+
+class pkt_link(gr.top_block):
+
+    def __init__(self, in_file, noise_volt=0.0, freq_offset=0.0, time_offset=1.0, fec_code='conv', fec_depth=16):
+        gr.top_block.__init__(self, "pkt_link", catch_exceptions=True)
+
+        ##################################################
+        # Variables (as in pkt_xmt / pkt_rcv)
+        ##################################################
+        self.samp_rate = samp_rate = 48000
+        self.sps = sps = 4
+        self.excess_bw = excess_bw = 0.35
+        self.access_key = access_key = '11100001010110101110100010010011'
+        self.hdr_format = hdr_format = digital.header_format_default(access_key, 0)
+        self.bpsk = bpsk = digital.constellation_bpsk().base()
+        self.bpsk.set_npwr(1.0)
+        # pkt_xmt's polyphase shaper, interpolating to the modem rate only
+        self.rrc_taps = rrc_taps = firdes.root_raised_cosine(sps, samp_rate, samp_rate/sps, excess_bw, 11*sps)
+
+        ##################################################
+        # Blocks
+        ##################################################
+        # transmitter
+        self.source = pkt_xmt_epy_block_0.blk(FileName=in_file, Pkt_len=60, Mmap=False, Payload='binary', Control='', Window=0, Timeout=2.0)
+        self.crc32 = digital.crc32_bb(False, "packet_len", True)
+        self.fec_encoder = pkt_xmt_epy_block_4.blk(Code=fec_code, Depth=fec_depth)
+        self.formatter = digital.protocol_formatter_bb(hdr_format, "packet_len")
+        self.mux = blocks.tagged_stream_mux(gr.sizeof_char*1, "packet_len", 0)
+        self.framer = pkt_xmt_epy_block_3.frame_builder(preamble=[0xAA, 0x55, 0xAA, 0x55, 0xAA, 0x55, 0xAA, 0x55], packet_len_tag_key="packet_len")
+        self.unpack = blocks.packed_to_unpacked_bb(1, gr.GR_MSB_FIRST)
+        self.diff_encoder = digital.diff_encoder_bb(2, digital.DIFF_DIFFERENTIAL)
+        self.to_symbols = digital.chunks_to_symbols_bc(bpsk.points(), 1)
+        self.shaper = pfb.interpolator_ccf(
+            sps,
+            rrc_taps,
+            100)
+        self.shaper.declare_sample_delay(0)
+        # channel
+        self.channel = channels.channel_model(
+            noise_voltage=noise_volt,
+            frequency_offset=freq_offset,
+            epsilon=time_offset,
+            taps=[1.0 + 0.0j, ],
+            noise_seed=0,
+            block_tags=True)
+        self.power = power_probe()
+        # receiver, at the modem rate: no channel filter, no coarse CFO correction
+        self.demod = pkt_demod.demod(samp_rate, 0, fec_code=fec_code, fec_depth=fec_depth)
+        self.decoder = self.demod.decoder
+        self.fec_decoder = self.demod.fec_decoder
+
+        ##################################################
+        # Connections
+        ##################################################
+        self.connect((self.source, 0), (self.crc32, 0))
+        self.connect((self.crc32, 0), (self.fec_encoder, 0))
+        self.connect((self.fec_encoder, 0), (self.formatter, 0))
+        self.connect((self.formatter, 0), (self.mux, 0))
+        self.connect((self.fec_encoder, 0), (self.mux, 1))
+        self.connect((self.mux, 0), (self.framer, 0))
+        self.connect((self.framer, 0), (self.unpack, 0))
+        self.connect((self.unpack, 0), (self.diff_encoder, 0))
+        self.connect((self.diff_encoder, 0), (self.to_symbols, 0))
+        self.connect((self.to_symbols, 0), (self.shaper, 0))
+        self.connect((self.shaper, 0), (self.channel, 0))
+        self.connect((self.shaper, 0), (self.power, 0))
+        self.connect((self.channel, 0), (self.demod, 0))
+
+    def sent_all(self):
+        src = self.source
+        return src.state == 0 and not src.pending and not src.jobs
+
+
+class qpsk_link(gr.top_block):
+
+    def __init__(self, data, noise_volt=0.0, freq_offset=0.0, time_offset=1.0):
+        gr.top_block.__init__(self, "qpsk_link", catch_exceptions=True)
+
+        ##################################################
+        # Variables (as in qpsk_stage6_ss / qpsk_stage6_ss_rcv)
+        ##################################################
+        self.sps = sps = 4
+        self.qpsk = qpsk = digital.constellation_rect([0.707+0.707j, -0.707+0.707j, -0.707-0.707j, 0.707-0.707j], [0, 1, 2, 3],
+        4, 2, 2, 1, 1).base()
+        self.nfilts = nfilts = 32
+        self.variable_adaptive_algorithm_0 = variable_adaptive_algorithm_0 = digital.adaptive_algorithm_nlms( qpsk, 0.3).base()
+        self.training = training = pkt_preamble.training_symbols('qpsk')
+        self.rrc_taps = rrc_taps = firdes.root_raised_cosine(nfilts, nfilts, 1.0/float(sps), 0.35, 11*sps*nfilts)
+        self.phase_bw = phase_bw = 0.0628
+        self.excess_bw = excess_bw = 0.35
+
+        ##################################################
+        # Blocks
+        ##################################################
+        self.source = blocks.vector_source_b(list(map(int, data)), False)
+        self.modulator = digital.generic_mod(
+            constellation=qpsk,
+            differential=True,
+            samples_per_symbol=sps,
+            pre_diff_code=True,
+            excess_bw=excess_bw,
+            verbose=False,
+            log=False,
+            truncate=False)
+        self.channel = channels.channel_model(
+            noise_voltage=noise_volt,
+            frequency_offset=freq_offset,
+            epsilon=time_offset,
+            taps=[1.0 + 0.0j, ],
+            noise_seed=0,
+            block_tags=False)
+        self.power = power_probe()
+        self.costas = digital.costas_loop_cc(phase_bw, 4, False)
+        self.symbol_sync = digital.symbol_sync_cc(
+            digital.TED_GARDNER,
+            sps,
+            phase_bw,
+            1.0,
+            1.0,
+            1.5,
+            2,
+            digital.constellation_bpsk().base(),
+            digital.IR_PFB_MF,
+            32,
+            rrc_taps)
+        self.preamble = pkt_rcv_epy_block_7.blk(Modulation='qpsk', Sps=2, Threshold=0.6, Mark_delay=0)
+        self.equalizer = digital.linear_equalizer(15, 2, variable_adaptive_algorithm_0, True, training, 'corr_est')
+        self.slicer = digital.constellation_decoder_cb(qpsk)
+        self.diff_decoder = digital.diff_decoder_bb(4, digital.DIFF_DIFFERENTIAL)
+        self.map = digital.map_bb([0,1,2,3])
+        self.unpack = blocks.unpack_k_bits_bb(2)
+        self.sink = blocks.vector_sink_b(1, len(data) * 8)
+
+        ##################################################
+        # Connections
+        ##################################################
+        self.connect((self.source, 0), (self.modulator, 0))
+        self.connect((self.modulator, 0), (self.channel, 0))
+        self.connect((self.modulator, 0), (self.power, 0))
+        self.connect((self.channel, 0), (self.costas, 0))
+        self.connect((self.costas, 0), (self.symbol_sync, 0))
+        self.connect((self.symbol_sync, 0), (self.preamble, 0))
+        self.connect((self.preamble, 0), (self.equalizer, 0))
+        self.connect((self.equalizer, 0), (self.slicer, 0))
+        self.connect((self.slicer, 0), (self.diff_decoder, 0))
+        self.connect((self.diff_decoder, 0), (self.map, 0))
+        self.connect((self.map, 0), (self.unpack, 0))
+        self.connect((self.unpack, 0), (self.sink, 0))
+
+
+def bit_errors(tx_bits, rx_bits, settle):
+    """(errors, compared) after lining rx_bits up with tx_bits."""
+    rx = np.asarray(rx_bits, dtype=np.int8)[settle:]
+    if len(rx) < 256:
+        return 0, 0
+    probe = 2.0 * rx[:min(len(rx), 4096)] - 1.0
+    ref = 2.0 * np.asarray(tx_bits, dtype=np.int8) - 1.0
+    # cross-correlate the start of what came out against everything sent
+    n = 1 << int(np.ceil(np.log2(len(ref) + len(probe))))
+    corr = np.fft.irfft(np.fft.rfft(ref, n) * np.conj(np.fft.rfft(probe, n)), n)[:len(ref)]
+    lag = int(np.argmax(corr))
+    if corr[lag] < 0.5 * len(probe):
+        # never locked
+        return len(rx), len(rx)
+    m = min(len(rx), len(ref) - lag)
+    return int(np.count_nonzero(rx[:m] != tx_bits[lag:lag + m])), m
+
+
+def snr_db(power, noise_volt):
+    if noise_volt <= 0 or power <= 0:
+        return None
+    return round(10 * np.log10(power / noise_volt ** 2), 2)
+
+
+def run_pkt(point, options):
+    fd, path = tempfile.mkstemp(prefix='pkt_sweep_', suffix='.bin')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(np.random.default_rng(1).bytes(options.size))
+        tb = pkt_link(path, point['noise_volt'], point['freq_offset'], point['time_offset'],
+                      fec_code=options.fec)
+        # the counters are per process; count from here
+        counters = (tb.decoder.m_data, tb.fec_decoder.m_coded, tb.fec_decoder.m_corrected)
+        base = [c.value for c in counters]
+        t0 = time.time()
+        tb.start()
+        while not tb.sent_all() and time.time() - t0 < options.timeout:
+            time.sleep(0.05)
+        # let the receiver take in what is still on the way
+        last = -1
+        while counters[0].value != last and time.time() - t0 < options.timeout:
+            last = counters[0].value
+            time.sleep(0.2)
+        tb.stop()
+        tb.wait()
+        run_s = time.time() - t0
+    finally:
+        os.remove(path)
+    sent = -(-options.size // 60)
+    rcvd, coded, corrected = (c.value - b for c, b in zip(counters, base))
+    return dict(point, run_s=round(run_s, 3),
+        snr_db=snr_db(tb.power.level(), point['noise_volt']),
+        packets=sent, passed=rcvd,
+        per=round(1.0 - min(rcvd, sent) / sent, 6),
+        fec_ber=round(corrected / (8.0 * coded), 8) if (coded and options.fec != 'none') else None)
+
+
+def run_qpsk(point, options):
+    # preamble + access code first, as qpsk_stage6_ss sends, for the equalizer
+    data = np.concatenate((np.array(pkt_preamble.start_bytes(), dtype=np.uint8),
+        np.random.default_rng(1).integers(0, 256, options.bits // 8, dtype=np.uint8)))
+    tb = qpsk_link(data, point['noise_volt'], point['freq_offset'], point['time_offset'])
+    t0 = time.time()
+    tb.run()
+    run_s = time.time() - t0
+    errors, compared = bit_errors(np.unpackbits(data), tb.sink.data(), options.settle)
+    return dict(point, run_s=round(run_s, 3),
+        snr_db=snr_db(tb.power.level(), point['noise_volt']),
+        bits=compared, errors=errors,
+        ber=round(errors / compared, 8) if compared else None)
+
+
+def run_point(point, options):
+    if point['modem'] == 'pkt':
+        return run_pkt(point, options)
+    return run_qpsk(point, options)
+
+
+def values(spec):
+    """'0.1', '0,0.1,0.2' or '0:0.5:0.1' (start:stop:step, stop included)."""
+    if ':' in spec:
+        start, stop, step = (float(x) for x in spec.split(':'))
+        return [round(float(v), 9) for v in np.arange(start, stop + step / 2, step)]
+    return [float(x) for x in spec.split(',')]
+
+
+def argument_parser():
+    parser = ArgumentParser(description='parallel BER/PER sweep over the channel model')
+    parser.add_argument("--modem", dest="modem", type=str, default='pkt,qpsk',
+        help="pkt, qpsk or both [default=%(default)r]")
+    parser.add_argument("--noise-volt", dest="noise_volt", type=str, default='0:0.5:0.05',
+        help="Noise voltages [default=%(default)r]")
+    parser.add_argument("--freq-offset", dest="freq_offset", type=str, default='0',
+        help="Frequency offsets, cycles/sample [default=%(default)r]")
+    parser.add_argument("--time-offset", dest="time_offset", type=str, default='1.0',
+        help="Timing offsets (sample rate ratio) [default=%(default)r]")
+    parser.add_argument("--fec", dest="fec", type=str, default='conv',
+        help="FEC code of the packet modem [default=%(default)r]")
+    parser.add_argument("--size", dest="size", type=int, default=30000,
+        help="Bytes per pkt point [default=%(default)r]")
+    parser.add_argument("--bits", dest="bits", type=int, default=400000,
+        help="Bits per qpsk point [default=%(default)r]")
+    parser.add_argument("--settle", dest="settle", type=int, default=4000,
+        help="qpsk bits not counted while the loops lock [default=%(default)r]")
+    parser.add_argument("--workers", dest="workers", type=int, default=os.cpu_count(),
+        help="Worker processes [default=%(default)r]")
+    parser.add_argument("--timeout", dest="timeout", type=float, default=600.0,
+        help="Give up on a pkt point after this many seconds [default=%(default)r]")
+    parser.add_argument("--out", dest="out", type=str, default='',
+        help="Also write the JSON lines here")
+    parser.add_argument("--plot", dest="plot", type=str, default='',
+        help="Draw BER (FEC estimate for pkt) / PER against SNR into this image (needs matplotlib)")
+    return parser
+
+
+def plot(results, path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    fig, (ax_ber, ax_per) = plt.subplots(1, 2, figsize=(12, 5))
+    curves = {}
+    for r in results:
+        key = (r['modem'], r['freq_offset'], r['time_offset'])
+        curves.setdefault(key, []).append(r)
+    for (modem, fo, to), pts in sorted(curves.items()):
+        pts = [p for p in pts if p['snr_db'] is not None]
+        pts.sort(key=lambda p: p['snr_db'])
+        label = '%s fo=%g to=%g' % (modem, fo, to)
+        x = [p['snr_db'] for p in pts]
+        if modem == 'pkt':
+            label += ' (FEC est.)'
+            ber = [p['fec_ber'] for p in pts]
+        else:
+            ber = [p['ber'] for p in pts]
+        if any(b is not None for b in ber):
+            ax_ber.semilogy(x, [b if b else np.nan for b in ber], 'o-', label=label)
+        if modem == 'pkt':
+            ax_per.semilogy(x, [p['per'] if p['per'] else np.nan for p in pts], 'o-', label=label)
+    for ax, name in ((ax_ber, 'BER'), (ax_per, 'PER')):
+        ax.set_xlabel('SNR (dB)')
+        ax.set_ylabel(name)
+        ax.grid(True, which='both')
+        ax.legend(fontsize='small')
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def main(options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    grid = [dict(modem=m, noise_volt=n, freq_offset=fo, time_offset=to)
+            for m, n, fo, to in itertools.product(options.modem.split(','),
+                values(options.noise_volt), values(options.freq_offset), values(options.time_offset))]
+    f_out = open(options.out, 'w') if options.out else None
+    results = []
+    t0 = time.time()
+    # a fresh (spawned) process for every point, where Python allows it
+    # (3.11+); nothing of this process is shared with the workers
+    kwargs = {'max_tasks_per_child': 1} if sys.version_info >= (3, 11) else {}
+    with ProcessPoolExecutor(max_workers=options.workers,
+                             mp_context=multiprocessing.get_context('spawn'), **kwargs) as pool:
+        futures = {pool.submit(run_point, p, options): p for p in grid}
+        for fut in as_completed(futures):
+            try:
+                r = fut.result()
+            except Exception as exc:
+                r = dict(futures[fut], error=str(exc))
+            results.append(r)
+            line = json.dumps(r)
+            print(line, flush=True)
+            if f_out:
+                f_out.write(line + '\n')
+    summary = {'summary': True, 'points': len(grid), 'workers': options.workers,
+               'wall_s': round(time.time() - t0, 3),
+               'points_s': round(sum(r.get('run_s', 0.0) for r in results), 3)}
+    print(json.dumps(summary))
+    if f_out:
+        f_out.write(json.dumps(summary) + '\n')
+        f_out.close()
+    if options.plot:
+        plot([r for r in results if 'error' not in r], options.plot)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Wake-up timer for blocks whose work() has nothing to do until later
+(token bucket empty, waiting for ACKs, idle between jobs), so work() can
+return 0 at once instead of sleeping in the scheduler thread.
+
+A block that returns 0 is only called again when its input changes or a
+message arrives (or after 250 ms). Waker posts a message to the block's
+own 'wake' port at the time asked for:
+    self.waker = pkt_wake.Waker(self)       # in __init__
+    ...
+    def start(self):
+        self.waker.start()
+        return True
+    def stop(self):
+        self.waker.stop()
+        return True
+    ...
+    self.waker.after(0.005)                 # in work(), then return 0
+One thread per block; of several wake-ups asked for, the earliest wins.
+"""
+
+import threading
+import time
+import pmt
+
+
+class Waker:
+    def __init__(self, block, port='wake'):
+        self.block = block
+        self.port = pmt.intern(port)
+        self.t_wake = None      # time of the next wake-up
+        self.done = False
+        self.cond = threading.Condition()
+        self.thread = None
+        block.message_port_register_in(self.port)
+        block.set_msg_handler(self.port, self.handle)
+
+    def handle(self, msg):
+        # the message only makes the scheduler call work() again
+        pass
+
+    def start(self):
+        self.done = False
+        self.thread = threading.Thread(target=self.run, name='pkt_wake', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.done = True
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def after(self, delay):
+        """Wake the block `delay` seconds from now."""
+        t = time.time() + delay
+        with self.cond:
+            if self.t_wake is None or t < self.t_wake:
+                self.t_wake = t
+                self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.done and (self.t_wake is None or self.t_wake > time.time()):
+                    self.cond.wait(None if self.t_wake is None else max(self.t_wake - time.time(), 0.0))
+                if self.done:
+                    return
+                self.t_wake = None
+            self.block._post(self.port, pmt.PMT_T)
@@ -16,6 +16,7 @@ from gnuradio import blocks
 import pmt
 from gnuradio import digital
 from gnuradio import filter
+from gnuradio.filter import pfb
 from gnuradio.filter import firdes
 from gnuradio import gr
 from gnuradio.fft import window
@@ -27,14 +28,162 @@ from gnuradio.eng_arg import eng_float, intx
 from gnuradio import eng_notation
 from gnuradio import uhd
 import time
+from gnuradio import zeromq
+import pkt_xmt_epy_block_0 as epy_block_0  # embedded python block
+import pkt_xmt_epy_block_3 as epy_block_3  # embedded python block
+import pkt_xmt_epy_block_4 as epy_block_4  # embedded python block
+import pkt_radio
+import pkt_resample
+import pkt_perf
 import sip
 
 
 
 class pkt_xmt(gr.top_block, Qt.QWidget):
 
-    def __init__(self, InFile='default'):
+    def __init__(self, InFile='default', control='tcp://127.0.0.1:5556', headless=False, radio='uhd', shaper='polyphase'):
         gr.top_block.__init__(self, "pkt_xmt", catch_exceptions=True)
+        self.display = False
+        self.radio = radio
+        self.shaper = shaper
+
+        ##################################################
+        # Parameters
+        ##################################################
+        self.InFile = InFile
+        self.control = control
+
+        ##################################################
+        # Variables
+        ##################################################
+        self.samp_rate = samp_rate = 48000
+        self.access_key = access_key = '11100001010110101110100010010011'
+        self.usrp_rate = usrp_rate = 48000*16
+        self.sps = sps = 4
+        self.tx_interp = tx_interp = int(usrp_rate*sps/samp_rate)
+        self.rs_ratio = rs_ratio = 1.040
+        self.low_pass_filter_taps = low_pass_filter_taps = firdes.low_pass(1.0, samp_rate, 20000,2000, window.WIN_HAMMING, 6.76)
+        self.hdr_format = hdr_format = digital.header_format_default(access_key, 0)
+        self.fec_depth = fec_depth = 16
+        self.fec_code = fec_code = 'conv'
+        self.excess_bw = excess_bw = 0.35
+        self.rrc_taps = rrc_taps = firdes.root_raised_cosine(tx_interp, usrp_rate, samp_rate/sps, excess_bw, 11*tx_interp)
+        self.bpsk = bpsk = digital.constellation_bpsk().base()
+        self.bpsk.set_npwr(1.0)
+        self.arq_window = arq_window = 16
+
+        ##################################################
+        # Blocks
+        ##################################################
+
+        self.zeromq_sub_msg_source_1 = zeromq.sub_msg_source("tcp://127.0.0.1:5557", 100, False)
+        if radio == 'uhd':
+            self.uhd_usrp_sink_0 = uhd.usrp_sink(
+                ",".join(("", '')),
+                uhd.stream_args(
+                    cpu_format="fc32",
+                    args='',
+                    channels=list(range(0,1)),
+                ),
+                "",
+            )
+            self.uhd_usrp_sink_0.set_samp_rate(usrp_rate)
+            self.uhd_usrp_sink_0.set_time_unknown_pps(uhd.time_spec(0))
+
+            self.uhd_usrp_sink_0.set_center_freq(2.45*10**9, 0)
+            self.uhd_usrp_sink_0.set_antenna("TX/RX", 0)
+            self.uhd_usrp_sink_0.set_bandwidth((usrp_rate/sps), 0)
+            self.uhd_usrp_sink_0.set_gain(20, 0)
+        else:
+            # no radio: publish the samples for chan_loopback (see pkt_radio.py)
+            self.uhd_usrp_sink_0 = pkt_radio.sink(radio)
+        self.epy_block_4 = epy_block_4.blk(Code=fec_code, Depth=fec_depth)
+        self.epy_block_3 = epy_block_3.frame_builder(preamble=[0xAA, 0x55, 0xAA, 0x55, 0xAA, 0x55, 0xAA, 0x55], packet_len_tag_key="packet_len")
+        self.epy_block_0 = epy_block_0.blk(FileName=InFile, Pkt_len=60, Mmap=False, Payload='binary', Control=control, Window=arq_window, Timeout=2.0)
+        self.digital_protocol_formatter_bb_0 = digital.protocol_formatter_bb(hdr_format, "packet_len")
+        self.digital_crc32_bb_0 = digital.crc32_bb(False, "packet_len", True)
+        self.blocks_tagged_stream_mux_0 = blocks.tagged_stream_mux(gr.sizeof_char*1, "packet_len", 0)
+        self.blocks_tag_debug_0 = blocks.tag_debug(gr.sizeof_char*1, '', "packet_len")
+        self.blocks_tag_debug_0.set_display(True)
+
+        if shaper == 'legacy':
+            # the three-stage chain this replaced: generic_mod at sps, 20 kHz
+            # low-pass and 16x resampler (compare with pkt_bench.py --shaper)
+            self.digital_constellation_modulator_0 = digital.generic_mod(
+                constellation=bpsk,
+                differential=True,
+                samples_per_symbol=sps,
+                pre_diff_code=True,
+                excess_bw=excess_bw,
+                verbose=False,
+                log=False,
+                truncate=False)
+            self.rational_resampler_xxx_0 = filter.rational_resampler_ccc(
+                    interpolation=16,
+                    decimation=1,
+                    taps=[],
+                    fractional_bw=0)
+            self.fft_filter_xxx_0_0_0 = filter.fft_filter_ccc(1, low_pass_filter_taps, 1)
+            self.fft_filter_xxx_0_0_0.declare_sample_delay(0)
+        elif shaper == 'multistage':
+            # generic_mod at sps, then up to usrp_rate in halfband stages
+            self.digital_constellation_modulator_0 = digital.generic_mod(
+                constellation=bpsk,
+                differential=True,
+                samples_per_symbol=sps,
+                pre_diff_code=True,
+                excess_bw=excess_bw,
+                verbose=False,
+                log=False,
+                truncate=False)
+            self.resampler_0 = pkt_resample.interpolator(usrp_rate//samp_rate, (1+excess_bw)/(2*sps), 70)
+        else:
+            # symbols straight to usrp_rate: one polyphase RRC interpolator
+            # (tx_interp = sps*16 arms of 11 taps) in place of the three stages
+            self.pfb_interpolator_ccf_0 = pfb.interpolator_ccf(
+                tx_interp,
+                rrc_taps,
+                100)
+            self.pfb_interpolator_ccf_0.declare_sample_delay(0)
+            self.digital_diff_encoder_bb_0 = digital.diff_encoder_bb(2, digital.DIFF_DIFFERENTIAL)
+            self.digital_chunks_to_symbols_xx_0 = digital.chunks_to_symbols_bc(bpsk.points(), 1)
+            self.blocks_packed_to_unpacked_xx_0 = blocks.packed_to_unpacked_bb(1, gr.GR_MSB_FIRST)
+
+
+        ##################################################
+        # Connections
+        ##################################################
+        self.msg_connect((self.zeromq_sub_msg_source_1, 'out'), (self.epy_block_0, 'ack'))
+        self.connect((self.blocks_tagged_stream_mux_0, 0), (self.epy_block_3, 0))
+        self.connect((self.digital_crc32_bb_0, 0), (self.epy_block_4, 0))
+        self.connect((self.digital_protocol_formatter_bb_0, 0), (self.blocks_tagged_stream_mux_0, 0))
+        self.connect((self.epy_block_0, 0), (self.digital_crc32_bb_0, 0))
+        self.connect((self.epy_block_3, 0), (self.blocks_tag_debug_0, 0))
+        self.connect((self.epy_block_4, 0), (self.blocks_tagged_stream_mux_0, 1))
+        self.connect((self.epy_block_4, 0), (self.digital_protocol_formatter_bb_0, 0))
+        if shaper == 'legacy':
+            self.connect((self.digital_constellation_modulator_0, 0), (self.fft_filter_xxx_0_0_0, 0))
+            self.connect((self.epy_block_3, 0), (self.digital_constellation_modulator_0, 0))
+            self.connect((self.fft_filter_xxx_0_0_0, 0), (self.rational_resampler_xxx_0, 0))
+            self.connect((self.rational_resampler_xxx_0, 0), (self.uhd_usrp_sink_0, 0))
+        elif shaper == 'multistage':
+            self.connect((self.digital_constellation_modulator_0, 0), (self.resampler_0, 0))
+            self.connect((self.epy_block_3, 0), (self.digital_constellation_modulator_0, 0))
+            self.connect((self.resampler_0, 0), (self.uhd_usrp_sink_0, 0))
+        else:
+            self.connect((self.blocks_packed_to_unpacked_xx_0, 0), (self.digital_diff_encoder_bb_0, 0))
+            self.connect((self.digital_chunks_to_symbols_xx_0, 0), (self.pfb_interpolator_ccf_0, 0))
+            self.connect((self.digital_diff_encoder_bb_0, 0), (self.digital_chunks_to_symbols_xx_0, 0))
+            self.connect((self.epy_block_3, 0), (self.blocks_packed_to_unpacked_xx_0, 0))
+            self.connect((self.pfb_interpolator_ccf_0, 0), (self.uhd_usrp_sink_0, 0))
+
+        if not headless:
+            self.attach_display()
+
+    def attach_display(self):
+        # Qt window and display sinks; needs a QApplication. Headless runs
+        # skip this and only build the DSP chain above.
+        usrp_rate = self.usrp_rate
         Qt.QWidget.__init__(self)
         self.setWindowTitle("pkt_xmt")
         qtgui.util.check_set_qss()
@@ -63,55 +212,11 @@ class pkt_xmt(gr.top_block, Qt.QWidget):
         except BaseException as exc:
             print(f"Qt GUI: Could not restore geometry: {str(exc)}", file=sys.stderr)
 
-        ##################################################
-        # Parameters
-        ##################################################
-        self.InFile = InFile
-
-        ##################################################
-        # Variables
-        ##################################################
-        self.samp_rate = samp_rate = 48000
-        self.access_key = access_key = '11100001010110101110100010010011'
-        self.usrp_rate = usrp_rate = 48000*16
-        self.sps = sps = 4
-        self.rs_ratio = rs_ratio = 1.040
-        self.low_pass_filter_taps = low_pass_filter_taps = firdes.low_pass(1.0, samp_rate, 20000,2000, window.WIN_HAMMING, 6.76)
-        self.hdr_format = hdr_format = digital.header_format_default(access_key, 0)
-        self.excess_bw = excess_bw = 0.35
-        self.bpsk = bpsk = digital.constellation_bpsk().base()
-        self.bpsk.set_npwr(1.0)
-
-        ##################################################
-        # Blocks
-        ##################################################
-
-        self.uhd_usrp_sink_0 = uhd.usrp_sink(
-            ",".join(("", '')),
-            uhd.stream_args(
-                cpu_format="fc32",
-                args='',
-                channels=list(range(0,1)),
-            ),
-            "",
-        )
-        self.uhd_usrp_sink_0.set_samp_rate(usrp_rate)
-        self.uhd_usrp_sink_0.set_time_unknown_pps(uhd.time_spec(0))
-
-        self.uhd_usrp_sink_0.set_center_freq(2.45*10**9, 0)
-        self.uhd_usrp_sink_0.set_antenna("TX/RX", 0)
-        self.uhd_usrp_sink_0.set_bandwidth((usrp_rate/sps), 0)
-        self.uhd_usrp_sink_0.set_gain(20, 0)
-        self.rational_resampler_xxx_0 = filter.rational_resampler_ccc(
-                interpolation=16,
-                decimation=1,
-                taps=[],
-                fractional_bw=0)
         self.qtgui_freq_sink_x_1 = qtgui.freq_sink_c(
             1024, #size
             window.WIN_BLACKMAN_hARRIS, #wintype
             0, #fc
-            samp_rate, #bw
+            usrp_rate, #bw
             "", #name
             1,
             None # parent
@@ -190,33 +295,16 @@ class pkt_xmt(gr.top_block, Qt.QWidget):
 
         self._qtgui_const_sink_x_0_win = sip.wrapinstance(self.qtgui_const_sink_x_0.qwidget(), Qt.QWidget)
         self.top_layout.addWidget(self._qtgui_const_sink_x_0_win)
-        self.fft_filter_xxx_0_0_0 = filter.fft_filter_ccc(1, low_pass_filter_taps, 1)
-        self.fft_filter_xxx_0_0_0.declare_sample_delay(0)
-        self.digital_constellation_modulator_0 = digital.generic_mod(
-            constellation=bpsk,
-            differential=True,
-            samples_per_symbol=sps,
-            pre_diff_code=True,
-            excess_bw=excess_bw,
-            verbose=False,
-            log=False,
-            truncate=False)
-        self.blocks_tag_debug_0 = blocks.tag_debug(gr.sizeof_char*1, '', "packet_len")
-        self.blocks_tag_debug_0.set_display(True)
-        self.blocks_file_source_0 = blocks.file_source(gr.sizeof_char*1, '/home/jonte/Documents/gnurd/gr-logo.png', True, 0, 0)
-        self.blocks_file_source_0.set_begin_tag(pmt.PMT_NIL)
-
-
-        ##################################################
-        # Connections
-        ##################################################
-        self.connect((self.blocks_file_source_0, 0), (self.blocks_tag_debug_0, 0))
-        self.connect((self.blocks_file_source_0, 0), (self.digital_constellation_modulator_0, 0))
-        self.connect((self.digital_constellation_modulator_0, 0), (self.fft_filter_xxx_0_0_0, 0))
-        self.connect((self.digital_constellation_modulator_0, 0), (self.qtgui_const_sink_x_0, 0))
-        self.connect((self.fft_filter_xxx_0_0_0, 0), (self.rational_resampler_xxx_0, 0))
-        self.connect((self.rational_resampler_xxx_0, 0), (self.qtgui_freq_sink_x_1, 0))
-        self.connect((self.rational_resampler_xxx_0, 0), (self.uhd_usrp_sink_0, 0))
+        if self.shaper == 'legacy':
+            self.connect((self.digital_constellation_modulator_0, 0), (self.qtgui_const_sink_x_0, 0))
+            self.connect((self.rational_resampler_xxx_0, 0), (self.qtgui_freq_sink_x_1, 0))
+        elif self.shaper == 'multistage':
+            self.connect((self.digital_constellation_modulator_0, 0), (self.qtgui_const_sink_x_0, 0))
+            self.connect((self.resampler_0, 0), (self.qtgui_freq_sink_x_1, 0))
+        else:
+            self.connect((self.digital_chunks_to_symbols_xx_0, 0), (self.qtgui_const_sink_x_0, 0))
+            self.connect((self.pfb_interpolator_ccf_0, 0), (self.qtgui_freq_sink_x_1, 0))
+        self.display = True
 
 
     def closeEvent(self, event):
@@ -232,6 +320,14 @@ class pkt_xmt(gr.top_block, Qt.QWidget):
 
     def set_InFile(self, InFile):
         self.InFile = InFile
+        self.epy_block_0.FileName = self.InFile
+
+    def get_control(self):
+        return self.control
+
+    def set_control(self, control):
+        self.control = control
+        self.epy_block_0.Control = self.control
 
     def get_samp_rate(self):
         return self.samp_rate
@@ -239,7 +335,8 @@ class pkt_xmt(gr.top_block, Qt.QWidget):
     def set_samp_rate(self, samp_rate):
         self.samp_rate = samp_rate
         self.set_low_pass_filter_taps(firdes.low_pass(1.0, self.samp_rate, 20000, 2000, window.WIN_HAMMING, 6.76))
-        self.qtgui_freq_sink_x_1.set_frequency_range(0, self.samp_rate)
+        self.set_rrc_taps(firdes.root_raised_cosine(self.tx_interp, self.usrp_rate, self.samp_rate/self.sps, self.excess_bw, 11*self.tx_interp))
+        self.set_tx_interp(int(self.usrp_rate*self.sps/self.samp_rate))
 
     def get_access_key(self):
         return self.access_key
@@ -253,15 +350,30 @@ class pkt_xmt(gr.top_block, Qt.QWidget):
 
     def set_usrp_rate(self, usrp_rate):
         self.usrp_rate = usrp_rate
-        self.uhd_usrp_sink_0.set_samp_rate(self.usrp_rate)
-        self.uhd_usrp_sink_0.set_bandwidth((self.usrp_rate/self.sps), 0)
+        self.set_rrc_taps(firdes.root_raised_cosine(self.tx_interp, self.usrp_rate, self.samp_rate/self.sps, self.excess_bw, 11*self.tx_interp))
+        self.set_tx_interp(int(self.usrp_rate*self.sps/self.samp_rate))
+        if self.display:
+            self.qtgui_freq_sink_x_1.set_frequency_range(0, self.usrp_rate)
+        if self.radio == 'uhd':
+            self.uhd_usrp_sink_0.set_samp_rate(self.usrp_rate)
+            self.uhd_usrp_sink_0.set_bandwidth((self.usrp_rate/self.sps), 0)
 
     def get_sps(self):
         return self.sps
 
     def set_sps(self, sps):
         self.sps = sps
-        self.uhd_usrp_sink_0.set_bandwidth((self.usrp_rate/self.sps), 0)
+        self.set_rrc_taps(firdes.root_raised_cosine(self.tx_interp, self.usrp_rate, self.samp_rate/self.sps, self.excess_bw, 11*self.tx_interp))
+        self.set_tx_interp(int(self.usrp_rate*self.sps/self.samp_rate))
+        if self.radio == 'uhd':
+            self.uhd_usrp_sink_0.set_bandwidth((self.usrp_rate/self.sps), 0)
+
+    def get_tx_interp(self):
+        return self.tx_interp
+
+    def set_tx_interp(self, tx_interp):
+        self.tx_interp = tx_interp
+        self.set_rrc_taps(firdes.root_raised_cosine(self.tx_interp, self.usrp_rate, self.samp_rate/self.sps, self.excess_bw, 11*self.tx_interp))
 
     def get_rs_ratio(self):
         return self.rs_ratio
@@ -274,19 +386,44 @@ class pkt_xmt(gr.top_block, Qt.QWidget):
 
     def set_low_pass_filter_taps(self, low_pass_filter_taps):
         self.low_pass_filter_taps = low_pass_filter_taps
-        self.fft_filter_xxx_0_0_0.set_taps(self.low_pass_filter_taps)
+        if self.shaper == 'legacy':
+            self.fft_filter_xxx_0_0_0.set_taps(self.low_pass_filter_taps)
 
     def get_hdr_format(self):
         return self.hdr_format
 
     def set_hdr_format(self, hdr_format):
         self.hdr_format = hdr_format
+        self.digital_protocol_formatter_bb_0.set_header_format(self.hdr_format)
+
+    def get_fec_depth(self):
+        return self.fec_depth
+
+    def set_fec_depth(self, fec_depth):
+        self.fec_depth = fec_depth
+        self.epy_block_4.Depth = self.fec_depth
+
+    def get_fec_code(self):
+        return self.fec_code
+
+    def set_fec_code(self, fec_code):
+        self.fec_code = fec_code
+        self.epy_block_4.Code = self.fec_code
 
     def get_excess_bw(self):
         return self.excess_bw
 
     def set_excess_bw(self, excess_bw):
         self.excess_bw = excess_bw
+        self.set_rrc_taps(firdes.root_raised_cosine(self.tx_interp, self.usrp_rate, self.samp_rate/self.sps, self.excess_bw, 11*self.tx_interp))
+
+    def get_rrc_taps(self):
+        return self.rrc_taps
+
+    def set_rrc_taps(self, rrc_taps):
+        self.rrc_taps = rrc_taps
+        if self.shaper == 'polyphase':
+            self.pfb_interpolator_ccf_0.set_taps(self.rrc_taps)
 
     def get_bpsk(self):
         return self.bpsk
@@ -294,6 +431,13 @@ class pkt_xmt(gr.top_block, Qt.QWidget):
     def set_bpsk(self, bpsk):
         self.bpsk = bpsk
 
+    def get_arq_window(self):
+        return self.arq_window
+
+    def set_arq_window(self, arq_window):
+        self.arq_window = arq_window
+        self.epy_block_0.Window = self.arq_window
+
 
 
 def argument_parser():
@@ -302,17 +446,52 @@ def argument_parser():
     parser.add_argument(
         "--InFile", dest="InFile", type=str, default='default',
         help="Set File Name [default=%(default)r]")
+    parser.add_argument(
+        "--control", dest="control", type=str, default='tcp://127.0.0.1:5556',
+        help="ZMQ address the file source takes more jobs on (see xmt_job.py), empty for none [default=%(default)r]")
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="Run without the Qt window and display sinks")
+    parser.add_argument(
+        "--radio", dest="radio", type=str, default='uhd',
+        help="uhd, or a ZMQ address / file:<path> standing in for the USRP (see pkt_radio.py) [default=%(default)r]")
+    parser.add_argument(
+        "--shaper", dest="shaper", type=str, default='polyphase', choices=['polyphase', 'multistage', 'legacy'],
+        help="Pulse shaping: one polyphase RRC interpolator, the modulator + halfband stages, or the old modulator + low-pass + resampler [default=%(default)r]")
     return parser
 
 
+def main_headless(top_block_cls=pkt_xmt, options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+
+    tb = top_block_cls(InFile=options.InFile, control=options.control, headless=True, radio=options.radio, shaper=options.shaper)
+
+    def sig_handler(sig=None, frame=None):
+        tb.stop()
+        tb.wait()
+
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, sig_handler)
+    signal.signal(signal.SIGTERM, sig_handler)
+
+    pkt_perf.attach(tb)
+    tb.start()
+    tb.wait()
+
+
 def main(top_block_cls=pkt_xmt, options=None):
     if options is None:
         options = argument_parser().parse_args()
+    if options.headless:
+        return main_headless(top_block_cls, options)
 
     qapp = Qt.QApplication(sys.argv)
 
-    tb = top_block_cls(InFile=options.InFile)
+    tb = top_block_cls(InFile=options.InFile, control=options.control, radio=options.radio, shaper=options.shaper)
 
+    pkt_perf.attach(tb)
     tb.start()
 
     tb.show()
@@ -0,0 +1,432 @@
+"""
+Embedded Python Block: File Source to Tagged Stream
+"""
+
+import numpy as np
+from gnuradio import gr
+import time
+import pmt
+import os.path
+import sys
+import base64
+import mmap
+import resource
+import json
+from collections import deque, OrderedDict
+import pkt_metrics
+import pkt_wake
+
+"""
+State definitions
+    0   idle
+    1   send preamble
+    2   send file data
+    3   send file name
+    4   send post filler
+    5   send job manifest
+
+Jobs
+    Every file is a job: preamble (only when starting from idle), a
+    '%UUU#JOB' manifest packet with the job number, name and size, the file
+    data and the file name trailer. Queued jobs follow each other back to
+    back; the post filler is sent once the queue runs dry.
+    With Control set (e.g. 'tcp://127.0.0.1:5556') the block binds a ZMQ REP
+    socket and accepts more jobs while running:
+        {"file": "/path/to/file"}   queue a file, reply {"ok": true, "job": n}
+        {"status": true}            reply with the current job and queue
+    FileName, when it exists, is queued as the first job.
+
+Payload
+    base64  every Pkt_len chunk is sent Base64 encoded (compatible with the
+            original receivers)
+    binary  every chunk is sent as is, behind a one byte 'O' marker so the
+            receiver can tell it from the '%UUU' filler packets, and its
+            offset in the file (8 bytes, big endian) so the receiver puts
+            it in place even when packets before it were lost
+
+ARQ (selective repeat, on when Window > 0)
+    Every packet except the preamble and post filler goes out as
+        'S', session, seq (2 bytes, big endian), packet
+    and is kept until the receiver acknowledges it. At most Window packets
+    are outstanding; when the window is full the file is not read any
+    further. The receiver (pkt_rcv Packet Payload Decoder with the same
+    Window) answers every sequenced packet on its 'ack' port with a PDU:
+        meta {'session': s, 'ack': next expected seq}, data = bitmap of the
+        Window seqs from 'ack' on that it already holds
+    which comes back here on the 'ack' message port (over ZMQ for loopback
+    tests). Seqs below the highest one held but missing from the bitmap
+    are sent again at once, anything still unacknowledged after Timeout
+    seconds is sent again too. The session byte is random per run so the
+    receiver can tell a restarted transmitter from old duplicates.
+"""
+
+class blk(gr.sync_block):
+    def __init__(self, FileName='None', Pkt_len=52, Mmap=False, Payload='base64', Control='', Window=0, Timeout=2.0):
+        gr.sync_block.__init__(
+            self,
+            name='EPB: File Source to Tagged Stream',
+            in_sig=None,
+            out_sig=[np.uint8])
+        self.FileName = FileName
+        self.Pkt_len = Pkt_len
+        self.Mmap = Mmap
+        self.Payload = Payload
+        self.Control = Control
+        self.Window = Window
+        self.Timeout = Timeout
+        self.state = 0      # idle state
+        self.pre_count = 0
+        self.indx = 0
+        self._debug = 0     # debug
+        self.data = ""
+        self.pkt_key = pmt.intern("packet_len")
+        # packets built by the state machine but not yet copied to the output
+        self.pending = deque()
+        # number of file chunks read (and encoded) per refill
+        self.read_pkts = 64
+        self.f_map = None
+        self.f_pos = 0
+        self.t_start = None
+        self._eof = True
+        self.jobs = deque()     # file names waiting to be sent
+        self.job_id = 0
+        self.ctl = None
+        # ARQ state
+        self.session = os.urandom(1)[0]
+        self.seq = 0                    # next sequence number (not wrapped)
+        self.unacked = OrderedDict()    # seq -> sequenced packet
+        self.t_sent = {}                # seq -> time last sent
+        self.resend = deque()           # seqs to send again
+        self.t_check = 0.0
+        self.message_port_register_in(pmt.intern('ack'))
+        self.set_msg_handler(pmt.intern('ack'), self.handle_ack)
+        # calls work() again while there is nothing to send (see pkt_wake.py)
+        self.waker = pkt_wake.Waker(self)
+        # Counters instead of per-file prints (see pkt_metrics.py)
+        self.m_packets = pkt_metrics.counter("file_source.packets")
+        self.m_bytes = pkt_metrics.counter("file_source.bytes")
+        self.m_files = pkt_metrics.counter("file_source.files")
+        self.m_rate = pkt_metrics.gauge("file_source.file_bytes_per_sec")
+        self.m_rss = pkt_metrics.gauge("file_source.rss_bytes")
+        self.t_work = pkt_metrics.work_timer("file_source.work")
+        self.m_resent = pkt_metrics.counter("arq.retransmits")
+        self.m_acked = pkt_metrics.counter("arq.acked")
+        self.m_outstanding = pkt_metrics.gauge("arq.outstanding")
+
+        if (os.path.exists(self.FileName)):
+            self.jobs.append(self.FileName)
+        elif (not self.Control):
+            print(self.FileName, 'does not exist')
+        if (self.Control):
+            import zmq
+            self.ctl = zmq.Context.instance().socket(zmq.REP)
+            self.ctl.bind(self.Control)
+        if (self.jobs):
+            self.open_job(self.jobs.popleft())
+            self.state = 1
+
+        self.char_list = np.array([37,85,85,85,85,85,85,85,85,85,85,85,85,85,85,85, 85,85,85,85,85,85,85,85,85,85,85,85,85,85,85,85, 85,85,85,85,85,85,85,85,85,85,85,85,85,85,85,85, 85,85,85,93], dtype=np.uint8)
+        self.c_len = len (self.char_list)
+        # print (self.c_len)
+        self.filler = np.array([37,85,85,85, 35,69,79,70, 85,85,85,85,85,85,85,85, 85,85,85,85,85,85,85,85,85,85,85,85,85,85,85,85, 85,85,85,85,85,85,85,85,85,85,85,85,85,85,85,85, 85,85,85,93], dtype=np.uint8)
+        self.f_len = len (self.filler)
+        self.data_marker = 0x4F     # 'O', data with its file offset
+
+    def refill(self):
+        # queue the next batch of packets for the current state
+        if (self.state == 1):
+            # send preamble (65 packets)
+            if (self._debug):
+                print ("state = 1", self.pre_count)
+            self.pending.extend([self.char_list] * (65 - self.pre_count))
+            self.pre_count = 0
+            self.state = 5      # send manifest
+
+        elif (self.state == 5):
+            # send job manifest
+            manifest = json.dumps({'job': self.job_id,
+                                   'name': os.path.basename(self.FileName),
+                                   'size': self.f_size,
+                                   'payload': self.Payload}, separators=(',', ':'))
+            self.pending.append(np.concatenate((self.filler[:4], np.frombuffer(b'#JOB' + manifest.encode(), dtype=np.uint8))))
+            self.state = 2      # send msg
+
+        elif (self.state == 2):
+            if (self.t_start is None):
+                self.t_start = time.time()
+            buff = self.read_chunk (self.Pkt_len * self.read_pkts)
+            b_len = len(buff)
+            if b_len == 0:
+                # end of file
+                self.report()
+                self._eof = True
+                if (self.f_map is not None):
+                    self.f_map.close()
+                self.f_in.close()
+                self.state = 3      # send file name
+                self.pre_count = 0
+                return
+            if (self.Payload == 'binary'):
+                # one packet per Pkt_len chunk: marker byte + offset + raw bytes
+                data = np.frombuffer(buff, dtype=np.uint8)
+                count = -(-b_len // self.Pkt_len)
+                full = b_len // self.Pkt_len
+                offsets = (self.f_pos - b_len + self.Pkt_len * np.arange(count, dtype=np.uint64)).astype('>u8')
+                heads = np.empty((count, 9), dtype=np.uint8)
+                heads[:, 0] = self.data_marker
+                heads[:, 1:] = offsets.view(np.uint8).reshape(count, 8)
+                pkts = np.empty((full, self.Pkt_len + 9), dtype=np.uint8)
+                pkts[:, :9] = heads[:full]
+                pkts[:, 9:] = data[:full * self.Pkt_len].reshape(full, self.Pkt_len)
+                self.pending.extend(pkts)
+                if (count > full):
+                    self.pending.append(np.concatenate((heads[full], data[full * self.Pkt_len:])))
+            # convert to Base64, one packet per Pkt_len chunk
+            elif (self.Pkt_len % 3 == 0):
+                # whole chunks encode to whole Base64 quads, so one call covers them all
+                encoded = np.frombuffer(base64.b64encode (buff), dtype=np.uint8)
+                e_len = (self.Pkt_len // 3) * 4
+                self.pending.extend([encoded[i:i+e_len] for i in range(0, len(encoded), e_len)])
+            else:
+                for i in range(0, b_len, self.Pkt_len):
+                    self.pending.append(np.frombuffer(base64.b64encode (buff[i:i+self.Pkt_len]), dtype=np.uint8))
+            if (self._debug):
+                print ('b64 length =', len(self.pending[-1]))
+
+        elif (self.state == 3):
+            # send file name
+            fn = np.frombuffer(self.FileName.encode(), dtype=np.uint8)
+            self.pending.append(np.concatenate((self.filler[:8], fn)))
+            if (self.jobs):
+                # next job goes straight out behind this one
+                self.open_job(self.jobs.popleft())
+                self.state = 5
+            else:
+                self.state = 4
+
+        elif (self.state == 4):
+            # send post filler (17 packets)
+            if (self._debug):
+                print ("state = 4", self.pre_count)
+            self.pending.extend([self.filler] * (17 - self.pre_count))
+            self.pre_count = 0
+            self.state = 0      # idle
+
+    def open_job(self, fn):
+        # open input file
+        self.FileName = fn
+        self.f_in = open (self.FileName, 'rb')
+        self.f_size = os.path.getsize(self.FileName)
+        self._eof = False
+        self.f_map = None
+        self.f_pos = 0
+        self.t_start = None
+        self.read_pkts = 64
+        self.job_id += 1
+        if (self.Mmap and self.f_size > 0):
+            # map the file and encode large windows of it; packets are
+            # views into the encoded window, pages are faulted in (and
+            # dropped again) by the kernel as the window moves on
+            self.f_map = mmap.mmap(self.f_in.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self.f_map, 'madvise'):
+                self.f_map.madvise(mmap.MADV_SEQUENTIAL)
+            self.read_pkts = 4096
+        if (self._debug):
+            print ("File name:", self.FileName)
+
+    def poll_control(self, timeout=0):
+        # serve requests waiting on the control socket
+        while (self.ctl.poll(timeout)):
+            timeout = 0
+            try:
+                req = json.loads(self.ctl.recv())
+            except ValueError:
+                self.ctl.send_string(json.dumps({'ok': False, 'error': 'bad request'}))
+                continue
+            if ('file' in req):
+                fn = req['file']
+                if (os.path.isfile(fn)):
+                    self.jobs.append(fn)
+                    rep = {'ok': True, 'job': self.job_id + len(self.jobs), 'queued': len(self.jobs)}
+                else:
+                    rep = {'ok': False, 'error': fn + ' does not exist'}
+            else:
+                rep = {'ok': True, 'job': self.job_id, 'file': self.FileName,
+                       'state': self.state, 'queued': list(self.jobs)}
+            self.ctl.send_string(json.dumps(rep))
+
+    def read_chunk(self, size):
+        # next block of the file; a zero-copy view when memory-mapped
+        if (self.f_map is None):
+            buff = self.f_in.read (size)
+            self.f_pos += len(buff)
+            return buff
+        start = self.f_pos
+        if (start >= len(self.f_map)):
+            return b''
+        self.f_pos = min(start + size, len(self.f_map))
+        if (start > 0 and hasattr(self.f_map, 'madvise')):
+            # the previous window has been encoded, let the kernel drop it
+            page = (start // mmap.PAGESIZE) * mmap.PAGESIZE
+            self.f_map.madvise(mmap.MADV_DONTNEED, 0, page)
+        return memoryview(self.f_map)[start:self.f_pos]
+
+    def stats(self):
+        # bytes read from the file, read rate and resident memory of the process
+        elapsed = (time.time() - self.t_start) if self.t_start else 0.0
+        rss = 0
+        try:
+            with open('/proc/self/statm') as f:
+                rss = int(f.read().split()[1]) * mmap.PAGESIZE
+        except OSError:
+            # no procfs: fall back to the peak resident size
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return {'bytes': self.f_pos,
+                'seconds': elapsed,
+                'bytes_per_sec': (self.f_pos / elapsed) if elapsed > 0 else 0.0,
+                'rss_bytes': rss}
+
+    def report(self):
+        st = self.stats()
+        self.m_files.inc()
+        self.m_rate.set(st['bytes_per_sec'])
+        self.m_rss.set(st['rss_bytes'])
+
+    def reliable(self, pkt):
+        # everything but the preamble and post filler is sequenced
+        return (self.Window > 0 and pkt is not self.char_list and pkt is not self.filler)
+
+    def sequenced(self, pkt):
+        seq = self.seq & 0xFFFF
+        return np.concatenate((np.array([0x53, self.session, seq >> 8, seq & 0xFF], dtype=np.uint8), pkt))
+
+    def handle_ack(self, msg):
+        # ACK from the receiver: drop what it holds, resend the gaps
+        meta = pmt.car(msg)
+        if not (pmt.is_dict(meta)):
+            return
+        if (pmt.to_long(pmt.dict_ref(meta, pmt.intern('session'), pmt.from_long(-1))) != self.session):
+            return
+        if (not self.unacked):
+            return
+        oldest = next(iter(self.unacked))
+        diff = (pmt.to_long(pmt.dict_ref(meta, pmt.intern('ack'), pmt.from_long(0))) - oldest) & 0xFFFF
+        if (diff >= 0x8000):
+            return      # stale
+        base = oldest + diff
+        bits = np.unpackbits(np.array(pmt.u8vector_elements(pmt.cdr(msg)), dtype=np.uint8))
+        held = [base + int(i) for i in np.flatnonzero(bits)]
+        for seq in [s for s in self.unacked if s < base] + held:
+            if (self.unacked.pop(seq, None) is not None):
+                self.t_sent.pop(seq, None)
+                self.m_acked.inc()
+        if (held):
+            now = time.time()
+            for seq in self.unacked:
+                if (seq >= held[-1]):
+                    break
+                if (seq not in self.resend and now - self.t_sent[seq] > 0.5 * self.Timeout):
+                    self.resend.append(seq)
+        self.m_outstanding.set(len(self.unacked))
+
+    def check_timeouts(self):
+        # resend whatever has waited too long for its ACK
+        now = time.time()
+        if (now < self.t_check):
+            return
+        self.t_check = now + 0.25 * self.Timeout
+        for seq in self.unacked:
+            if (seq not in self.resend and now - self.t_sent[seq] > self.Timeout):
+                self.resend.append(seq)
+
+    def start(self):
+        self.waker.start()
+        return True
+
+    def stop(self):
+        self.waker.stop()
+        if (self.ctl is not None):
+            self.ctl.close(0)
+            self.ctl = None
+        return True
+
+    def work(self, input_items, output_items):
+        if (self.unacked):
+            self.check_timeouts()
+        # nothing to send: idle, or the ARQ window is full
+        idle = (not self.resend and
+                ((self.state == 0 and not self.pending) or
+                 (self.Window > 0 and len(self.unacked) >= self.Window)))
+        if (self.ctl is not None):
+            self.poll_control()
+        if (self.state == 0 and not self.pending and self.jobs):
+            self.open_job(self.jobs.popleft())
+            self.state = 1
+        elif (idle):
+            # return 0 and look again later: for new jobs on the control
+            # socket, or when the ACKs outstanding time out
+            if (self.ctl is not None):
+                self.waker.after(0.01)
+            elif (self.unacked):
+                self.waker.after(max(self.t_check - time.time(), 0.001))
+        with self.t_work:
+            return self.fill(output_items[0])
+
+    def fill(self, out):
+        noutput_items = len(out)
+        n = 0
+        tags = []
+        # fill the output buffer with as many whole packets as fit
+        now = time.time()
+        while True:
+            seq = None
+            if (self.resend):
+                # retransmissions go first
+                seq = self.resend[0]
+                pkt = self.unacked.get(seq)
+                if (pkt is None):
+                    self.resend.popleft()
+                    continue
+            elif (not self.pending):
+                if (self.state == 0):
+                    # idle
+                    break
+                self.refill()
+                continue
+            else:
+                pkt = self.pending[0]
+                if (self.reliable(pkt)):
+                    if (len(self.unacked) >= self.Window):
+                        # window full, wait for ACKs
+                        break
+                    pkt = self.sequenced(pkt)
+            p_len = len(pkt)
+            if (n + p_len > noutput_items):
+                break
+            out[n:n+p_len] = pkt
+            tags.append((n, p_len))
+            n += p_len
+            if (seq is not None):
+                self.resend.popleft()
+                self.t_sent[seq] = now
+                self.m_resent.inc()
+            else:
+                if (self.reliable(self.pending[0])):
+                    self.unacked[self.seq] = pkt
+                    self.t_sent[self.seq] = now
+                    self.seq += 1
+                self.pending.popleft()
+        if (self.Window > 0):
+            self.m_outstanding.set(len(self.unacked))
+
+        for (offset, p_len) in tags:
+            self.add_item_tag(0, # Write to output port 0
+                self.indx + offset,   # Index of the tag
+                self.pkt_key,   # Key of the tag
+                pmt.from_long(p_len)    # Value of the tag
+                )
+        self.indx += n
+        self.m_packets.inc(len(tags))
+        self.m_bytes.inc(n)
+        return (n)
+
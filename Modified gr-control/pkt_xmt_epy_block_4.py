@@ -0,0 +1,79 @@
+"""
+Embedded Python Block: FEC Encoder
+"""
+
+import numpy as np
+from gnuradio import gr
+import pmt
+import pkt_fec
+import pkt_metrics
+
+"""
+Codes every "packet_len" tagged packet (payload + CRC) with pkt_fec and
+retags it with the coded length, so the protocol formatter puts the coded
+length in the header. Code 'none' passes packets through unchanged.
+See pkt_fec.py for the codes; pkt_rcv's FEC Decoder must use the same
+Code and Depth.
+"""
+
+class blk(gr.basic_block):
+    def __init__(self, Code='conv', Depth=16):
+        gr.basic_block.__init__(
+            self,
+            name='EPB: FEC Encoder',
+            in_sig=[np.uint8],
+            out_sig=[np.uint8])
+        self.Code = Code
+        self.Depth = Depth
+        self.pkt_key = pmt.intern("packet_len")
+        # packets are retagged with their coded length
+        self.set_tag_propagation_policy(gr.TPP_DONT)
+        self.m_packets = pkt_metrics.counter("fec_encoder.packets")
+        self.m_bytes = pkt_metrics.counter("fec_encoder.bytes")
+        self.t_work = pkt_metrics.work_timer("fec_encoder.work")
+
+    def forecast(self, noutput_items, ninput_items_required):
+        # the output is about twice the input; ask for whatever is there
+        ninput_items_required[0] = 1
+
+    def general_work(self, input_items, output_items):
+        with self.t_work:
+            return self.encode_packets(input_items, output_items)
+
+    def encode_packets(self, input_items, output_items):
+        in0 = input_items[0]
+        out = output_items[0]
+        ninput_items = len(in0)
+        noutput_items = len(out)
+        nread = self.nitems_read(0)
+        nwritten = self.nitems_written(0)
+
+        lengths = {}
+        for tag in self.get_tags_in_window(0, 0, ninput_items):
+            if pmt.equal(tag.key, self.pkt_key):
+                lengths[tag.offset - nread] = pmt.to_long(tag.value)
+
+        in_idx = 0
+        out_idx = 0
+        while in_idx < ninput_items:
+            p_len = lengths.get(in_idx)
+            if p_len is None:
+                # not at a packet start (should not happen): skip to the next one
+                nxt = [i for i in lengths if i > in_idx]
+                in_idx = min(nxt) if nxt else ninput_items
+                continue
+            if in_idx + p_len > ninput_items:
+                break           # wait for the rest of the packet
+            coded = pkt_fec.encode(self.Code, in0[in_idx:in_idx + p_len], self.Depth)
+            if out_idx + len(coded) > noutput_items:
+                break
+            out[out_idx:out_idx + len(coded)] = coded
+            self.add_item_tag(0, nwritten + out_idx, self.pkt_key, pmt.from_long(len(coded)))
+            in_idx += p_len
+            out_idx += len(coded)
+            self.m_packets.inc()
+            self.m_bytes.inc(len(coded))
+
+        self.consume(0, in_idx)
+        self.produce(0, out_idx)
+        return gr.WORK_CALLED_PRODUCE
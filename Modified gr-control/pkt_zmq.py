@@ -0,0 +1,142 @@
+"""
+Lossless ZMQ stream transport: PUSH/PULL stream blocks with backpressure,
+for the links between pkt_xmt, chan_loopback and pkt_rcv (radio / address
+push:tcp://host:port, chan_loopback --transport pushpull, see
+pkt_radio.py).
+
+gr-zeromq's PUB/SUB blocks lose samples whenever the subscriber is not
+connected yet or falls behind (PUB drops at the high-water mark), which
+is why chan_loopback has a throttle. Here the sink's PUSH socket only
+takes a message when there is room for it in the queues (`hwm` messages
+each side); until then work() waits, so a slow receiver holds the whole
+chain back instead of losing samples, and the link can run unthrottled.
+
+Each message is
+    header      stream offset of the first item, send time (<Qd)
+    items       raw
+so the source can tell what it missed and how long the samples queued:
+    zmq.<name>.sent / received      items
+    zmq.<name>.dropped              items missing in the offsets (none
+                                    unless a side was restarted)
+    zmq.<name>.send_waits           work() calls that found the queue full
+    zmq.<name>.lag                  histogram of send -> receive, seconds
+<name> is the port. The sink binds, the source connects, as with
+pkt_radio's PUB/SUB blocks.
+"""
+
+import time
+import struct
+import numpy as np
+import zmq
+
+from gnuradio import gr
+import pkt_metrics
+
+HEADER = struct.Struct('<Qd')
+WAIT = 0.1              # s a work() call waits before returning empty
+
+
+def _name(address):
+    return address.rsplit(':', 1)[-1].rsplit('/', 1)[-1]
+
+
+class sink(gr.sync_block):
+    """Sends its input stream on a bound PUSH socket, waiting (not
+    dropping) when the receiver is behind."""
+    def __init__(self, address, itemsize=gr.sizeof_gr_complex, hwm=8):
+        gr.sync_block.__init__(
+            self,
+            name='pkt_zmq.sink',
+            in_sig=[(np.uint8, itemsize)],
+            out_sig=None)
+        self.address = address
+        self.itemsize = itemsize
+        self.hwm = hwm
+        self.socket = None
+        name = _name(address)
+        self.m_sent = pkt_metrics.counter("zmq.%s.sent" % name)
+        self.m_waits = pkt_metrics.counter("zmq.%s.send_waits" % name)
+
+    def start(self):
+        self.socket = zmq.Context.instance().socket(zmq.PUSH)
+        self.socket.setsockopt(zmq.SNDHWM, self.hwm)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.bind(self.address)
+        return True
+
+    def stop(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+        return True
+
+    def work(self, input_items, output_items):
+        if not self.socket.poll(int(WAIT * 1000), zmq.POLLOUT):
+            # no receiver, or its queue is full: hold the flowgraph back
+            self.m_waits.inc()
+            return 0
+        x = input_items[0]
+        try:
+            self.socket.send_multipart([HEADER.pack(self.nitems_read(0), time.time()), x.tobytes()],
+                zmq.NOBLOCK)
+        except zmq.Again:
+            self.m_waits.inc()
+            return 0
+        self.m_sent.inc(len(x))
+        return len(x)
+
+
+class source(gr.sync_block):
+    """Receives a stream from pkt_zmq.sink on a PULL socket (connected)."""
+    def __init__(self, address, itemsize=gr.sizeof_gr_complex, hwm=8):
+        gr.sync_block.__init__(
+            self,
+            name='pkt_zmq.source',
+            in_sig=None,
+            out_sig=[(np.uint8, itemsize)])
+        self.address = address
+        self.itemsize = itemsize
+        self.hwm = hwm
+        self.socket = None
+        self.expected = None    # offset of the next item from the sender
+        self.pending = None     # items of the last message not output yet
+        name = _name(address)
+        self.m_received = pkt_metrics.counter("zmq.%s.received" % name)
+        self.m_dropped = pkt_metrics.counter("zmq.%s.dropped" % name)
+        self.m_lag = pkt_metrics.histogram("zmq.%s.lag" % name)
+
+    def start(self):
+        self.socket = zmq.Context.instance().socket(zmq.PULL)
+        self.socket.setsockopt(zmq.RCVHWM, self.hwm)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(self.address)
+        return True
+
+    def stop(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+        return True
+
+    def receive(self):
+        if not self.socket.poll(int(WAIT * 1000)):
+            return False
+        header, data = self.socket.recv_multipart()
+        offset, sent = HEADER.unpack(header)
+        self.m_lag.observe(max(time.time() - sent, 0.0))
+        if self.expected is not None and offset > self.expected:
+            self.m_dropped.inc(offset - self.expected)
+        # (an offset below the expected one: the sender was restarted)
+        self.pending = np.frombuffer(data, dtype=np.uint8).reshape(-1, self.itemsize)
+        self.expected = offset + len(self.pending)
+        return True
+
+    def work(self, input_items, output_items):
+        if self.pending is None and not self.receive():
+            return 0
+        out = output_items[0]
+        n = min(len(out), len(self.pending))
+        out[:n] = self.pending[:n]
+        self.pending = self.pending[n:] if n < len(self.pending) else None
+        self.m_received.inc(n)
+        return n
@@ -26,6 +26,8 @@ from gnuradio.eng_arg import eng_float, intx
 from gnuradio import eng_notation
 from gnuradio import uhd
 import time
+import pkt_preamble
+import pkt_perf
 
 
 
@@ -134,7 +136,8 @@ class qpsk_stage6_ss(gr.top_block, Qt.QWidget):
             self.top_grid_layout.setRowStretch(r, 1)
         for c in range(3, 4):
             self.top_grid_layout.setColumnStretch(c, 1)
-        self.analog_random_source_x_0 = blocks.vector_source_b(list(map(int, numpy.random.randint(0, 256, 10000))), True)
+        # known preamble + access code ahead of the data, for the receiver's equalizer training
+        self.analog_random_source_x_0 = blocks.vector_source_b(pkt_preamble.start_bytes() + list(map(int, numpy.random.randint(0, 256, 10000))), True, 1, [])
 
 
         ##################################################
@@ -236,6 +239,7 @@ def main(top_block_cls=qpsk_stage6_ss, options=None):
 
     tb = top_block_cls()
 
+    pkt_perf.attach(tb)
     tb.start()
 
     tb.show()
@@ -26,41 +26,18 @@ from gnuradio.eng_arg import eng_float, intx
 from gnuradio import eng_notation
 from gnuradio import uhd
 import time
+import qpsk_stage6_ss_rcv_epy_block_0 as epy_block_0  # embedded python block
+import pkt_preamble
 import sip
+import pkt_perf
 
 
 
 class qpsk_stage6_ss_rcv(gr.top_block, Qt.QWidget):
 
-    def __init__(self):
+    def __init__(self, headless=False):
         gr.top_block.__init__(self, "qpsk_stage6_ss_rcv", catch_exceptions=True)
-        Qt.QWidget.__init__(self)
-        self.setWindowTitle("qpsk_stage6_ss_rcv")
-        qtgui.util.check_set_qss()
-        try:
-            self.setWindowIcon(Qt.QIcon.fromTheme('gnuradio-grc'))
-        except BaseException as exc:
-            print(f"Qt GUI: Could not set Icon: {str(exc)}", file=sys.stderr)
-        self.top_scroll_layout = Qt.QVBoxLayout()
-        self.setLayout(self.top_scroll_layout)
-        self.top_scroll = Qt.QScrollArea()
-        self.top_scroll.setFrameStyle(Qt.QFrame.NoFrame)
-        self.top_scroll_layout.addWidget(self.top_scroll)
-        self.top_scroll.setWidgetResizable(True)
-        self.top_widget = Qt.QWidget()
-        self.top_scroll.setWidget(self.top_widget)
-        self.top_layout = Qt.QVBoxLayout(self.top_widget)
-        self.top_grid_layout = Qt.QGridLayout()
-        self.top_layout.addLayout(self.top_grid_layout)
-
-        self.settings = Qt.QSettings("GNU Radio", "qpsk_stage6_ss_rcv")
-
-        try:
-            geometry = self.settings.value("geometry")
-            if geometry:
-                self.restoreGeometry(geometry)
-        except BaseException as exc:
-            print(f"Qt GUI: Could not restore geometry: {str(exc)}", file=sys.stderr)
+        self.display = False
 
         ##################################################
         # Variables
@@ -69,7 +46,8 @@ class qpsk_stage6_ss_rcv(gr.top_block, Qt.QWidget):
         self.qpsk = qpsk = digital.constellation_rect([0.707+0.707j, -0.707+0.707j, -0.707-0.707j, 0.707-0.707j], [0, 1, 2, 3],
         4, 2, 2, 1, 1).base()
         self.nfilts = nfilts = 32
-        self.variable_adaptive_algorithm_0 = variable_adaptive_algorithm_0 = digital.adaptive_algorithm_cma( qpsk, .0001, 4).base()
+        self.variable_adaptive_algorithm_0 = variable_adaptive_algorithm_0 = digital.adaptive_algorithm_nlms( qpsk, 0.3).base()
+        self.training = training = pkt_preamble.training_symbols('qpsk')
         self.time_offset = time_offset = 1.0005
         self.samp_rate = samp_rate = 32000*30
         self.rrc_taps = rrc_taps = firdes.root_raised_cosine(nfilts, nfilts, 1.0/float(sps), 0.35, 11*sps*nfilts)
@@ -97,6 +75,80 @@ class qpsk_stage6_ss_rcv(gr.top_block, Qt.QWidget):
         self.uhd_usrp_source_0.set_center_freq(2.45*10**9, 0)
         self.uhd_usrp_source_0.set_antenna("TX/RX", 0)
         self.uhd_usrp_source_0.set_gain(20, 0)
+        # burst starts for the equalizer's training
+        self.epy_block_0 = epy_block_0.blk(Modulation='qpsk', Sps=2, Threshold=0.6, Mark_delay=0)
+        self.digital_symbol_sync_xx_0 = digital.symbol_sync_cc(
+            digital.TED_GARDNER,
+            sps,
+            phase_bw,
+            1.0,
+            1.0,
+            1.5,
+            2,
+            digital.constellation_bpsk().base(),
+            digital.IR_PFB_MF,
+            32,
+            rrc_taps)
+        self.digital_map_bb_0 = digital.map_bb([0,1,2,3])
+        self.digital_linear_equalizer_0 = digital.linear_equalizer(15, 2, variable_adaptive_algorithm_0, True, training, 'corr_est')
+        self.digital_diff_decoder_bb_0 = digital.diff_decoder_bb(4, digital.DIFF_DIFFERENTIAL)
+        self.digital_costas_loop_cc_0 = digital.costas_loop_cc(phase_bw, 4, False)
+        self.digital_constellation_decoder_cb_0 = digital.constellation_decoder_cb(qpsk)
+        self.blocks_unpack_k_bits_bb_0 = blocks.unpack_k_bits_bb(2)
+
+
+        ##################################################
+        # Connections
+        ##################################################
+        self.connect((self.digital_constellation_decoder_cb_0, 0), (self.digital_diff_decoder_bb_0, 0))
+        self.connect((self.digital_costas_loop_cc_0, 0), (self.digital_symbol_sync_xx_0, 0))
+        self.connect((self.digital_diff_decoder_bb_0, 0), (self.digital_map_bb_0, 0))
+        self.connect((self.digital_linear_equalizer_0, 0), (self.digital_constellation_decoder_cb_0, 0))
+        self.connect((self.digital_map_bb_0, 0), (self.blocks_unpack_k_bits_bb_0, 0))
+        self.connect((self.digital_symbol_sync_xx_0, 0), (self.epy_block_0, 0))
+        self.connect((self.epy_block_0, 0), (self.digital_linear_equalizer_0, 0))
+        self.connect((self.uhd_usrp_source_0, 0), (self.digital_costas_loop_cc_0, 0))
+
+        if not headless:
+            self.attach_display()
+        else:
+            # the decoded bits only go to the time sink; without it they
+            # still need a sink to keep the chain running
+            self.blocks_null_sink_0 = blocks.null_sink(gr.sizeof_char*1)
+            self.connect((self.blocks_unpack_k_bits_bb_0, 0), (self.blocks_null_sink_0, 0))
+
+    def attach_display(self):
+        # Qt window and display sinks; needs a QApplication. Headless runs
+        # skip this and only build the DSP chain above.
+        samp_rate = self.samp_rate
+        Qt.QWidget.__init__(self)
+        self.setWindowTitle("qpsk_stage6_ss_rcv")
+        qtgui.util.check_set_qss()
+        try:
+            self.setWindowIcon(Qt.QIcon.fromTheme('gnuradio-grc'))
+        except BaseException as exc:
+            print(f"Qt GUI: Could not set Icon: {str(exc)}", file=sys.stderr)
+        self.top_scroll_layout = Qt.QVBoxLayout()
+        self.setLayout(self.top_scroll_layout)
+        self.top_scroll = Qt.QScrollArea()
+        self.top_scroll.setFrameStyle(Qt.QFrame.NoFrame)
+        self.top_scroll_layout.addWidget(self.top_scroll)
+        self.top_scroll.setWidgetResizable(True)
+        self.top_widget = Qt.QWidget()
+        self.top_scroll.setWidget(self.top_widget)
+        self.top_layout = Qt.QVBoxLayout(self.top_widget)
+        self.top_grid_layout = Qt.QGridLayout()
+        self.top_layout.addLayout(self.top_grid_layout)
+
+        self.settings = Qt.QSettings("GNU Radio", "qpsk_stage6_ss_rcv")
+
+        try:
+            geometry = self.settings.value("geometry")
+            if geometry:
+                self.restoreGeometry(geometry)
+        except BaseException as exc:
+            print(f"Qt GUI: Could not restore geometry: {str(exc)}", file=sys.stderr)
+
         self._time_offset_range = qtgui.Range(0.999, 1.001, 0.0001, 1.0005, 200)
         self._time_offset_win = qtgui.RangeWidget(self._time_offset_range, self.set_time_offset, "Channel: Timing Offset", "counter_slider", float, QtCore.Qt.Horizontal)
         self.top_grid_layout.addWidget(self._time_offset_win, 0, 1, 1, 1)
@@ -253,23 +305,6 @@ class qpsk_stage6_ss_rcv(gr.top_block, Qt.QWidget):
             self.top_grid_layout.setRowStretch(r, 1)
         for c in range(2, 3):
             self.top_grid_layout.setColumnStretch(c, 1)
-        self.digital_symbol_sync_xx_0 = digital.symbol_sync_cc(
-            digital.TED_GARDNER,
-            sps,
-            phase_bw,
-            1.0,
-            1.0,
-            1.5,
-            2,
-            digital.constellation_bpsk().base(),
-            digital.IR_PFB_MF,
-            32,
-            rrc_taps)
-        self.digital_map_bb_0 = digital.map_bb([0,1,2,3])
-        self.digital_linear_equalizer_0 = digital.linear_equalizer(15, 2, variable_adaptive_algorithm_0, True, [ ], 'corr_est')
-        self.digital_diff_decoder_bb_0 = digital.diff_decoder_bb(4, digital.DIFF_DIFFERENTIAL)
-        self.digital_costas_loop_cc_0 = digital.costas_loop_cc(phase_bw, 4, False)
-        self.digital_constellation_decoder_cb_0 = digital.constellation_decoder_cb(qpsk)
         self._delay_range = qtgui.Range(0, 200, 1, 50, 200)
         self._delay_win = qtgui.RangeWidget(self._delay_range, self.set_delay, "Delay", "counter_slider", float, QtCore.Qt.Horizontal)
         self.top_grid_layout.addWidget(self._delay_win, 0, 3, 1, 1)
@@ -277,24 +312,12 @@ class qpsk_stage6_ss_rcv(gr.top_block, Qt.QWidget):
             self.top_grid_layout.setRowStretch(r, 1)
         for c in range(3, 4):
             self.top_grid_layout.setColumnStretch(c, 1)
-        self.blocks_unpack_k_bits_bb_0 = blocks.unpack_k_bits_bb(2)
         self.blocks_char_to_float_0_0 = blocks.char_to_float(1, 1)
-
-
-        ##################################################
-        # Connections
-        ##################################################
         self.connect((self.blocks_char_to_float_0_0, 0), (self.qtgui_time_sink_x_1, 0))
         self.connect((self.blocks_unpack_k_bits_bb_0, 0), (self.blocks_char_to_float_0_0, 0))
-        self.connect((self.digital_constellation_decoder_cb_0, 0), (self.digital_diff_decoder_bb_0, 0))
-        self.connect((self.digital_costas_loop_cc_0, 0), (self.digital_constellation_decoder_cb_0, 0))
-        self.connect((self.digital_costas_loop_cc_0, 0), (self.qtgui_const_sink_x_0, 0))
-        self.connect((self.digital_diff_decoder_bb_0, 0), (self.digital_map_bb_0, 0))
-        self.connect((self.digital_linear_equalizer_0, 0), (self.digital_costas_loop_cc_0, 0))
-        self.connect((self.digital_map_bb_0, 0), (self.blocks_unpack_k_bits_bb_0, 0))
-        self.connect((self.digital_symbol_sync_xx_0, 0), (self.digital_linear_equalizer_0, 0))
-        self.connect((self.uhd_usrp_source_0, 0), (self.digital_symbol_sync_xx_0, 0))
+        self.connect((self.digital_linear_equalizer_0, 0), (self.qtgui_const_sink_x_0, 0))
         self.connect((self.uhd_usrp_source_0, 0), (self.qtgui_freq_sink_x_0, 0))
+        self.display = True
 
 
     def closeEvent(self, event):
@@ -333,6 +356,12 @@ class qpsk_stage6_ss_rcv(gr.top_block, Qt.QWidget):
     def set_variable_adaptive_algorithm_0(self, variable_adaptive_algorithm_0):
         self.variable_adaptive_algorithm_0 = variable_adaptive_algorithm_0
 
+    def get_training(self):
+        return self.training
+
+    def set_training(self, training):
+        self.training = training
+
     def get_time_offset(self):
         return self.time_offset
 
@@ -344,9 +373,11 @@ class qpsk_stage6_ss_rcv(gr.top_block, Qt.QWidget):
 
     def set_samp_rate(self, samp_rate):
         self.samp_rate = samp_rate
-        self.qtgui_time_sink_x_1.set_samp_rate(self.samp_rate)
+        if self.display:
+            self.qtgui_time_sink_x_1.set_samp_rate(self.samp_rate)
         self.uhd_usrp_source_0.set_samp_rate(self.samp_rate)
-        self.qtgui_freq_sink_x_0.set_frequency_range(0, self.samp_rate)
+        if self.display:
+            self.qtgui_freq_sink_x_0.set_frequency_range(0, self.samp_rate)
 
     def get_rrc_taps(self):
         return self.rrc_taps
@@ -389,12 +420,43 @@ class qpsk_stage6_ss_rcv(gr.top_block, Qt.QWidget):
 
 
 
+def argument_parser():
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="Run without the Qt window and display sinks")
+    return parser
+
+
+def main_headless(top_block_cls=qpsk_stage6_ss_rcv, options=None):
+
+    tb = top_block_cls(headless=True)
+
+    def sig_handler(sig=None, frame=None):
+        tb.stop()
+        tb.wait()
+
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, sig_handler)
+    signal.signal(signal.SIGTERM, sig_handler)
+
+    pkt_perf.attach(tb)
+    tb.start()
+    tb.wait()
+
+
 def main(top_block_cls=qpsk_stage6_ss_rcv, options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    if options.headless:
+        return main_headless(top_block_cls, options)
 
     qapp = Qt.QApplication(sys.argv)
 
     tb = top_block_cls()
 
+    pkt_perf.attach(tb)
     tb.start()
 
     tb.show()
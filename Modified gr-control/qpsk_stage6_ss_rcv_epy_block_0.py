@@ -0,0 +1,14 @@
+"""
+Embedded Python Block: Preamble Correlator
+
+pkt_rcv's Preamble Correlator (pkt_rcv_epy_block_7.py) for the QPSK
+constellation; a change to the correlator belongs there.
+"""
+
+import pkt_rcv_epy_block_7
+
+
+class blk(pkt_rcv_epy_block_7.blk):
+    def __init__(self, Modulation='qpsk', Sps=2, Threshold=0.6, Mark_delay=0):
+        pkt_rcv_epy_block_7.blk.__init__(self, Modulation=Modulation, Sps=Sps,
+            Threshold=Threshold, Mark_delay=Mark_delay)
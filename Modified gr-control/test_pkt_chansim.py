@@ -0,0 +1,38 @@
+"""
+pkt_chansim's mixer called directly, without a flowgraph:
+    python3 -m pytest test_pkt_chansim.py
+"""
+
+import time
+import numpy as np
+import pytest
+
+pytest.importorskip("gnuradio")
+import pkt_chansim
+
+
+def empty(ninputs):
+    return [np.zeros(0, dtype=np.complex64) for _ in range(ninputs)]
+
+
+def test_mixer_all_inputs_off_air():
+    # no input has ever had items: nothing is live, nothing comes out
+    mix = pkt_chansim.mixer(3, Idle=0.05)
+    out = np.zeros(1024, dtype=np.complex64)
+    assert mix.general_work(empty(3), [out]) == 0
+
+
+def test_mixer_inputs_gone_idle():
+    # all inputs had items once, longer than Idle ago
+    mix = pkt_chansim.mixer(2, Idle=0.05)
+    mix.last = [time.time() - 1.0] * 2
+    out = np.zeros(1024, dtype=np.complex64)
+    assert mix.general_work(empty(2), [out]) == 0
+
+
+def test_mixer_live_input_between_chunks():
+    # an input that is still live but empty holds the output back
+    mix = pkt_chansim.mixer(2, Idle=10.0)
+    mix.last = [time.time()] * 2
+    out = np.zeros(1024, dtype=np.complex64)
+    assert mix.general_work(empty(2), [out]) == 0
@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+import zmq
+from argparse import ArgumentParser
+
+# Control socket of the pkt_xmt file source (Control parameter of epy_block_0)
+ZMQ_ADDRESS = "tcp://127.0.0.1:5556"
+
+def send_request(socket_zmq, req, timeout=2000):
+    """
+    Sends one request to the transmitter and waits for its reply.
+
+    Parameters:
+        socket_zmq: connected REQ socket.
+        req (dict): the request, e.g. {"file": "/path/to/file"}.
+        timeout (int): how long to wait for the reply, in ms.
+
+    Returns:
+        dict: the decoded reply, or None if the transmitter did not answer.
+    """
+    socket_zmq.send_string(json.dumps(req))
+    if not socket_zmq.poll(timeout):
+        return None
+    return json.loads(socket_zmq.recv_string())
+
+def main():
+    parser = ArgumentParser(description='queue files on a running pkt_xmt')
+    parser.add_argument("files", nargs='*', help="files to send")
+    parser.add_argument("--control", default=ZMQ_ADDRESS,
+        help="transmitter control socket [default=%(default)r]")
+    parser.add_argument("--status", action='store_true',
+        help="show the current job and queue")
+    options = parser.parse_args()
+
+    context = zmq.Context()
+    socket_zmq = context.socket(zmq.REQ)
+    socket_zmq.setsockopt(zmq.LINGER, 0)
+    socket_zmq.connect(options.control)
+
+    # the transmitter runs on this host, so send it absolute paths
+    reqs = [{"file": os.path.abspath(f)} for f in options.files]
+    if options.status or not reqs:
+        reqs.append({"status": True})
+    try:
+        for req in reqs:
+            rep = send_request(socket_zmq, req)
+            if rep is None:
+                print(f"No reply from {options.control}")
+                return 1
+            print(json.dumps(rep))
+    finally:
+        socket_zmq.close()
+        context.term()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,11 @@ import pmt
 import zmq
 import numpy as np
 import struct
+import os
+try:
+    import pkt_metrics  # from 'Modified gr-control', when it is on PYTHONPATH
+except ImportError:
+    pkt_metrics = None
 
 
 # Set the serial port and baud rate to match your Arduino setup
@@ -14,6 +19,13 @@ context = zmq.Context()
 socket_zmq = context.socket(zmq.PUB)
 socket_zmq.bind("tcp://127.0.0.1:5555")
 
+# With PKT_METRICS set, counters instead of per-message prints (see pkt_metrics.py)
+CONSOLE = pkt_metrics is None or not os.environ.get('PKT_METRICS')
+if not CONSOLE:
+    m_sent = pkt_metrics.counter("temp_reader.messages")
+    m_bytes = pkt_metrics.counter("temp_reader.bytes")
+    m_temp = pkt_metrics.gauge("temp_reader.temperature")
+
 def float_to_uint8_array(value: float) -> np.ndarray:
     """
     Converts a float to a uint8 NumPy array representing its byte-level representation.
@@ -42,8 +54,6 @@ def read_temperature_data():
                 if ser.in_waiting > 0:
                     line = ser.readline().decode('utf-8').strip()
                     
-                    # Print the received data (spoofed temperature)
-                    print(f"Received: {line}")
                     line = float(line)
                     pmt_msg = pmt.from_float(line)
                     uint8_array = float_to_uint8_array(line)
@@ -55,7 +65,12 @@ def read_temperature_data():
                     #pmt_msg = pmt.cons(pmt.PMT_NIL, pmt.init_u8vector(5,[0x01,0x02,0x03, 0x04, 0x05]))
                     # Send the PMT message via ZMQ to GNU Radio
                     socket_zmq.send(pmt.serialize_str(pmt_msg))
-                    print(f"Sent PMT message via ZMQ: {pmt.to_python(pmt_msg)}")
+                    if CONSOLE:
+                        print(f"Sent: {line} °C")
+                    else:
+                        m_temp.set(line)
+                        m_sent.inc()
+                        m_bytes.inc(len(vec))
                 
                 # Add a delay between reads (optional)
                 time.sleep(1)
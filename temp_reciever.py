@@ -3,11 +3,24 @@ import pmt
 import zmq
 import numpy as np
 import struct
+import os
+try:
+    import pkt_metrics  # from 'Modified gr-control', when it is on PYTHONPATH
+except ImportError:
+    pkt_metrics = None
 
 # Set the ZMQ connection details
 ZMQ_ADDRESS = "tcp://127.0.0.1:5554"  # The address to connect to (should match the publisher)
 ZMQ_TOPIC = ""  # Empty string means subscribe to all topics
 
+# With PKT_METRICS set, counters instead of per-message prints (see pkt_metrics.py)
+CONSOLE = pkt_metrics is None or not os.environ.get('PKT_METRICS')
+if not CONSOLE:
+    m_received = pkt_metrics.counter("temp_reciever.messages")
+    m_bytes = pkt_metrics.counter("temp_reciever.bytes")
+    m_failed = pkt_metrics.counter("temp_reciever.decode_errors")
+    m_temp = pkt_metrics.gauge("temp_reciever.temperature")
+
 def uint8_array_to_float(uint8_array: bytes) -> float:
     """
     Converts a byte array back to a float.
@@ -37,9 +50,10 @@ def decode_pmt_message(pmt_msg):
     Returns:
         float: The decoded temperature value, or None if decoding fails.
     """
-    print(pmt.is_u8vector(pmt_msg))
     dr = pmt.cdr(pmt_msg)
     data = bytes(pmt.u8vector_elements(dr))
+    if not CONSOLE:
+        m_bytes.inc(len(data))
     # Extract the second part of the pair, which should be the u8vector
 
     
@@ -47,9 +61,6 @@ def decode_pmt_message(pmt_msg):
 
     # Get the length and data from the u8vector
 
-    # Debug: Print the raw byte data
-    print(f"Raw byte data received: {data.hex()}")
-
     try:
         # Convert the byte data back to float
         temperature = uint8_array_to_float(data)
@@ -81,10 +92,17 @@ def receive_temperature_data():
             # Decode the PMT message to get the temperature
             temperature = decode_pmt_message(pmt_msg)
 
-            if temperature is not None:
-                print(f"Received Temperature: {temperature} °C")
+            if CONSOLE:
+                if temperature is not None:
+                    print(f"Received Temperature: {temperature} °C")
+                else:
+                    print("Failed to decode temperature from PMT message.")
             else:
-                print("Failed to decode temperature from PMT message.")
+                m_received.inc()
+                if temperature is not None:
+                    m_temp.set(temperature)
+                else:
+                    m_failed.inc()
 
             # Optional: Add a short delay to prevent tight loop
             time.sleep(0.1)